@@ -0,0 +1,17 @@
+# Generated by Django 3.1.14 on 2026-10-18 17:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookmarks', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='postbookmark',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='postbookmark_user_idx'),
+        ),
+    ]
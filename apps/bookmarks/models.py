@@ -15,6 +15,9 @@ class PostBookmark(AbstractBookmark):
     class Meta:
         ordering = ['-created_at',]
         unique_together = ['post', 'user']
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='postbookmark_user_idx'),
+        ]
         verbose_name = 'Post Bookmark'
         verbose_name_plural = 'Post Bookmarks'
 
@@ -0,0 +1,49 @@
+# Generated by Django 3.1.14 on 2026-10-18 17:14
+
+from django.db import migrations, models
+
+PATH_STEP = 10
+
+
+def populate_paths(apps, schema_editor):
+    PostComment = apps.get_model('comments', 'PostComment')
+    parents = dict(PostComment.objects.values_list('id', 'parent_id'))
+    paths = {}
+
+    def path_of(pk):
+        if pk not in paths:
+            segment = str(pk).zfill(PATH_STEP)
+            parent = parents[pk]
+            paths[pk] = segment if parent is None else f"{path_of(parent)}/{segment}"
+        return paths[pk]
+
+    comments = list(PostComment.objects.only('id'))
+    for comment in comments:
+        comment.path = path_of(comment.id)
+        comment.depth = comment.path.count('/')
+    PostComment.objects.bulk_update(comments, ['path', 'depth'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comments', '0002_added_comment_vote_model'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='postcomment',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='postcomment',
+            name='path',
+            field=models.CharField(blank=True, editable=False, help_text='Materialized path: the zero padded ids of all ancestors and of the comment itself. Ordering by path yields the thread depth first.', max_length=512),
+        ),
+        migrations.AddIndex(
+            model_name='postcomment',
+            index=models.Index(fields=['post', 'path'], name='postcomment_thread_idx'),
+        ),
+        migrations.RunPython(populate_paths, migrations.RunPython.noop),
+    ]
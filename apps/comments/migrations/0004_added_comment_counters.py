@@ -0,0 +1,44 @@
+# Generated by Django 3.1.14 on 2026-10-18 17:17
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def populate_counters(apps, schema_editor):
+    PostComment = apps.get_model('comments', 'PostComment')
+    PostCommentVote = apps.get_model('comments', 'PostCommentVote')
+    children = dict(
+        PostComment.objects.filter(is_removed=False, parent__isnull=False)
+        .order_by().values('parent_id').annotate(total=Count('id'))
+        .values_list('parent_id', 'total')
+    )
+    scores = dict(
+        PostCommentVote.objects.order_by().values('post_comment_id')
+        .annotate(total=Sum('vote')).values_list('post_comment_id', 'total')
+    )
+    comments = list(PostComment.objects.only('id'))
+    for comment in comments:
+        comment.child_count = children.get(comment.id, 0)
+        comment.score = scores.get(comment.id) or 0
+    PostComment.objects.bulk_update(comments, ['child_count', 'score'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comments', '0003_added_comment_path'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='postcomment',
+            name='child_count',
+            field=models.PositiveIntegerField(default=0, help_text='Number of replies that are not removed. Kept up to date by the comment views, see comments.services.'),
+        ),
+        migrations.AddField(
+            model_name='postcomment',
+            name='score',
+            field=models.IntegerField(default=0, help_text='Sum of the comment votes. Kept up to date by the vote actions.'),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
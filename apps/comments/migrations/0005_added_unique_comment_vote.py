@@ -0,0 +1,44 @@
+# Generated by Django 3.1.14 on 2026-10-18 17:19
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def remove_duplicate_votes(apps, schema_editor):
+    """
+    Keeps the most recent vote of every (user, comment) pair and recomputes
+    the score of the comments that had duplicates.
+    """
+    PostComment = apps.get_model('comments', 'PostComment')
+    PostCommentVote = apps.get_model('comments', 'PostCommentVote')
+    duplicates = PostCommentVote.objects.order_by()\
+        .values('user_id', 'post_comment_id')\
+        .annotate(total=Count('id')).filter(total__gt=1)
+    comment_ids = set()
+    for pair in duplicates:
+        votes = PostCommentVote.objects\
+            .filter(user_id=pair['user_id'], post_comment_id=pair['post_comment_id'])\
+            .order_by('-updated_at', '-id')
+        PostCommentVote.objects\
+            .filter(pk__in=list(votes.values_list('pk', flat=True)[1:])).delete()
+        comment_ids.add(pair['post_comment_id'])
+
+    for comment in PostComment.objects.filter(pk__in=comment_ids):
+        comment.score = PostCommentVote.objects.filter(post_comment=comment)\
+            .aggregate(total=Sum('vote'))['total'] or 0
+        comment.save(update_fields=['score'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comments', '0004_added_comment_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_votes, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='postcommentvote',
+            constraint=models.UniqueConstraint(fields=('user', 'post_comment'), name='unique_post_comment_vote'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 3.1.14 on 2026-10-18 17:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comments', '0005_added_unique_comment_vote'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='postcomment',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='postcomment_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='postcommentvote',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='postcommentvote_user_idx'),
+        ),
+    ]
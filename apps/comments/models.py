@@ -1,5 +1,5 @@
+from django.core.exceptions import ValidationError
 from django.db import models
-from django.db.models import Sum
 
 from comments.abstracts import AbstractComment, AbstractCommentVote
 from posts.models import Post
@@ -18,22 +18,59 @@ class PostComment(AbstractComment):
         related_name="comments",
         on_delete=models.CASCADE
     )
+    path = models.CharField(
+        max_length=512, blank=True, editable=False,
+        help_text="Materialized path: the zero padded ids of all ancestors and "
+            "of the comment itself. Ordering by path yields the thread depth first."
+    )
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+    child_count = models.PositiveIntegerField(
+        default=0,
+        help_text="Number of replies that are not removed. Kept up to date "
+            "by the comment views, see comments.services."
+    )
+    score = models.IntegerField(
+        default=0,
+        help_text="Sum of the comment votes. Kept up to date by the vote actions."
+    )
+
+    PATH_STEP = 10
+    # deepest reply whose path, PATH_STEP digits per level joined by
+    # slashes, still fits the path column
+    MAX_DEPTH = (512 + 1) // (PATH_STEP + 1) - 1
 
     class Meta:
         ordering = ['created_at',]
         verbose_name = "Post Comment"
         verbose_name_plural = "Post Comments"
+        indexes = [
+            models.Index(fields=['post', 'path'], name='postcomment_thread_idx'),
+            models.Index(fields=['user', '-created_at', '-id'], name='postcomment_user_idx'),
+        ]
 
     def __str__(self):
         return f"Comment: {self.post.title} by {self.user.username}"
 
-    def _get_score(self):
-        score = 0
-        votes = PostCommentVote.objects.filter(post_comment=self)
-        if votes.exists():
-    	    score = votes.aggregate(Sum('vote'))['vote__sum'] or 0
-        return score
-    score = property(_get_score)
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        if adding and self.parent_id is not None and self.parent.depth >= self.MAX_DEPTH:
+            raise ValidationError(f'Replies can be nested at most {self.MAX_DEPTH} levels deep')
+        if adding and self.parent_id is not None and self.parent.post_id != self.post_id:
+            raise ValidationError('Replies must be on the post of their parent')
+        super(PostComment, self).save(*args, **kwargs)
+        if adding and not self.path:
+            self.set_path()
+            PostComment.objects.filter(pk=self.pk)\
+                .update(path=self.path, depth=self.depth)
+
+    def set_path(self):
+        segment = str(self.pk).zfill(self.PATH_STEP)
+        if self.parent_id is None:
+            self.path = segment
+            self.depth = 0
+        else:
+            self.path = f"{self.parent.path}/{segment}"
+            self.depth = self.parent.depth + 1
 
 
 class PostCommentVote(AbstractCommentVote):
@@ -47,6 +84,13 @@ class PostCommentVote(AbstractCommentVote):
         ordering = ['created_at',]
         verbose_name = "Post Comment Vote"
         verbose_name_plural = "Post Comment Votes"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post_comment'], name='unique_post_comment_vote'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='postcommentvote_user_idx'),
+        ]
 
     def __str__(self):
         return f"{self.vote} point by {self.user.username}"
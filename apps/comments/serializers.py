@@ -1,3 +1,4 @@
+from django.db import transaction
 from rest_framework import serializers
 from rest_framework import status
 from rest_framework.decorators import action
@@ -6,6 +7,7 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
 from comments.models import PostComment, PostCommentVote
+from comments.services import adjust_child_count
 from profiles.serializers import UserSerializer
 
 
@@ -20,10 +22,9 @@ class PostCommentLightSerializer(serializers.ModelSerializer):
 class PostCommentSerializer(serializers.ModelSerializer):
     user = UserSerializer()
     comment = serializers.ReadOnlyField(source='_get_comment')
-    votes = serializers.ReadOnlyField(source='_get_score')
+    votes = serializers.ReadOnlyField(source='score')
     mentioned_users = UserSerializer(many=True, required=False)
     edited = serializers.ReadOnlyField(source='is_edited')
-    child_count = serializers.SerializerMethodField()
 
     class Meta:
         model = PostComment
@@ -35,18 +36,11 @@ class PostCommentSerializer(serializers.ModelSerializer):
         read_only_fields = (
             'id', 'created_at', 'updated_at', 'child_count')
 
-    def get_child_count(self, obj):
-        return PostComment.objects\
-            .filter(parent=obj)\
-            .exclude(is_removed=True)\
-            .count()
-
 
 class PostCommentCreateSerializer(serializers.ModelSerializer):
     comment = serializers.CharField(max_length=3000, min_length=4)
     mentioned_users = UserSerializer(many=True, required=False)
     edited = serializers.ReadOnlyField(source='is_edited')
-    child_count = serializers.SerializerMethodField()
 
     class Meta:
         model = PostComment
@@ -59,10 +53,25 @@ class PostCommentCreateSerializer(serializers.ModelSerializer):
             'post': {'write_only': True}
         }
 
+    def validate_parent(self, parent):
+        if parent is not None and parent.depth >= PostComment.MAX_DEPTH:
+            raise serializers.ValidationError(
+                f'Replies can be nested at most {PostComment.MAX_DEPTH} levels deep')
+        return parent
+
+    def validate(self, attrs):
+        parent = attrs.get('parent')
+        post = attrs.get('post', getattr(self.instance, 'post', None))
+        if parent is not None and post is not None and parent.post_id != post.pk:
+            raise serializers.ValidationError({'parent': 'Replies must be on the post of their parent'})
+        return attrs
+
+    @transaction.atomic
     def create(self, validated_data):
         comment = validated_data.pop('comment')
         validated_data['_comment'] = comment
         comment = PostComment.objects.create(**validated_data)
+        adjust_child_count(comment.parent_id, 1)
         return comment
 
     def update(self, instance, validated_data):
@@ -72,9 +81,6 @@ class PostCommentCreateSerializer(serializers.ModelSerializer):
         instance.save()
         return instance
 
-    def get_child_count(self, obj):
-        return 0
-
 
 class PostCommentVoteSerializer(serializers.ModelSerializer):
     post_comment = PostCommentLightSerializer()
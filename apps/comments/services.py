@@ -1,24 +1,149 @@
 from django.core.exceptions import ValidationError
 from django.contrib.auth.models import User
+from django.db.models import Count, Exists, F, OuterRef, Q, Sum
 
+from comments.models import PostComment, PostCommentVote
+from core import votes
+from core.cache import bump_version, object_namespace
+from core.services import upsert_vote
 
-def add_mentioned_users(user_id, comment):
-    try:
-        user = User.objects.get(pk=user_id)
-    except User.DoesNotExist:
-        pass
-    else:
-        comment.mentioned_users.add(user)
-        comment.save()
+
+def add_mentioned_users(comment, user_ids):
+    """
+    Adds the existing users among ``user_ids`` to the mentions of
+    ``comment`` with one query for the users and one insert. Unknown ids
+    are ignored.
+    """
+    users = list(User.objects.filter(pk__in=user_ids).values_list('pk', flat=True))
+    if users:
+        comment.mentioned_users.add(*users)
     return comment
 
 
-def remove_users(user_id, comment):
-    try:
-        user = User.objects.get(pk=user_id)
-    except User.DoesNotExist:
-        pass
-    else:
-        comment.mentioned_users.remove(user)
-        comment.save()
-        return comment
+def remove_users(comment, user_ids):
+    """
+    Removes ``user_ids`` from the mentions of ``comment`` in one query.
+    """
+    comment.mentioned_users.remove(*user_ids)
+    return comment
+
+
+def visible_comments(queryset):
+    """
+    Hides removed comments unless they still have replies, in which case
+    they stay in place so the thread below them can be rendered.
+    """
+    return queryset\
+        .annotate(has_children=Exists(
+            PostComment.objects.filter(parent=OuterRef('pk'))))\
+        .filter(Q(is_removed=False) | Q(has_children=True))
+
+
+def nest_comments(comments):
+    """
+    Turns serialized comments ordered by path into a tree. Every parent
+    comes before its replies in path order, so one pass is enough.
+    Comments whose parent was not loaded become roots.
+    """
+    nodes = {}
+    roots = []
+    for comment in comments:
+        comment['replies'] = []
+        nodes[comment['id']] = comment
+        parent = nodes.get(comment['parent'])
+        if parent is None:
+            roots.append(comment)
+        else:
+            parent['replies'].append(comment)
+    return roots
+
+
+def adjust_child_count(parent_id, delta):
+    """
+    Adds ``delta`` to the stored reply count of the comment ``parent_id``.
+    Top level comments have no parent and are ignored.
+    """
+    if parent_id is None or not delta:
+        return
+    PostComment.objects.filter(pk=parent_id)\
+        .update(child_count=F('child_count') + delta)
+
+
+def cast_comment_vote(comment, user, value):
+    """
+    Stores ``value`` as the vote of ``user`` on ``comment`` and moves its
+    score in the same round trip, see core.services.upsert_vote. The new
+    score is mirrored on ``comment``. Returns the vote.
+
+    With buffered vote ingestion the vote is only queued and
+    ``comment.score`` is set to the estimated score, see core.votes.
+    """
+    if votes.is_buffered():
+        comment.score = votes.buffer_vote('comment', comment, user, value)
+        return value
+    old_vote, new_vote, values = upsert_vote(PostCommentVote, comment, user, value)
+    comment.score = values['score']
+    if old_vote != new_vote:
+        bump_comments(comment.post.uuid)
+    return new_vote
+
+
+def votes_flushed(queryset):
+    """
+    Called by core.votes after buffered votes changed the scores of the
+    comments in ``queryset``.
+    """
+    uuids = queryset.order_by().values_list('post__uuid', flat=True).distinct()
+    bump_version(*[object_namespace('comments', uuid) for uuid in uuids])
+
+
+def bump_comments(post_uuid):
+    """
+    Marks cached validators of the comments of a post as stale.
+    """
+    bump_version(object_namespace('comments', post_uuid))
+
+
+def rebuild_comment_counters(queryset=None, batch_size=1000):
+    """
+    Recomputes child_count and score of every comment in ``queryset``, or
+    of every comment when it is None, in batches of ``batch_size`` ordered
+    by id. Each batch runs one grouped query over the replies and one over
+    the votes of its id range, limited to ``queryset`` with a subquery, and
+    writes its results back. Returns the number of comments updated.
+    """
+    comments = PostComment.objects.all() if queryset is None else queryset
+    comments = comments.only('id', 'child_count', 'score').order_by('id')
+    replies = PostComment.objects.filter(is_removed=False).order_by()
+    votes = PostCommentVote.objects.order_by()
+    if queryset is not None:
+        ids = queryset.order_by().values('id')
+        replies = replies.filter(parent_id__in=ids)
+        votes = votes.filter(post_comment_id__in=ids)
+
+    updated = 0
+    last = 0
+    while True:
+        batch = list(comments.filter(pk__gt=last)[:batch_size])
+        if not batch:
+            return updated
+        first, last = batch[0].pk, batch[-1].pk
+        children = dict(
+            replies
+            .filter(parent_id__gte=first, parent_id__lte=last)
+            .values('parent_id')
+            .annotate(total=Count('id'))
+            .values_list('parent_id', 'total')
+        )
+        scores = dict(
+            votes
+            .filter(post_comment_id__gte=first, post_comment_id__lte=last)
+            .values('post_comment_id')
+            .annotate(total=Sum('vote'))
+            .values_list('post_comment_id', 'total')
+        )
+        for comment in batch:
+            comment.child_count = children.get(comment.pk, 0)
+            comment.score = scores.get(comment.pk) or 0
+        PostComment.objects.bulk_update(batch, ['child_count', 'score'])
+        updated += len(batch)
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.db.models import Q, F
 from django.core.exceptions import ValidationError
 from django.utils.decorators import method_decorator
@@ -9,43 +9,83 @@ from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from core.views import BaseReadOnlyViewSet, BaseViewSet
+from core.pagination import KeysetPagination
+from core.cache import object_namespace
 from posts.models import Post
+from posts.services import visible_posts
 from comments.models import PostComment, PostCommentVote
 from comments.serializers import PostCommentSerializer, PostCommentCreateSerializer
-from comments.services import add_mentioned_users
+from core.services import VOTE_VALUES
+from comments.services import (
+    add_mentioned_users, adjust_child_count, cast_comment_vote,
+    nest_comments, visible_comments
+)
 
 
 class PostCommentPagination(PageNumberPagination):
     page_size = 24
 
 
+class PostCommentCursorPagination(KeysetPagination):
+    page_size = 24
+
+
 class PostCommentViewSet(BaseViewSet):
     queryset = PostComment.objects.all()
     pagination_class = PostCommentPagination
+    cursor_pagination_class = PostCommentCursorPagination
     serializer_class = PostCommentSerializer
     serializer_action_classes = {
         'list' : PostCommentSerializer,
         'create' : PostCommentCreateSerializer,
         'update' : PostCommentCreateSerializer,
     }
+    THREAD_MAX_DEPTH = 10
+    THREAD_MAX_LIMIT = 500
+    cache_namespace = 'comments'
+    replica_actions = ('list', 'retrieve', 'children', 'thread')
+    async_actions = ('thread',)
+
+    def get_cache_namespaces(self):
+        # comments are versioned per post, see comments.services.bump_comments
+        return [object_namespace(self.cache_namespace, self.kwargs.get('post_uuid'))]
 
     def get_queryset(self):
         queryset = self.queryset.filter(is_removed=True)
         if self.kwargs != {}:
             if 'post_uuid' in self.kwargs:
-                return self.queryset.filter(post__uuid=self.kwargs['post_uuid'])
+                # comments of PRIVATE group posts only for members, see posts.services
+                return visible_posts(
+                    self.queryset.filter(post__uuid=self.kwargs['post_uuid']),
+                    self.request.user, request=self.request, group_field='post__group')
         return queryset
 
+    def get_post(self):
+        """
+        The post of the route if the viewer may see it, else None.
+        """
+        posts = visible_posts(Post.objects.all(), self.request.user, request=self.request)
+        return posts.filter(uuid=self.kwargs['post_uuid']).first()
+
+    def hidden_post_response(self, response):
+        """
+        get_queryset leaves no comments of a hidden or missing post, so an
+        empty listing is told apart from one of those, with one more
+        query, only when it comes back empty.
+        """
+        if self.get_post() is None:
+            return Response({'error': 'Wrong UUID'}, status=status.HTTP_404_NOT_FOUND)
+        return response
+
     def list(self, request, post_uuid=None):
-        deleted_with_children = PostComment.objects\
-            .filter(
-                parent=None,
-                post__uuid=post_uuid,
-                is_removed=True)\
-            .exclude(comments=None).distinct()
-        queryset = self.get_queryset().filter(parent=None, is_removed=False).distinct()
-        queryset = queryset | deleted_with_children
-        return self.paginated_response(queryset)
+        queryset = visible_comments(self.get_queryset().filter(parent=None))\
+            .select_related('user')\
+            .order_by('created_at')\
+            .prefetch_related('mentioned_users')
+        response = self.paginated_response(queryset)
+        if response.status_code == status.HTTP_200_OK and not response.data['results']:
+            return self.hidden_post_response(response)
+        return response
 
     def create(self, request, post_uuid=None):
         data = request.data
@@ -62,19 +102,18 @@ class PostCommentViewSet(BaseViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
         if post_uuid is not None:
-            try:
-                data['post'] = Post.objects.get(uuid=post_uuid).pk
-            except Post.DoesNotExist:
+            post = self.get_post()
+            if post is None:
                 return Response({'error': 'Wrong UUID'}, status=status.HTTP_404_NOT_FOUND)
+            data['post'] = post.pk
         else:
             return Response({'error': 'Error in route'}, status=status.HTTP_400_BAD_REQUEST)
         serializer_class = self.get_serializer_class()
         serializer = serializer_class(data=data)
         if serializer.is_valid():
             comment = serializer.save()
-            if mentioned_users is not None:
-                for user in mentioned_users:
-                    comment = add_mentioned_users(user, comment)
+            if mentioned_users:
+                comment = add_mentioned_users(comment, mentioned_users)
             serializer = PostCommentSerializer(instance=comment)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -112,20 +151,73 @@ class PostCommentViewSet(BaseViewSet):
                 {'error' : 'User not authorized'},
                 status=status.HTTP_401_UNAUTHORIZED
             )
-        comment.is_removed = True
-        comment.save()
+        if not comment.is_removed:
+            with transaction.atomic():
+                comment.is_removed = True
+                comment.save()
+                adjust_child_count(comment.parent_id, -1)
         return Response({'success': True}, status=status.HTTP_200_OK)
 
     @action(detail=True)
     def children(self, request, post_uuid=None, pk=None):
         comment = self.get_object()
-        children_comments = PostComment.objects.filter(parent=comment)
-        deleted_with_children = children_comments.filter(is_removed=True)\
-            .exclude(comments=None).distinct()
-        queryset = children_comments.filter(is_removed=False).distinct()
-        queryset = queryset | deleted_with_children
+        queryset = visible_comments(PostComment.objects.filter(parent=comment))\
+            .select_related('user')\
+            .order_by('created_at')\
+            .prefetch_related('mentioned_users')
         return self.paginated_response(queryset)
 
+    @action(detail=False)
+    def thread(self, request, post_uuid=None):
+        """
+        Loads a whole comment tree in one query ordered by materialized path
+        and returns it nested. ``depth`` bounds the number of levels and
+        ``limit`` the number of comments; ``parent`` loads the subtree
+        below that comment instead of the whole post.
+        """
+        try:
+            depth = min(int(request.query_params.get('depth', 3)), self.THREAD_MAX_DEPTH)
+            limit = min(int(request.query_params.get('limit', 200)), self.THREAD_MAX_LIMIT)
+        except ValueError:
+            return Response(
+                {'error': 'depth and limit must be integers'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if depth < 1 or limit < 1:
+            return Response(
+                {'error': 'depth and limit must be positive'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        queryset = self.get_queryset()
+        parent_id = request.query_params.get('parent')
+        if parent_id is not None:
+            try:
+                parent = queryset.get(pk=parent_id)
+            except (PostComment.DoesNotExist, ValueError):
+                return Response({'error': 'Wrong parent'}, status=status.HTTP_404_NOT_FOUND)
+            queryset = queryset.filter(
+                path__startswith=parent.path + '/',
+                depth__lte=parent.depth + depth)
+        else:
+            queryset = queryset.filter(depth__lt=depth)
+
+        # one extra row tells whether the thread goes on past ``limit``
+        comments = list(
+            visible_comments(queryset)
+            .select_related('user')
+            .prefetch_related('mentioned_users')
+            .order_by('path')[:limit + 1]
+        )
+        serializer = PostCommentSerializer(comments[:limit], many=True)
+        response = Response({
+            'results': nest_comments(serializer.data),
+            'truncated': len(comments) > limit,
+        }, status=status.HTTP_200_OK)
+        if not comments:
+            return self.hidden_post_response(response)
+        return response
+
     @action(detail=True)
     def check_vote(self, request, post_uuid=None, pk=None):
         vote = False
@@ -139,16 +231,8 @@ class PostCommentViewSet(BaseViewSet):
 
     def _common_vote_method(self, request, method):
         comment = self.get_object()
-        user = request.user
-        vote, created = PostCommentVote.objects.get_or_create(post_comment=comment, user=user)
-        if method == "upvote":
-            vote.vote = 1
-        elif method == "downvote":
-            vote.vote = -1
-        else:
-            vote.vote = 0
-        vote.save()
-        return Response({"vote": vote.vote, "votes": comment.score}, status=status.HTTP_200_OK)
+        vote = cast_comment_vote(comment, request.user, VOTE_VALUES[method])
+        return Response({"vote": vote, "votes": comment.score}, status=status.HTTP_200_OK)
 
     @action(detail=True, methods=['put'])
     def upvote(self, request, post_uuid=None, pk=None):
@@ -0,0 +1,195 @@
+"""
+Response cache for anonymous reads.
+
+Cached responses are keyed by request path and stored together with the
+versions of the namespaces they were built from, e.g. ``posts`` for the
+post listings or ``posts:<uuid>`` for one post. Writes bump those versions
+(see core.signals), which turns matching entries stale instead of deleting
+them: within RESPONSE_CACHE_STALE seconds a stale entry keeps being served
+while a single request, holding a short lock, rebuilds it.
+
+Entries also go stale after RESPONSE_CACHE_TIMEOUT seconds, which bounds
+how long changes that bump no version (e.g. a renamed author) stay visible.
+The cache used is settings.RESPONSE_CACHE_ALIAS. It has to be shared by
+every process serving the app, or a bump would only reach the process of
+the write: local memory only works for a single process, several workers
+need e.g. memcached/redis, or a file based cache on one node. The check
+core.E001 enforces this, see core.checks.
+
+With DATABASE_REPLICAS a bump also marks its namespaces as recently
+bumped for as long as a replica may miss the write, so that their reads
+go to the primary instead of pairing the new version with an old body,
+see core.mixins.ReplicaReadMixin.
+"""
+from functools import wraps
+from hashlib import md5
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.response import Response
+
+
+def get_cache():
+    return caches[settings.RESPONSE_CACHE_ALIAS]
+
+
+def _version_key(namespace):
+    return f'version:{namespace}'
+
+
+def _bumped_key(namespace):
+    return f'bumped:{namespace}'
+
+
+def _seed():
+    # versions start from the clock so that a version key evicted from the
+    # cache never comes back with a number an older entry was stored under
+    return int(time.time() * 1000)
+
+
+def get_versions(namespaces):
+    """
+    Returns the current version of each namespace as a tuple.
+    """
+    cache = get_cache()
+    keys = [_version_key(namespace) for namespace in namespaces]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            cache.add(key, _seed(), timeout=None)
+            found[key] = cache.get(key)
+    return tuple(found[key] for key in keys)
+
+
+def bump_version(*namespaces):
+    """
+    Marks every cached response built from ``namespaces`` as stale.
+    """
+    cache = get_cache()
+    for namespace in namespaces:
+        key = _version_key(namespace)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _seed(), timeout=None)
+    if settings.DATABASE_REPLICAS:
+        # a replica is only dropped once a health check sees it lag more
+        # than REPLICA_MAX_LAG, so it may lag that much plus one interval
+        window = math.ceil(settings.REPLICA_MAX_LAG + settings.REPLICA_CHECK_INTERVAL)
+        cache.set_many(
+            {_bumped_key(namespace): True for namespace in namespaces}, timeout=window)
+
+
+def recently_bumped(namespaces):
+    """
+    Whether a replica may not have caught up yet with the writes behind
+    the last bump of one of ``namespaces``.
+    """
+    if not settings.DATABASE_REPLICAS or not namespaces:
+        return False
+    return bool(get_cache().get_many([_bumped_key(namespace) for namespace in namespaces]))
+
+
+def object_namespace(namespace, key):
+    return f'{namespace}:{key}'
+
+
+def viewer_namespace(user_id):
+    """
+    Namespace of what a user sees differently from everyone else: their
+    bookmarks, member requests and memberships, see core.signals.
+    """
+    return object_namespace('viewer', user_id)
+
+
+def bump_object(namespace, key):
+    """
+    Marks the listings of ``namespace`` and the detail responses of the
+    object ``key`` as stale.
+    """
+    bump_version(namespace, object_namespace(namespace, key))
+
+
+def bump_all(namespace):
+    """
+    Marks the listings and every detail response of ``namespace`` as stale,
+    for bulk writes that do not know which objects changed.
+    """
+    bump_version(namespace, object_namespace(namespace, '*'))
+
+
+def cached_response(depends=()):
+    """
+    Caches the response of a viewset action for anonymous GET requests.
+
+    The namespaces the response depends on come from the viewset's
+    ``get_cache_namespaces`` (see core.mixins.ConditionalResponseMixin),
+    plus ``depends`` for actions embedding other resources.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(self, request, *args, **kwargs):
+            if request.method != 'GET' or request.user.is_authenticated:
+                return func(self, request, *args, **kwargs)
+            namespaces = self.get_cache_namespaces() + list(depends)
+            return _cached(request, namespaces, lambda: func(self, request, *args, **kwargs))
+        return wrapper
+    return decorator
+
+
+VALIDATOR_HEADERS = ('ETag', 'Last-Modified')
+
+
+def _cached(request, namespaces, build):
+    cache = get_cache()
+    path = md5(request.get_full_path().encode('utf-8')).hexdigest()
+    key = f'response:{path}'
+    lock_key = f'response-lock:{path}'
+    fresh_for = settings.RESPONSE_CACHE_TIMEOUT
+    stale_for = settings.RESPONSE_CACHE_STALE
+
+    versions = get_versions(namespaces)
+    entry = cache.get(key)
+    locked = False
+    if entry is not None:
+        age = time.time() - entry['created']
+        if entry['versions'] == versions and age < fresh_for:
+            return _replay(request, entry, 'HIT')
+        locked = cache.add(lock_key, 1, timeout=settings.RESPONSE_CACHE_LOCK_TIMEOUT)
+        if not locked and age < fresh_for + stale_for:
+            # another request is already rebuilding this entry
+            return _replay(request, entry, 'STALE')
+
+    try:
+        response = build()
+        if response.status_code == 200 and isinstance(response, Response):
+            cache.set(key, {
+                'data': response.data,
+                'status': response.status_code,
+                'headers': {
+                    header: response[header]
+                    for header in VALIDATOR_HEADERS if response.has_header(header)
+                },
+                'versions': versions,
+                'created': time.time(),
+            }, timeout=fresh_for + stale_for)
+            response['X-Cache'] = 'MISS'
+        return response
+    finally:
+        if locked:
+            cache.delete(lock_key)
+
+
+def _replay(request, entry, state):
+    headers = entry['headers']
+    etag = headers.get('ETag')
+    if etag is not None and etag in request.META.get('HTTP_IF_NONE_MATCH', ''):
+        response = Response(status=304)
+    else:
+        response = Response(entry['data'], status=entry['status'])
+    for header, value in headers.items():
+        response[header] = value
+    response['X-Cache'] = state
+    return response
@@ -0,0 +1,42 @@
+"""
+System checks of settings that only hold within one process.
+"""
+from django.conf import settings
+from django.core.checks import Error, register
+
+
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+)
+
+# settings naming a cache alias whose entries every process must share:
+# a write bumps or drops the entry once, for every worker
+SHARED_CACHE_SETTINGS = (
+    'RESPONSE_CACHE_ALIAS',
+    'GROUP_ROLE_CACHE_ALIAS',
+)
+
+
+@register()
+def check_shared_caches(app_configs, **kwargs):
+    """
+    With more than WEB_CONCURRENCY = 1 process, e.g. gunicorn workers, a
+    process local cache would only see the invalidations of the writes
+    its own process served, and keep serving stale responses, validators
+    and permissions elsewhere.
+    """
+    if settings.WEB_CONCURRENCY <= 1:
+        return []
+    errors = []
+    for name in SHARED_CACHE_SETTINGS:
+        alias = getattr(settings, name)
+        backend = settings.CACHES[alias]['BACKEND']
+        if backend in PROCESS_LOCAL_CACHES:
+            errors.append(Error(
+                f"{name} uses the process local cache '{alias}' ({backend}) "
+                f"while WEB_CONCURRENCY is {settings.WEB_CONCURRENCY}.",
+                hint='Set CACHE_BACKEND and CACHE_LOCATION to a cache shared by '
+                     'every process, e.g. memcached, redis or a FileBasedCache directory.',
+                id='core.E001',
+            ))
+    return errors
@@ -0,0 +1,157 @@
+"""
+Database connection management.
+
+Connections persist between requests for CONN_MAX_AGE seconds, so a
+request does not pay for a new connection, with TLS and authentication,
+every time. A persistent connection can die while idle, when the server
+restarts or a proxy drops it; with CONN_HEALTH_CHECKS the connections a
+request would reuse are checked first by ``check_connections`` and closed
+if unusable, so the request opens a fresh one instead of failing.
+
+With DB_POOL_SIZE set the connections are taken from a per process
+ConnectionPool instead, shared by the threads of a threaded gunicorn
+worker (see the backends in core.db.backends), and returned to it at the
+end of each request.
+
+The reads of API read actions can go to read replicas, see core.db.routers.
+"""
+from queue import Empty, LifoQueue
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+
+
+def check_connections(**kwargs):
+    """
+    Closes the persistent connections that stopped working, connected to
+    ``request_started`` after Django closed the expired ones.
+    """
+    if not settings.CONN_HEALTH_CHECKS:
+        return
+    for connection in connections.all():
+        if connection.connection is not None and not connection.in_atomic_block \
+                and not connection.is_usable():
+            connection.close()
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    """
+    At most ``size`` DB-API connections made by ``connect``. ``acquire``
+    hands out an idle connection, newest first, or makes a new one below
+    ``size``, else waits up to ``timeout`` seconds for one to be released.
+    Connections idle for more than ``check_after`` seconds are pinged
+    before they are handed out, and dropped if that fails.
+    """
+
+    def __init__(self, connect, size, timeout=10, check_after=30):
+        self.connect = connect
+        self.size = size
+        self.timeout = timeout
+        self.check_after = check_after
+        self.idle = LifoQueue()
+        self.opened = 0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                connection, released_at = self.idle.get_nowait()
+            except Empty:
+                with self.lock:
+                    if self.opened < self.size:
+                        self.opened += 1
+                        break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeout(f'No database connection free after {self.timeout}s')
+                try:
+                    connection, released_at = self.idle.get(timeout=remaining)
+                except Empty:
+                    continue
+            if time.monotonic() - released_at < self.check_after or self._ping(connection):
+                return connection
+            self._discard(connection)
+        try:
+            return self.connect()
+        except Exception:
+            with self.lock:
+                self.opened -= 1
+            raise
+
+    def release(self, connection):
+        """
+        Returns ``connection`` to the pool, rolling back what it left open.
+        """
+        try:
+            connection.rollback()
+        except Exception:
+            self._discard(connection)
+        else:
+            self.idle.put((connection, time.monotonic()))
+
+    def _ping(self, connection):
+        try:
+            cursor = connection.cursor()
+            cursor.execute('SELECT 1')
+            cursor.close()
+        except Exception:
+            return False
+        return True
+
+    def _discard(self, connection):
+        with self.lock:
+            self.opened -= 1
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def close(self):
+        """
+        Closes the idle connections.
+        """
+        while True:
+            try:
+                connection, _ = self.idle.get_nowait()
+            except Empty:
+                return
+            self._discard(connection)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class PooledDatabaseWrapperMixin:
+    """
+    Takes the connections of a database wrapper from a ConnectionPool of
+    the ``POOL_SIZE`` setting of the database, and gives them back when
+    Django closes them.
+    """
+
+    def get_pool(self):
+        with _pools_lock:
+            pool = _pools.get(self.alias)
+            if pool is None:
+                pool = _pools[self.alias] = ConnectionPool(
+                    self._connect, self.settings_dict['POOL_SIZE'],
+                    timeout=self.settings_dict.get('POOL_TIMEOUT', 10))
+            return pool
+
+    def _connect(self):
+        return super().get_new_connection(self.get_connection_params())
+
+    def get_new_connection(self, conn_params):
+        return self.get_pool().acquire()
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.get_pool().release(self.connection)
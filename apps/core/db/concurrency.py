@@ -0,0 +1,76 @@
+"""
+Independent queries of a request run at the same time.
+
+``run_concurrently`` hands its calls to a per process pool of QUERY_THREADS
+threads, so e.g. the row count and the rows of a page, or the comment
+counts, votes and bookmarks of its posts, cost the time of the slowest
+query rather than the sum of all of them. Each thread has its own
+connections, kept for CONN_MAX_AGE seconds or given back to the pool of
+core.db after every call, and runs in a copy of the caller's context, so
+it reads from the replica the request was routed to, see core.db.routers,
+and its queries count towards the caller's core.instrumentation captures.
+
+The calls run one after the other in the calling thread when QUERY_THREADS
+is 0, when called from a pool thread, and inside a transaction, whose
+uncommitted rows the connections of other threads would not see.
+"""
+from concurrent.futures import ThreadPoolExecutor, wait
+import contextvars
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+
+from core.instrumentation import continue_captures
+
+
+_executor = None
+_executor_lock = threading.Lock()
+_local = threading.local()
+
+
+def _start_worker():
+    _local.worker = True
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                settings.QUERY_THREADS, thread_name_prefix='query', initializer=_start_worker)
+        return _executor
+
+
+def _in_transaction():
+    return any(connection.in_atomic_block for connection in connections.all())
+
+
+def _run(call):
+    try:
+        with continue_captures():
+            return call()
+    finally:
+        close_old_connections()
+
+
+def run_concurrently(*calls):
+    """
+    Calls each of ``calls`` without arguments, see the module docstring,
+    and returns their results in order. Errors are raised once every call
+    finished, the first one in the order of ``calls``.
+    """
+    if len(calls) < 2 or settings.QUERY_THREADS < 1 \
+            or getattr(_local, 'worker', False) or _in_transaction():
+        return [call() for call in calls]
+    executor = get_executor()
+    futures = [
+        executor.submit(contextvars.copy_context().run, _run, call)
+        for call in calls[1:]
+    ]
+    # the first call runs here rather than leaving this thread waiting
+    try:
+        first = calls[0]()
+    finally:
+        wait(futures)
+    return [first] + [future.result() for future in futures]
@@ -0,0 +1,199 @@
+"""
+Read replica routing.
+
+ReplicaRouter sends the reads of a request to a replica once ``use_replicas``
+was called for it, which the API viewsets do for their read actions, see
+core.mixins.ReplicaReadMixin. Replicas are picked by weighted round robin
+over DATABASE_REPLICAS, a dict of alias and weight, skipping the replicas
+that failed their last health check or lag more than REPLICA_MAX_LAG
+seconds behind the primary. Each process checks its replicas every
+REPLICA_CHECK_INTERVAL seconds.
+
+Everything else goes to the primary, ``default``: writes, reads inside a
+transaction, reads outside the read actions, reads after the request wrote
+anything, reads when no replica is healthy, and every read of a client for
+REPLICA_PIN_SECONDS after one of its requests wrote, so users see their own
+votes and comments even when the replicas lag behind. That last window is
+kept in the PIN_COOKIE cookie, set by core.middleware.ReplicaRoutingMiddleware,
+which also holds the routing state of each request.
+"""
+from contextvars import ContextVar
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+
+
+logger = logging.getLogger('core.db')
+
+PIN_COOKIE = 'db_pin'
+
+LAG_SQL = {
+    'postgresql': """
+        SELECT CASE
+            WHEN NOT pg_is_in_recovery()
+                OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+            ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+        END
+    """,
+}
+
+
+class RoutingState:
+    def __init__(self):
+        self.replica = None
+        self.wrote = False
+
+
+_state = ContextVar('replica_routing', default=None)
+
+
+def begin_request():
+    """
+    Starts routing a request, returns the token ``end_request`` needs.
+    """
+    return _state.set(RoutingState())
+
+
+def end_request(token):
+    """
+    Stops routing the request started with ``token``, returns its state.
+    """
+    state = _state.get()
+    _state.reset(token)
+    return state
+
+
+def is_pinned(request):
+    try:
+        return float(request.COOKIES.get(PIN_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def pin_to_primary(response):
+    """
+    Sends the reads of the client of ``response`` to the primary for
+    REPLICA_PIN_SECONDS.
+    """
+    response.set_cookie(
+        PIN_COOKIE, str(int(time.time()) + settings.REPLICA_PIN_SECONDS),
+        max_age=settings.REPLICA_PIN_SECONDS, httponly=True, samesite='Lax')
+
+
+def replica_lag(alias):
+    """
+    Returns how many seconds the replica ``alias`` is behind the primary,
+    0 where the database cannot tell. Raises if the replica is unusable.
+    """
+    connection = connections[alias]
+    with connection.cursor() as cursor:
+        cursor.execute(LAG_SQL.get(connection.vendor, 'SELECT 0'))
+        lag = cursor.fetchone()[0]
+    return float(lag or 0)
+
+
+class ReplicaSet:
+    """
+    Smooth weighted round robin over the healthy DATABASE_REPLICAS: every
+    pick adds each replica's weight to its score and takes the highest
+    score, minus the total weight, so a replica of weight 2 and one of
+    weight 1 are picked a, b, a, a, b, a... rather than in bursts.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.scores = {}
+        self.healthy = {}
+        self.checked_at = None
+
+    def check(self):
+        healthy = {}
+        for alias in settings.DATABASE_REPLICAS:
+            try:
+                lag = replica_lag(alias)
+            except Exception:
+                logger.warning('replica %s is unusable', alias, exc_info=True)
+                connections[alias].close()
+                healthy[alias] = False
+                continue
+            healthy[alias] = lag <= settings.REPLICA_MAX_LAG
+            if not healthy[alias]:
+                logger.warning('replica %s lags %.1fs behind', alias, lag)
+        self.healthy = healthy
+
+    def _check_if_due(self):
+        now = time.monotonic()
+        if self.checked_at is not None and now - self.checked_at < settings.REPLICA_CHECK_INTERVAL:
+            return
+        # one thread checks, the others keep using the last results
+        if self.lock.acquire(blocking=self.checked_at is None):
+            try:
+                self.checked_at = now
+                self.check()
+            finally:
+                self.lock.release()
+
+    def choose(self):
+        """
+        Returns the alias of the next replica to read from, or None if no
+        replica is healthy.
+        """
+        self._check_if_due()
+        with self.lock:
+            weights = {
+                alias: weight for alias, weight in settings.DATABASE_REPLICAS.items()
+                if self.healthy.get(alias, False) and weight > 0
+            }
+            if not weights:
+                return None
+            for alias, weight in weights.items():
+                self.scores[alias] = self.scores.get(alias, 0) + weight
+            chosen = max(weights, key=lambda alias: self.scores[alias])
+            self.scores[chosen] -= sum(weights.values())
+            return chosen
+
+    def reset(self):
+        with self.lock:
+            self.scores, self.healthy, self.checked_at = {}, {}, None
+
+
+replicas = ReplicaSet()
+
+
+def use_replicas(request):
+    """
+    Lets the rest of the current request read from a replica, unless its
+    client is pinned to the primary.
+    """
+    state = _state.get()
+    if state is None or state.wrote or state.replica is not None \
+            or not settings.DATABASE_REPLICAS or is_pinned(request):
+        return
+    state.replica = replicas.choose()
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or state.wrote or state.replica is None \
+                or connections['default'].in_atomic_block:
+            # not None, which would read related objects where their
+            # instance came from
+            return 'default'
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
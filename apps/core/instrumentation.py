@@ -0,0 +1,251 @@
+"""
+SQL instrumentation.
+
+``capture_sql`` counts the statements run on a connection, the time spent
+in them and the rows fetched back, by wrapping every cursor the
+connection hands out while it is active. Unlike CaptureQueriesContext it
+does not need DEBUG and does not keep the SQL text, so it is cheap enough
+to leave on around whole requests.
+
+Given a QueryProfile instead, it also groups the statements by
+fingerprint, their SQL with literals and IN lists collapsed, and
+attributes each to the serializer field that issued it, which is what
+core.middleware.SQLProfileMiddleware reports for sampled requests.
+
+``capture_all_sql`` does the same on every database alias, so requests
+whose reads go to a replica (see core.db.routers) are counted in full.
+
+Captures follow the queries core.db.concurrency runs on other threads.
+"""
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+import re
+import sys
+import time
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework.fields import Field
+from rest_framework.serializers import BaseSerializer, ListSerializer
+
+
+class QueryStats:
+    """
+    Totals of the statements run while a capture was active.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.rows = 0
+        self.duration = 0.0
+
+    @property
+    def duration_ms(self):
+        return self.duration * 1000
+
+    def add_query(self, sql, duration):
+        self.queries += 1
+        self.duration += duration
+
+    def as_dict(self):
+        return {
+            'queries': self.queries,
+            'rows': self.rows,
+            'sql_ms': round(self.duration_ms, 2),
+        }
+
+
+FINGERPRINT_RULES = (
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'%s'), '?'),
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)'), '(...)'),
+    (re.compile(r'\s+'), ' '),
+)
+
+
+def fingerprint(sql):
+    """
+    Normalizes ``sql`` so that statements differing only in their
+    parameters, literals or the length of IN lists compare equal.
+    """
+    for pattern, replacement in FINGERPRINT_RULES:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+def serializer_source(frame):
+    """
+    Names the serializer field whose code runs in ``frame`` or one of its
+    callers, e.g. ``PostSerializer.author`` for a relation loaded by that
+    field or ``PostSerializer.get_comments_count`` for a method field.
+    Returns None outside serializers.
+    """
+    while frame is not None:
+        instance = frame.f_locals.get('self', None)
+        if isinstance(instance, Field):
+            parent = getattr(instance, 'parent', None)
+            if getattr(instance, 'field_name', None) and parent is not None and not isinstance(parent, ListSerializer):
+                return f'{type(parent).__name__}.{instance.field_name}'
+            if isinstance(instance, ListSerializer):
+                return f'{type(instance.child).__name__}(many=True)'
+            if isinstance(instance, BaseSerializer):
+                return f'{type(instance).__name__}.{frame.f_code.co_name}'
+        frame = frame.f_back
+    return None
+
+
+class QueryProfile(QueryStats):
+    """
+    QueryStats which also counts statements per fingerprint and per
+    serializer field. Slower, for sampled requests only.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.fingerprints = Counter()
+        self.durations = Counter()
+        self.sources = {}
+
+    def add_query(self, sql, duration):
+        super().add_query(sql, duration)
+        key = fingerprint(sql)
+        self.fingerprints[key] += 1
+        self.durations[key] += duration
+        # skips add_query, _timed and execute of CountingCursor
+        source = serializer_source(sys._getframe(3)) or 'view'
+        self.sources.setdefault(key, Counter())[source] += 1
+
+    def duplicates(self, threshold):
+        """
+        Fingerprints run more than ``threshold`` times, most frequent first,
+        with where they were run from.
+        """
+        return [
+            {
+                'sql': key,
+                'count': count,
+                'sql_ms': round(self.durations[key] * 1000, 2),
+                'sources': dict(self.sources[key].most_common()),
+            }
+            for key, count in self.fingerprints.most_common()
+            if count > threshold
+        ]
+
+
+class CountingCursor:
+    """
+    Wraps a Django cursor, adding what goes through it to ``stats``.
+    """
+
+    def __init__(self, cursor, stats):
+        self.cursor = cursor
+        self.stats = stats
+
+    def __getattr__(self, attr):
+        return getattr(self.cursor, attr)
+
+    def __iter__(self):
+        for row in self.cursor:
+            self.stats.rows += 1
+            yield row
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.cursor.close()
+
+    def _timed(self, sql, method, *args):
+        started = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            self.stats.add_query(sql, time.perf_counter() - started)
+
+    def execute(self, sql, params=None):
+        return self._timed(sql, self.cursor.execute, sql, params)
+
+    def executemany(self, sql, param_list):
+        return self._timed(sql, self.cursor.executemany, sql, param_list)
+
+    def callproc(self, procname, params=None, kparams=None):
+        return self._timed(procname, self.cursor.callproc, procname, params, kparams)
+
+    def fetchone(self):
+        row = self.cursor.fetchone()
+        if row is not None:
+            self.stats.rows += 1
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self.cursor.fetchmany(size) if size is not None else self.cursor.fetchmany()
+        self.stats.rows += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self.cursor.fetchall()
+        self.stats.rows += len(rows)
+        return rows
+
+
+_active = ContextVar('sql_captures', default=())
+
+
+@contextmanager
+def continue_captures():
+    """
+    Counts the statements run on this thread inside the block into the
+    captures active in the current context, started on another thread.
+    """
+    with ExitStack() as stack:
+        for using, stats in _active.get():
+            stack.enter_context(capture_sql(using, stats))
+        yield
+
+
+@contextmanager
+def capture_sql(using=DEFAULT_DB_ALIAS, stats=None):
+    """
+    Counts the statements run on the connection ``using`` inside the block
+    into ``stats``, a new QueryStats unless given, which is yielded.
+    """
+    stats = QueryStats() if stats is None else stats
+    connection = connections[using]
+    # cursors are made by bound methods, shadowed on the instance while
+    # capturing; captures nest since the inner one wraps the outer one
+    saved = {}
+    for name in ('make_cursor', 'make_debug_cursor'):
+        saved[name] = vars(connection).get(name)
+        setattr(connection, name, _counting(getattr(connection, name), stats))
+    active = _active.get()
+    token = None if (using, stats) in active else _active.set(active + ((using, stats),))
+    try:
+        yield stats
+    finally:
+        if token is not None:
+            _active.reset(token)
+        for name, previous in saved.items():
+            if previous is None:
+                delattr(connection, name)
+            else:
+                setattr(connection, name, previous)
+
+
+@contextmanager
+def capture_all_sql(stats=None):
+    """
+    Counts the statements run on any connection inside the block into
+    ``stats``, see ``capture_sql``.
+    """
+    stats = QueryStats() if stats is None else stats
+    with ExitStack() as stack:
+        for using in connections:
+            stack.enter_context(capture_sql(using, stats))
+        yield stats
+
+
+def _counting(make_cursor, stats):
+    def make(cursor):
+        return CountingCursor(make_cursor(cursor), stats)
+    return make
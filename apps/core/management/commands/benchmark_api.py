@@ -0,0 +1,234 @@
+from collections import namedtuple
+import json
+import math
+import os
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from rest_framework.test import APIClient
+
+from comments.models import PostComment
+from core.instrumentation import capture_all_sql
+from groups.models import Group
+from posts.models import Post
+from tags.models import Tag
+
+
+Endpoint = namedtuple('Endpoint', ['name', 'path', 'authenticated'])
+
+# GET endpoints of the posts, comments, groups, profiles, tags and reports
+# routers; placeholders are filled from the dataset, see Command._fixtures
+ENDPOINTS = (
+    Endpoint('posts-list', '/api/v1/posts/', False),
+    Endpoint('posts-list-auth', '/api/v1/posts/', True),
+    Endpoint('posts-hot', '/api/v1/posts/?sort=hot', False),
+    Endpoint('posts-top-week', '/api/v1/posts/?sort=top&t=week', False),
+    Endpoint('posts-rising', '/api/v1/posts/?sort=rising', False),
+    Endpoint('posts-by-author', '/api/v1/posts/?author={username}', False),
+    Endpoint('posts-detail', '/api/v1/posts/{post}/', False),
+    Endpoint('posts-self', '/api/v1/post/self/', True),
+    Endpoint('comments-list', '/api/v1/posts/{post}/comments/', False),
+    Endpoint('comments-thread', '/api/v1/posts/{post}/comments/thread/', False),
+    Endpoint('comments-detail', '/api/v1/posts/{post}/comments/{comment}/', False),
+    Endpoint('comments-children', '/api/v1/posts/{post}/comments/{comment}/children/', False),
+    Endpoint('comments-check-vote', '/api/v1/posts/{post}/comments/{comment}/check_vote/', True),
+    Endpoint('groups-list', '/api/v1/groups/', False),
+    Endpoint('groups-list-auth', '/api/v1/groups/', True),
+    Endpoint('groups-by-members', '/api/v1/groups/?sort=members', False),
+    Endpoint('groups-detail', '/api/v1/groups/{group}/', False),
+    Endpoint('groups-posts', '/api/v1/groups/{group}/posts/', False),
+    Endpoint('groups-posts-hot', '/api/v1/groups/{group}/posts/?sort=hot', True),
+    Endpoint('groups-members', '/api/v1/groups/{group}/members/', True),
+    Endpoint('groups-rules', '/api/v1/groups/{group}/rules/', True),
+    Endpoint('users-list', '/api/v1/users/', False),
+    Endpoint('users-detail', '/api/v1/users/{username}/', False),
+    Endpoint('users-auth', '/api/v1/users/auth/', True),
+    Endpoint('users-comments', '/api/v1/users/{username}/user_comments/', False),
+    Endpoint('users-upvotes', '/api/v1/users/{username}/user_upvotes/', False),
+    Endpoint('users-overview', '/api/v1/users/{username}/overview/', False),
+    Endpoint('users-bookmarks', '/api/v1/users/{username}/bookmarks/', True),
+    Endpoint('tags-list', '/api/v1/tags/', False),
+    Endpoint('tags-detail', '/api/v1/tags/{tag}/', False),
+    Endpoint('report-types-list', '/api/v1/report_types/', False),
+)
+
+METRICS = ('queries', 'rows', 'bytes', 'p95_ms')
+
+DEFAULT_BASELINE = os.path.join(settings.BASE_DIR, 'benchmarks', 'api_baseline.json')
+
+
+class Command(BaseCommand):
+    help = (
+        'Request every public API endpoint against the current dataset, '
+        'record latency, SQL queries, rows fetched and response size, and '
+        'fail when an endpoint exceeds its budget in the baseline'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=20, help='Timed requests per endpoint.')
+        parser.add_argument('--warmup', type=int, default=2, help='Untimed requests per endpoint.')
+        parser.add_argument(
+            '--warm', action='store_true',
+            help='Keep caches between requests instead of measuring cold requests.'
+        )
+        parser.add_argument('--only', help='Comma separated endpoint names.')
+        parser.add_argument('--output', help='Write the results as JSON to this file.')
+        parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+        parser.add_argument(
+            '--update-baseline', action='store_true',
+            help='Store the results as the new baseline, with budgets derived from them.'
+        )
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError('--requests must be at least 1')
+        endpoints = ENDPOINTS
+        if options['only']:
+            names = set(options['only'].split(','))
+            unknown = names - {endpoint.name for endpoint in ENDPOINTS}
+            if unknown:
+                raise CommandError(f"Unknown endpoints: {', '.join(sorted(unknown))}")
+            endpoints = [endpoint for endpoint in ENDPOINTS if endpoint.name in names]
+
+        fixtures = self._fixtures()
+        user = User.objects.get(username=fixtures['username'])
+        results = {}
+        for endpoint in endpoints:
+            try:
+                path = endpoint.path.format(**fixtures)
+            except KeyError as error:
+                self.stdout.write(f"{endpoint.name:<22} skipped, the dataset has no {error.args[0]}")
+                continue
+            results[endpoint.name] = self._measure(path, user if endpoint.authenticated else None, options)
+            self.stdout.write(self._format(endpoint.name, results[endpoint.name]))
+
+        if options['output']:
+            self._write(options['output'], {'fixtures': fixtures, 'endpoints': results})
+        if options['update_baseline']:
+            self._write(options['baseline'], {
+                'fixtures': fixtures,
+                'endpoints': {name: {'budget': self._budget(result), 'baseline': result}
+                    for name, result in results.items()}
+            })
+            self.stdout.write(f"Baseline written to {options['baseline']}")
+            return
+
+        failures = self._compare(results, options['baseline'])
+        if failures:
+            raise CommandError('Budgets exceeded:\n' + '\n'.join(failures))
+        self.stdout.write('All endpoints within budget')
+
+    def _fixtures(self):
+        """
+        Picks the heaviest objects of the dataset, so that detail endpoints
+        are measured at their worst: the most active author, the most
+        commented post and its most replied comment, the largest group.
+        """
+        fixtures = {}
+        author = Post.objects.order_by()\
+            .values('author__username')\
+            .annotate(total=Count('id'))\
+            .order_by('-total')\
+            .first()
+        if author is None:
+            raise CommandError('No posts found, generate a dataset first, e.g. with generate_dataset')
+        fixtures['username'] = author['author__username']
+        post = PostComment.objects.order_by()\
+            .values('post__uuid')\
+            .annotate(total=Count('id'))\
+            .order_by('-total')\
+            .first()
+        if post is not None:
+            fixtures['post'] = post['post__uuid']
+            comment = PostComment.objects\
+                .filter(post__uuid=post['post__uuid'])\
+                .order_by('-child_count', 'id')\
+                .first()
+            fixtures['comment'] = comment.pk
+        else:
+            fixtures['post'] = Post.objects.order_by('-score').values_list('uuid', flat=True).first()
+        group = Group.objects.order_by('-members_count', 'id').first()
+        if group is not None:
+            fixtures['group'] = group.pk
+        tag = Tag.objects.order_by('id').first()
+        if tag is not None:
+            fixtures['tag'] = tag.pk
+        return {key: str(value) for key, value in fixtures.items()}
+
+    def _measure(self, path, user, options):
+        client = APIClient(HTTP_HOST='localhost')
+        if user is not None:
+            client.force_authenticate(user=user)
+        timings = []
+        result = None
+        for position in range(options['warmup'] + options['requests']):
+            if not options['warm']:
+                for cache in caches.all():
+                    cache.clear()
+            started = time.perf_counter()
+            with capture_all_sql() as stats:
+                response = client.get(path)
+            elapsed = (time.perf_counter() - started) * 1000
+            if response.status_code != 200:
+                raise CommandError(f"GET {path} returned {response.status_code}")
+            if position < options['warmup']:
+                continue
+            timings.append(elapsed)
+            if result is None:
+                result = dict(stats.as_dict(), bytes=len(response.content))
+        result['p50_ms'] = round(self._percentile(timings, 50), 2)
+        result['p95_ms'] = round(self._percentile(timings, 95), 2)
+        return result
+
+    def _percentile(self, timings, percentile):
+        ordered = sorted(timings)
+        return ordered[min(len(ordered) - 1, len(ordered) * percentile // 100)]
+
+    def _format(self, name, result):
+        return (
+            f"{name:<22} p50 {result['p50_ms']:7.1f}ms  p95 {result['p95_ms']:7.1f}ms"
+            f"  {result['queries']:3} queries  {result['rows']:5} rows  {result['bytes']:7} bytes"
+        )
+
+    def _budget(self, result):
+        """
+        Query counts must not grow at all, rows and bytes by a quarter;
+        latency is noisy, so it gets three times the baseline.
+        """
+        return {
+            'queries': result['queries'],
+            'rows': math.ceil(result['rows'] * 1.25),
+            'bytes': math.ceil(result['bytes'] * 1.25),
+            'p95_ms': round(max(result['p95_ms'] * 3, result['p95_ms'] + 20), 1),
+        }
+
+    def _compare(self, results, baseline_path):
+        try:
+            with open(baseline_path) as baseline_file:
+                baseline = json.load(baseline_file)['endpoints']
+        except FileNotFoundError:
+            raise CommandError(f"No baseline at {baseline_path}, create it with --update-baseline")
+        failures = []
+        for name, result in results.items():
+            if name not in baseline:
+                self.stdout.write(f"{name} has no budget yet")
+                continue
+            budget = baseline[name]['budget']
+            for metric in METRICS:
+                if metric in budget and result[metric] > budget[metric]:
+                    failures.append(
+                        f"{name}: {metric} {result[metric]} over the budget of {budget[metric]}"
+                        f" (baseline {baseline[name]['baseline'].get(metric)})")
+        return failures
+
+    def _write(self, path, data):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w') as output:
+            json.dump(data, output, indent=2, sort_keys=True)
+            output.write('\n')
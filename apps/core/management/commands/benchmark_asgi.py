@@ -0,0 +1,259 @@
+from collections import namedtuple
+import http.client
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from rest_framework.authtoken.models import Token
+
+from comments.models import PostComment
+from core.checks import PROCESS_LOCAL_CACHES
+from groups.models import Group
+from posts.models import Post
+
+
+Mode = namedtuple('Mode', ['name', 'environment'])
+
+# the deployments of gunicorn.conf.py compared
+MODES = {
+    'wsgi': Mode('wsgi', {'ASYNC_VIEWS': 'False', 'GUNICORN_THREADS': '1'}),
+    'wsgi-threads': Mode('wsgi-threads', {'ASYNC_VIEWS': 'False'}),
+    'asgi': Mode('asgi', {'ASYNC_VIEWS': 'True'}),
+}
+
+# the routes AsyncViewMixin serves asynchronously, requested in turn
+PATHS = (
+    '/api/v1/posts/',
+    '/api/v1/posts/{post}/',
+    '/api/v1/posts/{post}/comments/thread/',
+    '/api/v1/groups/{group}/',
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Serve the current dataset with gunicorn, as WSGI and as ASGI, and '
+        'compare requests per second, latency and memory per concurrent '
+        'connection of the hot read endpoints'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--modes', default='wsgi,asgi',
+            help=f"Comma separated deployments among {', '.join(MODES)}."
+        )
+        parser.add_argument(
+            '--concurrency', default='1,16,64',
+            help='Comma separated numbers of concurrent client connections.'
+        )
+        parser.add_argument('--duration', type=float, default=10, help='Seconds per run.')
+        parser.add_argument('--workers', type=int, default=2, help='Gunicorn workers.')
+        parser.add_argument(
+            '--threads', type=int, default=8,
+            help='Threads per worker of the wsgi-threads deployment.'
+        )
+        parser.add_argument('--port', type=int, default=8089)
+        parser.add_argument(
+            '--anonymous', action='store_true',
+            help='Request as an anonymous client, whose reads mostly hit the response cache.'
+        )
+        parser.add_argument('--output', help='Write the results as JSON to this file.')
+
+    def handle(self, *args, **options):
+        modes = options['modes'].split(',')
+        unknown = set(modes) - set(MODES)
+        if unknown:
+            raise CommandError(f"Unknown modes: {', '.join(sorted(unknown))}")
+        levels = [int(level) for level in options['concurrency'].split(',')]
+        if options['duration'] <= 0 or min(levels) < 1:
+            raise CommandError('--duration and --concurrency must be positive')
+        fixtures = self._fixtures()
+        paths = [path.format(**fixtures) for path in PATHS]
+        headers = {}
+        if not options['anonymous']:
+            token, _ = Token.objects.get_or_create(user_id=fixtures['user'])
+            headers['Authorization'] = f'Token {token.key}'
+
+        results = {}
+        for name in modes:
+            server = self._start(MODES[name], options)
+            try:
+                self._wait_ready(options['port'], paths[0], headers)
+                # warm the caches and connections of every worker first
+                self._load(options['port'], paths, headers, max(levels), 2)
+                idle = self._rss(server.pid)
+                for level in levels:
+                    result = self._load(options['port'], paths, headers, level, options['duration'], server.pid)
+                    result['idle_rss_mb'] = round(idle / 1024, 1)
+                    result['kb_per_connection'] = round(max(result.pop('peak_rss') - idle, 0) / level, 1)
+                    results[f'{name}-{level}'] = result
+                    self.stdout.write(self._format(name, level, result))
+            finally:
+                self._stop(server)
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, indent=2, sort_keys=True)
+                output.write('\n')
+
+    def _fixtures(self):
+        """
+        The most commented post, the largest public group and the most
+        active author, who the requests are made as.
+        """
+        post = PostComment.objects.order_by()\
+            .values('post__uuid')\
+            .annotate(total=Count('id'))\
+            .order_by('-total')\
+            .first()
+        if post is not None:
+            post = post['post__uuid']
+        else:
+            post = Post.objects.exclude(status=Post.STATUS.DRAFT)\
+                .order_by('-score').values_list('uuid', flat=True).first()
+        group = Group.objects.exclude(group_type=Group.Type.PRIVATE)\
+            .order_by('-members_count', 'id').values_list('id', flat=True).first()
+        user = Post.objects.order_by()\
+            .values('author_id')\
+            .annotate(total=Count('id'))\
+            .order_by('-total')\
+            .values_list('author_id', flat=True)\
+            .first()
+        if post is None or group is None:
+            raise CommandError('No posts or groups found, generate a dataset first, e.g. with generate_dataset')
+        return {'post': str(post), 'group': group, 'user': user}
+
+    def _start(self, mode, options):
+        environment = dict(
+            os.environ,
+            PORT=str(options['port']),
+            WEB_CONCURRENCY=str(options['workers']),
+            GUNICORN_THREADS=str(options['threads']),
+            GUNICORN_MAX_REQUESTS='0',
+        )
+        if settings.CACHES['default']['BACKEND'] in PROCESS_LOCAL_CACHES:
+            # the workers need a shared cache, see core.checks
+            environment.update(
+                CACHE_BACKEND='django.core.cache.backends.filebased.FileBasedCache',
+                CACHE_LOCATION=tempfile.mkdtemp(prefix='benchmark-cache-'))
+        environment.update(mode.environment)
+        return subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py', '--log-level', 'warning'],
+            cwd=settings.BASE_DIR, env=environment)
+
+    def _wait_ready(self, port, path, headers, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+                connection.request('GET', path, headers=headers)
+                if connection.getresponse().status == 200:
+                    return
+            except OSError:
+                pass
+            time.sleep(0.2)
+        raise CommandError(f'The server did not answer on port {port} within {timeout}s')
+
+    def _stop(self, server):
+        server.send_signal(signal.SIGTERM)
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+            server.wait()
+
+    def _rss(self, pid):
+        """
+        Resident memory of ``pid`` and its children in KB, from /proc.
+        """
+        total = 0
+        pending = [pid]
+        while pending:
+            current = pending.pop()
+            try:
+                with open(f'/proc/{current}/status') as status:
+                    for line in status:
+                        if line.startswith('VmRSS:'):
+                            total += int(line.split()[1])
+                with open(f'/proc/{current}/task/{current}/children') as children:
+                    pending.extend(int(child) for child in children.read().split())
+            except OSError:
+                continue
+        return total
+
+    def _load(self, port, paths, headers, concurrency, duration, pid=None):
+        """
+        Keeps ``concurrency`` connections requesting ``paths`` in turn for
+        ``duration`` seconds while sampling the memory of the server.
+        """
+        deadline = time.monotonic() + duration
+        timings = []
+        errors = []
+        lock = threading.Lock()
+
+        def client(offset):
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            position = offset
+            local_timings = []
+            local_errors = 0
+            while time.monotonic() < deadline:
+                path = paths[position % len(paths)]
+                position += 1
+                started = time.perf_counter()
+                try:
+                    connection.request('GET', path, headers=headers)
+                    response = connection.getresponse()
+                    response.read()
+                    if response.status != 200:
+                        local_errors += 1
+                        continue
+                except (OSError, http.client.HTTPException):
+                    local_errors += 1
+                    connection.close()
+                    continue
+                local_timings.append(time.perf_counter() - started)
+            connection.close()
+            with lock:
+                timings.extend(local_timings)
+                errors.append(local_errors)
+
+        clients = [threading.Thread(target=client, args=(offset,)) for offset in range(concurrency)]
+        started = time.perf_counter()
+        for thread in clients:
+            thread.start()
+        peak_rss = 0
+        while any(thread.is_alive() for thread in clients):
+            if pid is not None:
+                peak_rss = max(peak_rss, self._rss(pid))
+            time.sleep(0.2)
+        for thread in clients:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        ordered = sorted(timings) or [0]
+        return {
+            'requests': len(timings),
+            'errors': sum(errors),
+            'rps': round(len(timings) / elapsed, 1),
+            'p50_ms': round(ordered[len(ordered) // 2] * 1000, 2),
+            'p95_ms': round(ordered[min(len(ordered) - 1, len(ordered) * 95 // 100)] * 1000, 2),
+            'peak_rss': peak_rss,
+            'peak_rss_mb': round(peak_rss / 1024, 1),
+        }
+
+    def _format(self, name, level, result):
+        return (
+            f"{name:<13} {level:>4} connections  {result['rps']:8.1f} req/s"
+            f"  p50 {result['p50_ms']:7.1f}ms  p95 {result['p95_ms']:7.1f}ms"
+            f"  rss {result['idle_rss_mb']:6.1f}MB idle {result['peak_rss_mb']:6.1f}MB peak"
+            f"  {result['kb_per_connection']:7.1f}KB/connection"
+            f"  {result['errors']} errors"
+        )
@@ -0,0 +1,101 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from feeds import services
+from feeds.models import FeedEntry
+from feeds.views import FeedViewSet
+from followers.models import UserFollower
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare p50/p95 latency of the home feed for users following many '
+        'sources, with fan-out-on-write and fan-out-on-read'
+    )
+    prefix = 'feedbench_'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', default='10,1000,10000',
+            help='Comma separated numbers of followed sources.'
+        )
+        parser.add_argument('--requests', type=int, default=20)
+        parser.add_argument('--posts-per-source', type=int, default=2)
+        parser.add_argument(
+            '--keep', action='store_true',
+            help='Keep the generated users and posts instead of deleting them.'
+        )
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        view = FeedViewSet.as_view({'get': 'list'})
+        try:
+            for size in sizes:
+                reader = self._setup(size, options['posts_per_source'])
+                line = f"{size:>6} sources:"
+                for mode, limit in (('write', size + 1), ('read', 0)):
+                    with override_settings(FEED_PUSH_MAX_FOLLOWERS=limit):
+                        services.get_cache().delete(services.PULL_SOURCES_KEY)
+                        timings = self._run(view, reader, options['requests'])
+                    line += (
+                        f"  {mode}: p50 {self._percentile(timings, 50):7.1f}ms"
+                        f" p95 {self._percentile(timings, 95):7.1f}ms"
+                    )
+                self.stdout.write(line)
+                if not options['keep']:
+                    self._cleanup()
+        finally:
+            services.get_cache().delete(services.PULL_SOURCES_KEY)
+            if not options['keep']:
+                self._cleanup()
+
+    def _setup(self, size, posts_per_source):
+        reader = User.objects.create(username=f'{self.prefix}reader')
+        User.objects.bulk_create([
+            User(username=f'{self.prefix}{i}') for i in range(size)
+        ], batch_size=1000)
+        authors = list(User.objects
+            .filter(username__startswith=self.prefix)
+            .exclude(pk=reader.pk))
+        UserFollower.objects.bulk_create([
+            UserFollower(follower=reader, followed_user=author) for author in authors
+        ], batch_size=1000)
+        Post.objects.bulk_create([
+            Post(title=f'{self.prefix}{author.pk}-{i}', content='Benchmark', author=author)
+            for author in authors for i in range(posts_per_source)
+        ], batch_size=1000)
+        # what fan-out-on-write would have stored for the reader
+        posts = list(Post.objects
+            .filter(author__in=authors)
+            .order_by('-created_at', '-id')
+            .only('pk', 'created_at'))
+        services.push_posts(posts, [reader.pk])
+        return reader
+
+    def _run(self, view, reader, requests):
+        factory = APIRequestFactory()
+        timings = []
+        for _ in range(requests):
+            request = factory.get('/api/v1/feed/')
+            force_authenticate(request, user=reader)
+            started = time.perf_counter()
+            response = view(request)
+            response.render()
+            timings.append((time.perf_counter() - started) * 1000)
+        return timings
+
+    def _percentile(self, timings, percentile):
+        ordered = sorted(timings)
+        return ordered[min(len(ordered) - 1, len(ordered) * percentile // 100)]
+
+    def _cleanup(self):
+        users = User.objects.filter(username__startswith=self.prefix)
+        FeedEntry.objects.filter(user__in=users).delete()
+        Post.objects.filter(author__in=users).delete()
+        UserFollower.objects.filter(follower__in=users).delete()
+        users.delete()
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core.votes import flush_votes
+
+
+class Command(BaseCommand):
+    help = 'Apply votes queued by buffered vote ingestion'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of buffered votes applied per transaction.'
+        )
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep flushing every --interval seconds instead of exiting.'
+        )
+        parser.add_argument(
+            '--interval', type=float, default=1.0,
+            help='Seconds to sleep between flushes with --loop.'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            flushed = flush_votes(batch_size=options['batch_size'])
+            if flushed or not options['loop']:
+                self.stdout.write(f"Flushed {flushed} votes")
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,366 @@
+from bisect import bisect
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import accumulate
+from multiprocessing import get_context
+import random
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from comments.models import PostComment
+from core.cache import bump_all
+from followers.models import UserFollower
+from groups.models import Group, GroupMember
+from posts.models import Post, PostVote
+from posts.ranking import ranks
+
+
+# posts per preset, the other sizes follow from the ratios below
+PRESETS = {
+    'tiny': 10 ** 4,
+    'small': 10 ** 5,
+    'medium': 10 ** 6,
+    'large': 10 ** 7,
+}
+POSTS_PER_USER = 10
+POSTS_PER_GROUP = 1000
+VOTES_PER_POST = 10
+COMMENTS_PER_POST = 2
+FOLLOWS_PER_USER = 20
+GROUPS_PER_USER = 3
+
+# texts are drawn from a pool of sentences built once per plan, joining
+# words for every row costs more than inserting it
+TEXT_POOL_SIZE = 1000
+
+# posts are generated in chunks of a fixed size, each from its own seed, so
+# a dataset only depends on --seed, not on --workers or --batch-size
+CHUNK_SIZE = 10000
+
+WORDS = (
+    'django python reddit group post comment vote feed cache index query '
+    'page cursor rank hot top new rising thread reply user follow member '
+    'admin moderator rule topic tag search report outbox replica pool'
+).split()
+
+GENERATED_MODELS = (User, Group, GroupMember, UserFollower, Post, PostVote, PostComment)
+
+
+class Zipf:
+    """
+    Samples ranks 0..n-1 with probability proportional to 1 / (rank + 1) ** s.
+    """
+
+    def __init__(self, n, s=1.1):
+        self.cumulative = list(accumulate(1 / (rank + 1) ** s for rank in range(n)))
+        self.total = self.cumulative[-1]
+
+    def sample(self, rng):
+        return bisect(self.cumulative, rng.random() * self.total)
+
+
+def heavy_tailed(rng, mean, alpha=1.5):
+    """
+    A Pareto distributed count with the given mean: most draws are small,
+    a few are very large, like votes per post or followers per user.
+    """
+    return int((rng.paretovariate(alpha) - 1) * mean * (alpha - 1))
+
+
+def sentence(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+
+@contextmanager
+def explicit_timestamps(models):
+    """
+    Lets bulk_create keep the created_at and updated_at values we set
+    instead of stamping every row with the current time.
+    """
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Plan:
+    """
+    Sizes, id ranges and samplers shared by the parent and the workers.
+    """
+
+    def __init__(self, options):
+        self.seed = options['seed']
+        self.batch_size = options['batch_size']
+        self.posts = options['posts']
+        self.users = options['users'] or max(self.posts // POSTS_PER_USER, 10)
+        self.groups = options['groups'] or max(self.posts // POSTS_PER_GROUP, 5)
+        self.votes_per_post = options['votes_per_post']
+        self.comments_per_post = options['comments_per_post']
+        self.now = timezone.now()
+        self.start = self.now - timedelta(days=options['days'])
+        self.span = (self.now - self.start).total_seconds()
+        self.first_id = {
+            model: (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+            for model in GENERATED_MODELS
+        }
+        self.prefix = f"gen{self.first_id[User]}_"
+        self.authors = Zipf(self.users)
+        self.communities = Zipf(self.groups)
+        rng = self.rng('texts', 0)
+        self.texts = {
+            length: [sentence(rng, length) for _ in range(TEXT_POOL_SIZE)]
+            for length in (8, 20, 60)
+        }
+
+    def user_id(self, rank):
+        return self.first_id[User] + rank
+
+    def group_id(self, rank):
+        return self.first_id[Group] + rank
+
+    def timestamp(self, position, total):
+        return self.start + timedelta(seconds=self.span * position / max(total, 1))
+
+    def random_time(self, rng):
+        return self.start + timedelta(seconds=self.span * rng.random())
+
+    def text(self, rng, length):
+        return rng.choice(self.texts[length])
+
+    def rng(self, phase, index):
+        return random.Random(f'{self.seed}:{phase}:{index}')
+
+    def id_block(self, model, chunk, per_post):
+        """
+        Ids are handed out per chunk up front so that replies can reference
+        their parent without reading back what was inserted. ``per_post``
+        is an upper bound of rows of ``model`` per post.
+        """
+        return self.first_id[model] + chunk * CHUNK_SIZE * per_post
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate a large synthetic dataset of users, groups, follows, posts, '
+        'votes and comments with heavy-tailed distributions, using bulk inserts'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--preset', choices=PRESETS, default='tiny')
+        parser.add_argument('--posts', type=int, help='Overrides the preset.')
+        parser.add_argument('--users', type=int, help=f'Defaults to posts / {POSTS_PER_USER}.')
+        parser.add_argument('--groups', type=int, help=f'Defaults to posts / {POSTS_PER_GROUP}.')
+        parser.add_argument('--votes-per-post', type=int, default=VOTES_PER_POST)
+        parser.add_argument('--comments-per-post', type=int, default=COMMENTS_PER_POST)
+        parser.add_argument('--days', type=int, default=365, help='Spread posts over this many days.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='Worker processes generating posts, votes and comments. '
+                'Only useful on databases with concurrent writers; SQLite uses one.'
+        )
+
+    def handle(self, *args, **options):
+        if options['posts'] is None:
+            options['posts'] = PRESETS[options['preset']]
+        workers = options['workers']
+        if connection.vendor == 'sqlite' and workers > 1:
+            self.stderr.write('SQLite allows one writer at a time, using a single worker')
+            workers = 1
+        if options['votes_per_post'] < 0 or options['comments_per_post'] < 0:
+            raise CommandError('Averages must not be negative')
+
+        started = time.perf_counter()
+        with explicit_timestamps(GENERATED_MODELS):
+            plan = Plan(options)
+            self._step('users', lambda: self._users(plan))
+            self._step('groups and members', lambda: self._groups(plan))
+            self._step('follows', lambda: self._follows(plan))
+            self._step('posts', lambda: self._posts(plan, workers))
+        self._reset_sequences()
+        for namespace in ('posts', 'groups', 'comments'):
+            bump_all(namespace)
+        self.stdout.write(f"Done in {time.perf_counter() - started:.1f}s, usernames start with {plan.prefix}")
+
+    def _step(self, name, generate):
+        started = time.perf_counter()
+        counts = generate()
+        elapsed = time.perf_counter() - started
+        details = ', '.join(f"{count} {label}" for label, count in counts.items())
+        self.stdout.write(f"{name}: {details} in {elapsed:.1f}s")
+
+    def _users(self, plan):
+        password = make_password(None)
+        rng = plan.rng('users', 0)
+        for start in range(0, plan.users, plan.batch_size):
+            rows = []
+            for rank in range(start, min(start + plan.batch_size, plan.users)):
+                joined = plan.random_time(rng)
+                rows.append(User(
+                    pk=plan.user_id(rank), username=f'{plan.prefix}{rank}',
+                    password=password, date_joined=joined))
+            User.objects.bulk_create(rows, batch_size=plan.batch_size)
+        return {'users': plan.users}
+
+    def _groups(self, plan):
+        rng = plan.rng('groups', 0)
+        groups, members = [], []
+        member_id = plan.first_id[GroupMember]
+        for rank in range(plan.groups):
+            created_at = plan.random_time(rng)
+            size = min(plan.users, 1 + heavy_tailed(
+                rng, plan.users * GROUPS_PER_USER / plan.groups))
+            user_ranks = rng.sample(range(plan.users), size)
+            for position, user_rank in enumerate(user_ranks):
+                members.append(GroupMember(
+                    pk=member_id, group_id=plan.group_id(rank), user_id=plan.user_id(user_rank),
+                    member_type=GroupMember.MemberTypes.ADMIN if position == 0
+                        else GroupMember.MemberTypes.MEMBER,
+                    created_at=created_at, updated_at=created_at))
+                member_id += 1
+            groups.append(Group(
+                pk=plan.group_id(rank), name=f'{plan.prefix}{rank}'[:25],
+                description=sentence(rng, 12), members_count=size,
+                created_at=created_at, updated_at=created_at))
+        with transaction.atomic():
+            Group.objects.bulk_create(groups, batch_size=plan.batch_size)
+            GroupMember.objects.bulk_create(members, batch_size=plan.batch_size)
+        return {'groups': len(groups), 'members': len(members)}
+
+    def _follows(self, plan):
+        rng = plan.rng('follows', 0)
+        follow_id = plan.first_id[UserFollower]
+        rows, total = [], 0
+        for rank in range(plan.users):
+            followers = min(plan.users - 1, heavy_tailed(rng, FOLLOWS_PER_USER))
+            sampled = rng.sample(range(plan.users), followers + 1)
+            for follower_rank in [other for other in sampled if other != rank][:followers]:
+                rows.append(UserFollower(
+                    pk=follow_id, follower_id=plan.user_id(follower_rank),
+                    followed_user_id=plan.user_id(rank),
+                    created_at=plan.now, updated_at=plan.now))
+                follow_id += 1
+            if len(rows) >= plan.batch_size:
+                UserFollower.objects.bulk_create(rows, batch_size=plan.batch_size)
+                total += len(rows)
+                rows = []
+        UserFollower.objects.bulk_create(rows, batch_size=plan.batch_size)
+        return {'follows': total + len(rows)}
+
+    def _posts(self, plan, workers):
+        chunks = range((plan.posts + CHUNK_SIZE - 1) // CHUNK_SIZE)
+        totals = {'posts': 0, 'votes': 0, 'comments': 0}
+        global _plan
+        _plan = plan
+        if workers > 1:
+            # forked workers inherit the plan and open their own connections
+            connections.close_all()
+            with get_context('fork').Pool(workers) as pool:
+                for counts in pool.imap_unordered(_generate_chunk, chunks):
+                    self._progress(totals, counts, plan)
+        else:
+            for chunk in chunks:
+                self._progress(totals, _generate_chunk(chunk), plan)
+        return totals
+
+    def _progress(self, totals, counts, plan):
+        for key, count in counts.items():
+            totals[key] += count
+        if totals['posts'] % (CHUNK_SIZE * 10) == 0 or totals['posts'] == plan.posts:
+            self.stdout.write(f"  {totals['posts']}/{plan.posts} posts, {totals['votes']} votes")
+
+    def _reset_sequences(self):
+        # explicit ids leave PostgreSQL sequences behind
+        statements = connection.ops.sequence_reset_sql(no_style(), GENERATED_MODELS)
+        if statements:
+            with connection.cursor() as cursor:
+                for sql in statements:
+                    cursor.execute(sql)
+
+
+_plan = None
+
+
+def _generate_chunk(chunk):
+    """
+    Generates and inserts the posts of one chunk with their votes and
+    comments, keeping the stored counters and ranks consistent.
+    """
+    plan = _plan
+    rng = plan.rng('posts', chunk)
+    first = chunk * CHUNK_SIZE
+    last = min(first + CHUNK_SIZE, plan.posts)
+    max_votes = min(plan.users, plan.votes_per_post * 50)
+    max_comments = plan.comments_per_post * 25
+    comment_id = plan.id_block(PostComment, chunk, max_comments)
+
+    posts, votes, comments = [], [], []
+    for position in range(first, last):
+        post_id = plan.first_id[Post] + position
+        created_at = plan.timestamp(position + rng.random(), plan.posts)
+        age = max((plan.now - created_at).total_seconds(), 1)
+        group_id = plan.group_id(plan.communities.sample(rng)) if rng.random() < 0.7 else None
+
+        upvotes = downvotes = 0
+        voters = rng.sample(range(plan.users), min(max_votes, heavy_tailed(rng, plan.votes_per_post)))
+        for voter in voters:
+            value = 1 if rng.random() < 0.75 else -1
+            if value > 0:
+                upvotes += 1
+            else:
+                downvotes += 1
+            voted_at = created_at + timedelta(seconds=rng.random() * age)
+            votes.append(PostVote(
+                post_id=post_id, user_id=plan.user_id(voter), vote=value,
+                created_at=voted_at, updated_at=voted_at))
+
+        thread = []
+        for _ in range(min(max_comments, heavy_tailed(rng, plan.comments_per_post))):
+            commented_at = created_at + timedelta(seconds=rng.random() * age)
+            parent = rng.choice(thread) if thread and rng.random() < 0.5 else None
+            segment = str(comment_id).zfill(PostComment.PATH_STEP)
+            comment = PostComment(
+                pk=comment_id, post_id=post_id, user_id=plan.user_id(plan.authors.sample(rng)),
+                _comment=plan.text(rng, 20), is_nesting_permitted=True,
+                parent_id=parent.pk if parent else None,
+                path=f'{parent.path}/{segment}' if parent else segment,
+                depth=parent.depth + 1 if parent else 0,
+                created_at=commented_at, updated_at=commented_at)
+            if parent is not None:
+                parent.child_count += 1
+            thread.append(comment)
+            comment_id += 1
+        # parents before replies, as the thread was built
+        comments.extend(thread)
+
+        score = upvotes - downvotes
+        post = Post(
+            pk=post_id, title=plan.text(rng, 8), content=plan.text(rng, 60),
+            author_id=plan.user_id(plan.authors.sample(rng)), group_id=group_id,
+            score=score, upvotes=upvotes, downvotes=downvotes,
+            created_at=created_at, updated_at=created_at)
+        for field, value in ranks(score, upvotes, downvotes, created_at, plan.now).items():
+            setattr(post, field, value)
+        posts.append(post)
+
+    with transaction.atomic():
+        Post.objects.bulk_create(posts, batch_size=plan.batch_size)
+        PostVote.objects.bulk_create(votes, batch_size=plan.batch_size)
+        PostComment.objects.bulk_create(comments, batch_size=plan.batch_size)
+    return {'posts': len(posts), 'votes': len(votes), 'comments': len(comments)}
@@ -0,0 +1,117 @@
+import random
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Sum
+from django.test import override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from core.votes import flush_votes
+from posts.models import Post, PostVote
+from posts.views import PostViewSet
+
+
+class Command(BaseCommand):
+    help = (
+        'Hammer the vote actions of a single post from several threads and '
+        'report sustained votes/sec for synchronous and buffered ingestion'
+    )
+    prefix = 'loadtest_'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mode', choices=['sync', 'buffered', 'both'], default='both')
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--seconds', type=float, default=10.0)
+        parser.add_argument('--users', type=int, default=500)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--keep', action='store_true',
+            help='Keep the generated users and post instead of deleting them.'
+        )
+
+    def handle(self, *args, **options):
+        users = self._users(options['users'])
+        modes = ['sync', 'buffered'] if options['mode'] == 'both' else [options['mode']]
+        try:
+            for mode in modes:
+                post = Post.objects.create(
+                    title=f'{self.prefix}{mode}', content='Load test', author=users[0])
+                with override_settings(VOTE_INGESTION=mode):
+                    requests, errors, elapsed = self._run(post, users, options)
+                line = (
+                    f"{mode:>8}: {requests / elapsed:8.1f} votes/sec "
+                    f"({requests} votes, {errors} errors, {options['threads']} threads, "
+                    f"{elapsed:.1f}s)"
+                )
+                if mode == 'buffered':
+                    started = time.perf_counter()
+                    flushed = flush_votes()
+                    flush_time = time.perf_counter() - started
+                    line += f", flushed {flushed} in {flush_time:.2f}s"
+                self.stdout.write(line)
+                self._check(post)
+        finally:
+            if not options['keep']:
+                Post.objects.filter(title__startswith=self.prefix).delete()
+                User.objects.filter(username__startswith=self.prefix).delete()
+
+    def _users(self, total):
+        existing = set(User.objects.filter(username__startswith=self.prefix)
+            .values_list('username', flat=True))
+        User.objects.bulk_create([
+            User(username=f'{self.prefix}{i}')
+            for i in range(total) if f'{self.prefix}{i}' not in existing
+        ])
+        return list(User.objects.filter(username__startswith=self.prefix).order_by('id')[:total])
+
+    def _run(self, post, users, options):
+        views = {
+            method: PostViewSet.as_view({'put': method})
+            for method in ('upvote', 'downvote', 'remove_vote')
+        }
+        factory = APIRequestFactory()
+        deadline = time.perf_counter() + options['seconds']
+        counts = []
+        lock = threading.Lock()
+
+        def worker(seed):
+            rng = random.Random(seed)
+            done = errors = 0
+            try:
+                while time.perf_counter() < deadline:
+                    method = rng.choice(('upvote', 'upvote', 'downvote', 'remove_vote'))
+                    request = factory.put(f'/api/v1/posts/{post.uuid}/{method}/')
+                    force_authenticate(request, user=rng.choice(users))
+                    try:
+                        response = views[method](request, uuid=post.uuid)
+                        if response.status_code == 200:
+                            done += 1
+                        else:
+                            errors += 1
+                    except Exception:
+                        errors += 1
+            finally:
+                connection.close()
+            with lock:
+                counts.append((done, errors))
+
+        threads = [
+            threading.Thread(target=worker, args=(options['seed'] + i,))
+            for i in range(options['threads'])
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        return sum(done for done, _ in counts), sum(errors for _, errors in counts), elapsed
+
+    def _check(self, post):
+        post.refresh_from_db()
+        expected = PostVote.objects.filter(post=post).aggregate(total=Sum('vote'))['total'] or 0
+        if post.score != expected:
+            self.stderr.write(f"score drift: stored {post.score}, votes sum to {expected}")
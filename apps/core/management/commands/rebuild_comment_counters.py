@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from comments.models import PostComment
+from comments.services import rebuild_comment_counters
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the stored reply counts and scores of comments'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--post', action='append', dest='posts', default=[],
+            help='UUID of a post whose comments to rebuild. Can be repeated. '
+                'Defaults to all comments.'
+        )
+
+    def handle(self, *args, **options):
+        queryset = None
+        if options['posts']:
+            queryset = PostComment.objects.filter(post__uuid__in=options['posts'])
+        with transaction.atomic():
+            updated = rebuild_comment_counters(queryset)
+        self.stdout.write(f"Rebuilt counters for {updated} comments")
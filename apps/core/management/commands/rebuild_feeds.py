@@ -0,0 +1,25 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from feeds.services import rebuild_feed
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the stored home feeds from follows and group memberships'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', action='append', dest='users', default=[],
+            help='Username whose feed to rebuild. Can be repeated. '
+                'Defaults to all users.'
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by('pk')
+        if options['users']:
+            users = users.filter(username__in=options['users'])
+        rebuilt = 0
+        for user_id in users.values_list('pk', flat=True).iterator():
+            rebuild_feed(user_id)
+            rebuilt += 1
+        self.stdout.write(f"Rebuilt {rebuilt} feeds")
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from groups.services import rebuild_members_count
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the stored members count of groups from their members'
+
+    def handle(self, *args, **options):
+        updated = rebuild_members_count()
+        self.stdout.write(f"Rebuilt members count for {updated} groups")
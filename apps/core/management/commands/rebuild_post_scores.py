@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.models import Post
+from posts.services import rebuild_vote_counters, refresh_ranks
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the stored score, vote counters and ranks of posts from their votes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--post', action='append', dest='posts', default=[],
+            help='UUID of a post to rebuild. Can be repeated. Defaults to all posts.'
+        )
+
+    def handle(self, *args, **options):
+        queryset = Post.objects.all()
+        if options['posts']:
+            queryset = queryset.filter(uuid__in=options['posts'])
+        with transaction.atomic():
+            updated = rebuild_vote_counters(queryset)
+            refresh_ranks(queryset)
+        self.stdout.write(f"Rebuilt vote counters for {updated} posts")
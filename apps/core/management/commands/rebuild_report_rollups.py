@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from reports.services import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the report counts of the moderation queue from the reports'
+
+    def handle(self, *args, **options):
+        targets = rebuild_rollups()
+        self.stdout.write(f"Rebuilt report counts for {targets} targets")
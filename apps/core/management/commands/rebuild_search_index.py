@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from search.backends import INDEXES, get_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search indexes of posts and comments'
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        for name, index in INDEXES.items():
+            backend.rebuild(index)
+            self.stdout.write(f"Rebuilt the {name} search index")
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from posts.models import Post
+from posts.ranking import RISING_WINDOW
+from posts.services import refresh_ranks
+
+
+class Command(BaseCommand):
+    help = 'Decay the time dependent post ranks. Meant to run periodically, e.g. every 10 minutes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Recompute the ranks of every post, not only the ones inside the rising window'
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        queryset = Post.objects.all()
+        if not options['all']:
+            queryset = queryset.filter(
+                Q(created_at__gte=now - RISING_WINDOW) | Q(rising_rank__gt=0)
+            )
+        updated = refresh_ranks(queryset, now=now)
+        self.stdout.write(f"Refreshed ranks for {updated} posts")
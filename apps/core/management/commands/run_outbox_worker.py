@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core.outbox import send_outbox
+
+
+class Command(BaseCommand):
+    help = 'Send the mail queued in the outbox'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=100,
+            help='Number of messages sent over one SMTP connection.'
+        )
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep sending every --interval seconds instead of exiting.'
+        )
+        parser.add_argument(
+            '--interval', type=float, default=5.0,
+            help='Seconds to sleep when the outbox is empty with --loop.'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            sent, failed = send_outbox(batch_size=options['batch_size'])
+            if sent or failed or not options['loop']:
+                self.stdout.write(f"Sent {sent} messages, {failed} failed")
+            if not options['loop']:
+                return
+            if sent + failed < options['batch_size']:
+                time.sleep(options['interval'])
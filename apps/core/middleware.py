@@ -0,0 +1,177 @@
+"""
+SQL profiling of API requests.
+
+SQLProfileMiddleware profiles a SQL_PROFILE_SAMPLE_RATE share of the
+requests served by BaseReadOnlyViewSet views (every API viewset): the
+number of queries, the time spent in the database and the statements
+repeated more than SQL_PROFILE_DUPLICATE_THRESHOLD times, which usually
+are a serializer field loading a relation row by row. Each profile is
+returned as a Server-Timing header, logged on the ``core.sql`` logger,
+as a warning when there are duplicates, and appended as a JSON line to
+SQL_PROFILE_SINK when that is set.
+
+With the default sample rate of 0 the middleware removes itself when
+the server starts, so it costs nothing.
+
+ReplicaRoutingMiddleware scopes the read replica routing of core.db.routers
+to each request.
+
+StaticFilesMiddleware is WhiteNoise, able to run as async middleware.
+"""
+import asyncio
+import json
+import logging
+import random
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from rest_framework.permissions import SAFE_METHODS
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from core.db.routers import begin_request, end_request, pin_to_primary
+from core.instrumentation import QueryProfile, capture_all_sql
+from core.views import BaseReadOnlyViewSet
+
+
+logger = logging.getLogger('core.sql')
+
+_sink_lock = threading.Lock()
+
+
+class SQLProfileMiddleware:
+
+    def __init__(self, get_response):
+        if settings.SQL_PROFILE_SAMPLE_RATE <= 0:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.sample_rate = settings.SQL_PROFILE_SAMPLE_RATE
+        self.threshold = settings.SQL_PROFILE_DUPLICATE_THRESHOLD
+        self.sink = settings.SQL_PROFILE_SINK
+
+    def __call__(self, request):
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+        request.sql_profile_view = None
+        started = time.perf_counter()
+        with capture_all_sql(stats=QueryProfile()) as profile:
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+        if request.sql_profile_view is not None:
+            self.report(request, response, profile, elapsed)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not hasattr(request, 'sql_profile_view'):
+            return None
+        view_class = getattr(view_func, 'cls', None)
+        if view_class is not None and issubclass(view_class, BaseReadOnlyViewSet):
+            action = getattr(view_func, 'actions', {}).get(request.method.lower(), request.method.lower())
+            request.sql_profile_view = f'{view_class.__name__}.{action}'
+        return None
+
+    def report(self, request, response, profile, elapsed):
+        duplicates = profile.duplicates(self.threshold)
+        record = {
+            'view': request.sql_profile_view,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': round(elapsed * 1000, 2),
+            'queries': profile.queries,
+            'rows': profile.rows,
+            'sql_ms': round(profile.duration_ms, 2),
+            'duplicates': duplicates,
+        }
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={profile.duration_ms:.2f};desc="{profile.queries} queries"',
+            f'dup;desc="{sum(duplicate["count"] for duplicate in duplicates)} duplicated"',
+            f'total;dur={elapsed * 1000:.2f}',
+        ])
+        logger.log(
+            logging.WARNING if duplicates else logging.INFO,
+            'sql view=%s path=%s queries=%d rows=%d sql_ms=%.2f duplicates=%s',
+            record['view'], record['path'], record['queries'], record['rows'], record['sql_ms'],
+            ','.join(f'{source}x{count}'
+                for duplicate in duplicates for source, count in duplicate['sources'].items()) or '-',
+            extra={'sql_profile': record},
+        )
+        if self.sink:
+            line = json.dumps(record, sort_keys=True, default=str)
+            with _sink_lock, open(self.sink, 'a') as sink:
+                sink.write(line + '\n')
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Holds the replica routing state of each request and pins the client of
+    a request that wrote to the primary: any POST, PUT, PATCH or DELETE, as
+    their raw SQL does not always go through the router, and any request
+    the router saw writing. Removes itself without DATABASE_REPLICAS.
+
+    Runs as async middleware under ASGI, so it does not push the async
+    views of core.mixins.AsyncViewMixin back onto Django's sync thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # tells Django this middleware instance is a coroutine function
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        token = begin_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            state = end_request(token)
+        return self._pin(request, response, state)
+
+    async def __acall__(self, request):
+        token = begin_request()
+        try:
+            response = await self.get_response(request)
+        finally:
+            state = end_request(token)
+        return self._pin(request, response, state)
+
+    def _pin(self, request, response, state):
+        if state.wrote or request.method not in SAFE_METHODS:
+            pin_to_primary(response)
+        return response
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise, which serves the static files, as async middleware under
+    ASGI. WhiteNoiseMiddleware is sync only, and Django 3.1 runs sync
+    middleware on a single thread shared by every request, which would
+    then wait there for the rest of the request.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None):
+        super().__init__(get_response)
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh or request.path_info in self.files:
+            response = await sync_to_async(self.process_request, thread_sensitive=False)(request)
+            if response is not None:
+                return response
+        return await self.get_response(request)
@@ -0,0 +1,32 @@
+# Generated by Django 3.1.14 on 2026-10-18 17:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BufferedVote',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=16)),
+                ('target_id', models.PositiveIntegerField()),
+                ('user_id', models.PositiveIntegerField()),
+                ('vote', models.SmallIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='bufferedvote',
+            index=models.Index(fields=['kind', 'target_id', 'user_id', '-id'], name='bufferedvote_lookup_idx'),
+        ),
+    ]
@@ -1,7 +1,23 @@
+from calendar import timegm
+from functools import wraps
+from hashlib import md5
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.permissions import SAFE_METHODS
 from rest_framework.response import Response
 from rest_framework import serializers
 from rest_framework import status
 
+from core.cache import get_versions, object_namespace, recently_bumped, viewer_namespace
+from core.db import check_connections
+from core.db.routers import use_replicas
+from core.instrumentation import continue_captures
+
 
 class MultiSerializerViewSetMixin(object):
     def get_serializer_class(self):
@@ -61,29 +77,224 @@ class MultiPermissionViewSetMixin(object):
             return super(MultiPermissionViewSetMixin, self).get_permissions()
 
 
+class ReplicaReadMixin(object):
+    """
+    Lets the GET requests of the actions in ``replica_actions`` read from
+    a replica, see core.db.routers. Viewsets list their other read-only
+    actions there, or leave out those that must see the latest writes of
+    other users. Decided once the user is known, before the permission
+    checks, so those read from the replica too.
+
+    Reads whose cache namespaces were bumped within the replica lag go to
+    the primary, or the response would carry the new versions in its
+    validators and cache entry with a body built before the write, see
+    core.cache.recently_bumped.
+    """
+    replica_actions = ('list', 'retrieve')
+
+    def reads_from_replica(self, request):
+        if request.method not in SAFE_METHODS or self.action not in self.replica_actions:
+            return False
+        namespaces = getattr(self, 'get_cache_namespaces', list)() \
+            + getattr(self, 'get_viewer_namespaces', list)()
+        return not recently_bumped(namespaces)
+
+    def perform_authentication(self, request):
+        super().perform_authentication(request)
+        if self.reads_from_replica(request):
+            use_replicas(request)
+
+
+def async_view(view):
+    """
+    Wraps the sync ``view`` in an async view that runs it, and renders its
+    response, on a thread of the event loop's executor. The thread cleans
+    up its connections itself, as Django's request signals only cover the
+    thread sync views share under ASGI, and counts its statements into the
+    SQL captures of the request, see core.instrumentation.
+    """
+    def run(request, *args, **kwargs):
+        close_old_connections()
+        check_connections()
+        try:
+            with continue_captures():
+                response = view(request, *args, **kwargs)
+                if hasattr(response, 'render') and callable(response.render):
+                    response.render()
+            return response
+        finally:
+            close_old_connections()
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        return await sync_to_async(run, thread_sensitive=False)(request, *args, **kwargs)
+    return wrapper
+
+
+class AsyncViewMixin(object):
+    """
+    With ASYNC_VIEWS, the routes whose GET action is in ``async_actions``
+    are served by async views, see ``async_view``. Under ASGI Django 3.1
+    runs every sync view on one shared thread, so a slow query would hold
+    up every other request of the worker; an async view lets the event
+    loop serve other connections while its viewset runs on its own thread.
+    The other methods of such a route, e.g. PUT on a detail route, are
+    served the same way.
+    """
+    async_actions = ()
+
+    @classmethod
+    def as_view(cls, actions=None, **initkwargs):
+        view = super().as_view(actions, **initkwargs)
+        if settings.ASYNC_VIEWS and (actions or {}).get('get') in cls.async_actions:
+            return async_view(view)
+        return view
+
+
+class ConditionalResponseMixin(object):
+    """
+    ETag and Last-Modified support. The validators are computed before
+    serialization. Viewsets with a ``cache_namespace`` use the response
+    cache versions (see core.cache), which every write bumps, including
+    counter updates that leave ``updated_at`` alone; this costs no query.
+    Other viewsets use ``updated_at`` of the object, or ``max(updated_at)``
+    and the row count of a list. The viewer and the version of their
+    viewer namespace are part of the ETag because payloads carry their own
+    votes, bookmarks and member status, and memberships decide which
+    PRIVATE group content is shown.
+
+    Last-Modified is only sent when there are no versions to rely on.
+    """
+    cache_namespace = None
+    cache_depends = ()
+
+    def get_cache_namespaces(self):
+        """
+        Namespaces whose versions the current response depends on: the
+        object and bulk writes for detail routes, the listing otherwise.
+        """
+        if self.cache_namespace is None:
+            return []
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        if lookup_url_kwarg in self.kwargs:
+            namespaces = [
+                object_namespace(self.cache_namespace, self.kwargs[lookup_url_kwarg]),
+                object_namespace(self.cache_namespace, '*'),
+            ]
+        else:
+            namespaces = [self.cache_namespace]
+        return namespaces + list(self.cache_depends)
+
+    def get_viewer_namespaces(self):
+        user = self.request.user
+        if not user.is_authenticated:
+            return []
+        return [viewer_namespace(user.pk)]
+
+    def get_validators(self, obj=None, queryset=None):
+        namespaces = self.get_cache_namespaces()
+        if obj is not None:
+            last_modified = getattr(obj, 'updated_at', None)
+            parts = [obj.pk, last_modified]
+        elif namespaces:
+            # every write to the listing bumps its version
+            last_modified = None
+            parts = []
+        else:
+            aggregates = {'total': Count('pk')}
+            if any(field.name == 'updated_at' for field in queryset.model._meta.concrete_fields):
+                aggregates['latest'] = Max('updated_at')
+            values = queryset.order_by().aggregate(**aggregates)
+            last_modified = values.get('latest')
+            parts = [values['total'], last_modified]
+
+        versioned = namespaces + self.get_viewer_namespaces()
+        if versioned:
+            parts += get_versions(versioned)
+        if namespaces:
+            last_modified = None
+        user = self.request.user
+        parts.append(user.pk if user.is_authenticated else None)
+        etag = '"%s"' % md5(repr(parts).encode('utf-8')).hexdigest()
+        if last_modified is not None:
+            last_modified = timegm(last_modified.utctimetuple())
+        return etag, last_modified
+
+    def not_modified(self, obj=None, queryset=None):
+        """
+        Returns a 304 response when the client already holds the current
+        representation of ``obj`` or ``queryset``, otherwise None. The
+        validators are remembered for ``set_validators``.
+        """
+        self.validators = None
+        if self.request.method not in ('GET', 'HEAD'):
+            return None
+        etag, last_modified = self.get_validators(obj=obj, queryset=queryset)
+        self.validators = (etag, last_modified)
+        return get_conditional_response(
+            self.request, etag=etag, last_modified=last_modified)
+
+    def set_validators(self, response):
+        validators = getattr(self, 'validators', None)
+        if validators is None or response.status_code != status.HTTP_200_OK:
+            return response
+        etag, last_modified = validators
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        return response
+
+
 class PaginatedResponseMixin(object):
+    """
+    Viewsets can opt in to keyset pagination by setting
+    ``cursor_pagination_class``. It is used instead of ``pagination_class``
+    whenever the request carries a ``cursor`` parameter, an empty one
+    requesting the first page.
+    """
+    cursor_pagination_class = None
+
+    def get_cursor_paginator(self):
+        cursor_pagination_class = getattr(self, 'cursor_pagination_class', None)
+        if cursor_pagination_class is None:
+            return None
+        paginator = cursor_pagination_class()
+        if paginator.cursor_query_param not in self.request.query_params:
+            return None
+        return paginator
+
     def paginated_response(self, queryset, context=None, paginator=None, fields=None):
         """
         This function should be called when a paginated response is needed
         """
         page = None
+        kwargs = {}
+        if fields is not None:
+            kwargs = {'fields': fields}
+
+        not_modified = getattr(self, 'not_modified', None)
+        if not_modified is not None:
+            response = not_modified(queryset=queryset)
+            if response is not None:
+                return response
+        set_validators = getattr(self, 'set_validators', lambda response: response)
+
+        if paginator is None:
+            paginator = self.get_cursor_paginator()
 
         if paginator is not None:
-            page = paginator.paginate_queryset(queryset, request=self.request)
+            page = paginator.paginate_queryset(queryset, request=self.request, view=self)
         else:
             page = self.paginate_queryset(queryset)
 
         if page is not None:
-            kwargs = {}
-            if fields is not None:
-                kwargs = {'fields': fields}
             serializer = self.get_serializer(page, context=context, many=True, **kwargs)
             if paginator is not None:
-                return paginator.get_paginated_response(serializer.data)
-            return self.get_paginated_response(serializer.data)
+                return set_validators(paginator.get_paginated_response(serializer.data))
+            return set_validators(self.get_paginated_response(serializer.data))
 
-        serializer = self.get_serializer(queryset, context=context, many=True, fields=fields)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        serializer = self.get_serializer(queryset, context=context, many=True, **kwargs)
+        return set_validators(Response(serializer.data, status=status.HTTP_200_OK))
 
 
 class DestroyModelMixin:
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 import datetime
 
 
@@ -19,3 +20,55 @@ class TimeStampedModel(models.Model):
     def is_edited(self):
         return (self.updated_at - self.created_at).total_seconds() > 1
     edited = property(is_edited)
+
+
+class BufferedVote(models.Model):
+    """
+    Append-only log of votes waiting to be applied, used by the database
+    vote buffer when VOTE_INGESTION is 'buffered'. Rows are deleted once
+    the flusher has applied them, see core.votes.
+    """
+    kind = models.CharField(max_length=16)
+    target_id = models.PositiveIntegerField()
+    user_id = models.PositiveIntegerField()
+    vote = models.SmallIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id',]
+        indexes = [
+            models.Index(fields=['kind', 'target_id', 'user_id', '-id'],
+                name='bufferedvote_lookup_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.target_id}: {self.vote} by {self.user_id}"
+
+
+class OutboxMessage(models.Model):
+    """
+    Mail waiting to be sent by the outbox worker, written in the same
+    transaction as the change it is about so requests never wait on SMTP,
+    see core.outbox. ``key`` names the event the message is for, a message
+    is queued at most once per key.
+    """
+    key = models.CharField(max_length=200, unique=True)
+    subject = models.CharField(max_length=200)
+    template_name = models.CharField(max_length=100)
+    recipients = models.JSONField(default=list)
+    context = models.JSONField(default=dict)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id',]
+        indexes = [
+            models.Index(fields=['sent_at', 'next_attempt_at'],
+                name='outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.key}: {self.subject}"
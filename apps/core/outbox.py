@@ -0,0 +1,127 @@
+"""
+Transactional mail outbox.
+
+Requests do not talk to SMTP. ``enqueue_mail`` writes an OutboxMessage in
+the transaction of the change the mail is about, so the mail exists if and
+only if the change was committed, and ``send_outbox`` (run by the
+``run_outbox_worker`` management command) sends the due messages in
+batches over one SMTP connection per batch. A failed message is retried
+after OUTBOX_RETRY_DELAY seconds, doubling after every attempt, until it
+has been tried OUTBOX_MAX_ATTEMPTS times.
+
+A worker claims its batch before sending: the rows are locked, skipping
+those another worker is claiming, and leased for OUTBOX_LEASE seconds by
+moving their next attempt past the lease, which counts as an attempt.
+The result of each message is stored as soon as it is sent, so a worker
+dying mid batch only leaves the messages it had not finished to be
+retried once their lease ends. SQLite ignores row locks, there only one
+worker should run at a time.
+"""
+from datetime import timedelta
+import smtplib
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from core.models import OutboxMessage
+from core.services import mail
+
+
+def enqueue_mail(key, subject, template_name, recipients, context):
+    """
+    Queues a mail, see core.services.mail for the arguments. Nothing is
+    queued if a message with the same ``key`` already was, whether or not
+    it has been sent. Call it inside the transaction of the change.
+    """
+    if isinstance(recipients, str):
+        recipients = [recipients]
+    enqueue_messages([
+        OutboxMessage(
+            key=key, subject=subject, template_name=template_name,
+            recipients=list(recipients), context=context)
+    ])
+
+
+def enqueue_messages(messages):
+    """
+    Queues unsaved OutboxMessages with one INSERT, skipping the keys
+    already queued, see ``enqueue_mail``.
+    """
+    OutboxMessage.objects.bulk_create(list(messages), ignore_conflicts=True)
+
+
+def due_messages(limit, now=None):
+    now = now or timezone.now()
+    return OutboxMessage.objects\
+        .filter(sent_at=None, next_attempt_at__lte=now,
+            attempts__lt=settings.OUTBOX_MAX_ATTEMPTS)\
+        .order_by('next_attempt_at', 'id')[:limit]
+
+
+def claim_messages(limit, now=None):
+    """
+    Leases up to ``limit`` due messages to the calling worker and counts
+    the attempt, see the module docstring. Returns them.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        ids = list(due_messages(limit, now)
+            .select_for_update(skip_locked=True)
+            .values_list('id', flat=True))
+        OutboxMessage.objects.filter(id__in=ids).update(
+            attempts=F('attempts') + 1,
+            next_attempt_at=now + timedelta(seconds=settings.OUTBOX_LEASE))
+    return list(OutboxMessage.objects.filter(id__in=ids).order_by('id'))
+
+
+def _retry_later(message, error, now):
+    message.last_error = f'{type(error).__name__}: {error}'
+    message.next_attempt_at = now + timedelta(
+        seconds=settings.OUTBOX_RETRY_DELAY * 2 ** (message.attempts - 1))
+    message.save(update_fields=['last_error', 'next_attempt_at'])
+
+
+def _sent(message):
+    message.sent_at = timezone.now()
+    message.last_error = ''
+    message.save(update_fields=['sent_at', 'last_error'])
+
+
+def send_outbox(batch_size=100):
+    """
+    Sends up to ``batch_size`` due messages over one SMTP connection.
+    Returns the number of messages sent and the number that failed.
+    """
+    now = timezone.now()
+    messages = claim_messages(batch_size, now)
+    if not messages:
+        return 0, 0
+
+    connection = get_connection()
+    sent = 0
+    try:
+        connection.open()
+    except Exception as error:
+        # the server is unreachable, the whole batch waits for the next try
+        for message in messages:
+            _retry_later(message, error, now)
+    else:
+        try:
+            for message in messages:
+                try:
+                    mail(message.subject, message.template_name, message.recipients,
+                        message.context, connection=connection)
+                except Exception as error:
+                    _retry_later(message, error, now)
+                    if isinstance(error, (smtplib.SMTPServerDisconnected, OSError)):
+                        # the next message opens a fresh connection
+                        connection.close()
+                else:
+                    _sent(message)
+                    sent += 1
+        finally:
+            connection.close()
+    return sent, len(messages) - sent
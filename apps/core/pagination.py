@@ -0,0 +1,199 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+from operator import attrgetter
+import datetime
+import decimal
+import json
+import uuid
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db.models import Q
+from rest_framework import pagination
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from core.db.concurrency import run_concurrently
+
+
+class ConcurrentPaginator(Paginator):
+    """
+    Loads the rows of a page while counting the rows of the whole list,
+    see core.db.concurrency, instead of counting first to check the page
+    exists. Set as ``django_paginator_class`` of a PageNumberPagination.
+    """
+
+    def page(self, number):
+        try:
+            position = int(number)
+        except (TypeError, ValueError):
+            position = 0
+        if position < 1 or self.orphans or 'count' in self.__dict__:
+            return super(ConcurrentPaginator, self).page(number)
+        bottom = (position - 1) * self.per_page
+        _, rows = run_concurrently(
+            lambda: self.count,
+            lambda: list(self.object_list[bottom:bottom + self.per_page]))
+        number = self.validate_number(number)
+        return self._get_page(rows, number, self)
+
+
+class KeysetPagination(pagination.BasePagination):
+    """
+    Cursor pagination keyed on the ordering of the queryset plus the primary
+    key, e.g. (created_at, id) or (hot_rank, id). Pages are fetched with a
+    WHERE on the last seen key instead of an OFFSET and no COUNT is issued,
+    so every page costs the same regardless of depth.
+
+    The ordering is read from the queryset, falling back to Meta.ordering.
+    Only plain, non null field names are supported.
+
+    Cursors are opaque to clients: pass back the ``next`` or ``previous``
+    url, or an empty ``cursor`` parameter for the first page.
+    """
+    page_size = 24
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.ordering = self.get_ordering(queryset)
+        position, self.reverse = self.decode_cursor(request)
+
+        ordering = self.ordering
+        if self.reverse:
+            ordering = [self._invert(field) for field in ordering]
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            position = self.parse_position(queryset.model, position)
+            queryset = queryset.filter(self._after(ordering, position))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if self.reverse:
+            self.page.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'previous': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_ordering(self, queryset):
+        ordering = list(queryset.query.order_by or queryset.model._meta.ordering)
+        if not all(isinstance(field, str) for field in ordering):
+            raise TypeError('KeysetPagination only supports ordering by field names')
+        names = [field.lstrip('-') for field in ordering]
+        if 'pk' not in names and queryset.model._meta.pk.name not in names:
+            descending = bool(ordering) and ordering[-1].startswith('-')
+            ordering.append('-pk' if descending else 'pk')
+        return ordering
+
+    def encode_cursor(self, instance, reverse):
+        position = [
+            self._serialize(attrgetter(field.lstrip('-').replace('__', '.'))(instance))
+            for field in self.ordering
+        ]
+        payload = {'p': position}
+        if reverse:
+            payload['r'] = 1
+        token = urlsafe_b64encode(
+            json.dumps(payload, separators=(',', ':')).encode('ascii')
+        ).decode('ascii')
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, 'page')
+        return replace_query_param(url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None, False
+        try:
+            payload = json.loads(urlsafe_b64decode(token.encode('ascii')).decode('ascii'))
+            position = payload['p']
+            reverse = bool(payload.get('r', 0))
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def parse_position(self, model, position):
+        """
+        Converts the values of a decoded cursor with the model fields of
+        the ordering, so a tampered cursor is refused rather than reaching
+        the database.
+        """
+        parsed = []
+        for field, value in zip(self.ordering, position):
+            model_field = self._model_field(model, field.lstrip('-'))
+            try:
+                value = model_field.to_python(value)
+                if value is None:
+                    raise ValidationError('null')
+                model_field.run_validators(value)
+            except (ValidationError, TypeError, ValueError, OverflowError):
+                raise NotFound(self.invalid_cursor_message)
+            parsed.append(value)
+        return parsed
+
+    def _model_field(self, model, name):
+        *relations, name = name.split('__')
+        for relation in relations:
+            model = model._meta.get_field(relation).related_model
+        if name == 'pk':
+            return model._meta.pk
+        return model._meta.get_field(name)
+
+    def _after(self, ordering, position):
+        """
+        (a, b, c) > (x, y, z) spelled out for the database:
+        a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z)
+        """
+        condition = Q()
+        equal = {}
+        for field, value in zip(ordering, position):
+            name = field.lstrip('-')
+            lookup = '__lt' if field.startswith('-') else '__gt'
+            condition |= Q(**equal, **{name + lookup: value})
+            equal[name] = value
+        return condition
+
+    def _invert(self, field):
+        return field[1:] if field.startswith('-') else '-' + field
+
+    def _serialize(self, value):
+        if isinstance(value, (datetime.datetime, datetime.date)):
+            return value.isoformat()
+        if isinstance(value, (decimal.Decimal, uuid.UUID)):
+            return str(value)
+        return value
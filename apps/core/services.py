@@ -1,6 +1,10 @@
 from django.conf import settings
-from django.core.mail import send_mail
-from django.template import Context, Template
+from django.core.mail import EmailMultiAlternatives
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.html import strip_tags
 
 import os
 
@@ -13,5 +17,140 @@ def get_env_variable(var_name):
         return None
 
 
-def mail(subject, email_template, recipient, context):
-    pass
+def mail(subject, email_template, recipient, context, connection=None):
+    """
+    Sends the template ``emails/<email_template>`` rendered with
+    ``context`` as an HTML mail with a plain text alternative to
+    ``recipient``, an address or a list of them, over ``connection`` or a
+    new one from the EMAIL_* settings.
+
+    This blocks on SMTP; requests queue their mail with
+    core.outbox.enqueue_mail instead.
+    """
+    recipients = [recipient] if isinstance(recipient, str) else list(recipient)
+    html = render_to_string(f'emails/{email_template}', context)
+    message = EmailMultiAlternatives(
+        subject, strip_tags(html), settings.DEFAULT_FROM_GMAIL, recipients,
+        connection=connection)
+    message.attach_alternative(html, 'text/html')
+    return message.send()
+
+
+VOTE_VALUES = {'upvote': 1, 'downvote': -1, 'remove_vote': 0}
+VOTE_COUNTERS = ('score', 'upvotes', 'downvotes')
+
+# Deltas of each counter column in terms of the old and new vote, for the
+# PostgreSQL statement below.
+VOTE_COUNTER_SQL = {
+    'score': '(v.new_vote - v.old_vote)',
+    'upvotes': '((v.new_vote = 1)::int - (v.old_vote = 1)::int)',
+    'downvotes': '((v.new_vote = -1)::int - (v.old_vote = -1)::int)',
+}
+
+
+def vote_deltas(old_vote, new_vote):
+    """
+    Returns the (score, upvotes, downvotes) deltas produced by replacing
+    ``old_vote`` with ``new_vote``. A missing vote counts as 0.
+    """
+    old_vote = old_vote or 0
+    new_vote = new_vote or 0
+    return (
+        new_vote - old_vote,
+        int(new_vote == 1) - int(old_vote == 1),
+        int(new_vote == -1) - int(old_vote == -1),
+    )
+
+
+def upsert_vote(vote_model, target, user, value, counters=('score',)):
+    """
+    Records ``value`` as the vote of ``user`` on ``target`` and moves the
+    ``counters`` columns of ``target`` (any of score, upvotes, downvotes)
+    by the difference with the previous vote. ``vote_model`` needs a unique
+    constraint on (user, target).
+
+    Returns ``(old_vote, new_vote, values)`` where ``values`` maps each
+    counter to its stored value after the vote; nothing is re-aggregated.
+
+    On PostgreSQL 18+ this is a single statement: an INSERT ... ON CONFLICT
+    returning the old and new vote, feeding an UPDATE ... RETURNING of the
+    counters. Other databases lock the vote row and apply the delta inside
+    a transaction.
+    """
+    if connection.vendor == 'postgresql' and connection.pg_version >= 180000:
+        return _upsert_vote_returning(vote_model, target, user, value, counters)
+    return _upsert_vote_locked(vote_model, target, user, value, counters)
+
+
+def _vote_target_field(vote_model, target):
+    for field in vote_model._meta.concrete_fields:
+        if field.is_relation and field.related_model is type(target):
+            return field
+    raise ValueError(f'{vote_model.__name__} has no relation to {type(target).__name__}')
+
+
+def _upsert_vote_returning(vote_model, target, user, value, counters):
+    quote = connection.ops.quote_name
+    opts = vote_model._meta
+    target_opts = type(target)._meta
+    target_column = quote(_vote_target_field(vote_model, target).column)
+    user_column = quote(opts.get_field('user').column)
+    vote_column = quote(opts.get_field('vote').column)
+    vote_table = quote(opts.db_table)
+    target_table = quote(target_opts.db_table)
+    assignments = ', '.join(
+        f'{quote(name)} = {quote(name)} + {VOTE_COUNTER_SQL[name]}' for name in counters)
+    returning = ', '.join(f'{target_table}.{quote(name)}' for name in counters)
+
+    sql = f"""
+        WITH v AS (
+            INSERT INTO {vote_table}
+                ("created_at", "updated_at", {user_column}, {target_column}, {vote_column})
+            VALUES (%s, %s, %s, %s, %s)
+            ON CONFLICT ({user_column}, {target_column}) DO UPDATE
+                SET {vote_column} = EXCLUDED.{vote_column},
+                    "updated_at" = EXCLUDED."updated_at"
+            RETURNING COALESCE(old.{vote_column}, 0) AS old_vote,
+                new.{vote_column} AS new_vote
+        )
+        UPDATE {target_table} SET {assignments}
+        FROM v
+        WHERE {target_table}.{quote(target_opts.pk.column)} = %s
+        RETURNING v.old_vote, v.new_vote, {returning}
+    """
+    now = timezone.now()
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [now, now, user.pk, target.pk, value, target.pk])
+        row = cursor.fetchone()
+    return row[0], row[1], dict(zip(counters, row[2:]))
+
+
+def _upsert_vote_locked(vote_model, target, user, value, counters):
+    target_model = type(target)
+    lookup = {_vote_target_field(vote_model, target).name: target, 'user': user}
+    with transaction.atomic():
+        vote = vote_model.objects.select_for_update().filter(**lookup).first()
+        if vote is None:
+            try:
+                with transaction.atomic():
+                    vote = vote_model.objects.create(vote=value, **lookup)
+                old_vote = 0
+            except IntegrityError:
+                # a concurrent request inserted the row first
+                vote = vote_model.objects.select_for_update().get(**lookup)
+                old_vote = vote.vote
+        else:
+            old_vote = vote.vote
+        if vote.vote != value:
+            vote_model.objects.filter(pk=vote.pk)\
+                .update(vote=value, updated_at=timezone.now())
+
+        updates = {
+            name: F(name) + delta
+            for name, delta in zip(VOTE_COUNTERS, vote_deltas(old_vote, value))
+            if name in counters and delta
+        }
+        if updates:
+            target_model.objects.filter(pk=target.pk).update(**updates)
+        values = target_model.objects.filter(pk=target.pk).values(*counters).get()
+    return old_vote, value, values
@@ -0,0 +1,88 @@
+"""
+Bumps the response cache versions (see core.cache) when the models the
+cached posts, groups and tags responses, and the comment validators, are
+built from change, and the viewer version of a user when the per viewer
+parts of their responses change.
+"""
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from bookmarks.models import PostBookmark
+from comments.models import PostComment
+from comments.services import bump_comments
+from core.cache import bump_all, bump_object, bump_version, viewer_namespace
+from groups.models import Group, GroupMember, GroupRule, MemberRequest
+from posts.models import Post, PostVote
+from tags.models import Tag, TagType
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def post_changed(sender, instance, **kwargs):
+    bump_object('posts', instance.uuid)
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def post_tags_changed(sender, instance, **kwargs):
+    if isinstance(instance, Post):
+        bump_object('posts', instance.uuid)
+    else:
+        bump_all('posts')
+
+
+@receiver(post_save, sender=PostComment)
+@receiver(post_delete, sender=PostComment)
+def comment_changed(sender, instance, **kwargs):
+    try:
+        uuid = instance.post.uuid
+    except Post.DoesNotExist:
+        bump_all('posts')
+    else:
+        bump_object('posts', uuid)
+        bump_comments(uuid)
+
+
+@receiver(post_save, sender=PostVote)
+@receiver(post_delete, sender=PostVote)
+def post_vote_changed(sender, instance, **kwargs):
+    try:
+        bump_object('posts', instance.post.uuid)
+    except Post.DoesNotExist:
+        bump_all('posts')
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    bump_object('groups', instance.pk)
+
+
+@receiver(post_save, sender=GroupMember)
+@receiver(post_delete, sender=GroupMember)
+@receiver(post_save, sender=GroupRule)
+@receiver(post_delete, sender=GroupRule)
+def group_child_changed(sender, instance, **kwargs):
+    bump_object('groups', instance.group_id)
+
+
+@receiver(post_save, sender=PostBookmark)
+@receiver(post_delete, sender=PostBookmark)
+@receiver(post_save, sender=MemberRequest)
+@receiver(post_delete, sender=MemberRequest)
+@receiver(post_save, sender=GroupMember)
+@receiver(post_delete, sender=GroupMember)
+def viewer_state_changed(sender, instance, **kwargs):
+    # user_bookmark, member_status and the PRIVATE groups visible_posts shows
+    bump_version(viewer_namespace(instance.user_id))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def tag_changed(sender, instance, **kwargs):
+    bump_object('tags', instance.pk)
+
+
+@receiver(post_save, sender=TagType)
+@receiver(post_delete, sender=TagType)
+def tag_type_changed(sender, instance, **kwargs):
+    bump_all('tags')
@@ -4,7 +4,10 @@ from rest_framework.response import Response
 from .mixins import (
     MultiSerializerViewSetMixin,
     MultiPermissionViewSetMixin,
+    ConditionalResponseMixin,
     PaginatedResponseMixin,
+    ReplicaReadMixin,
+    AsyncViewMixin,
     DestroyModelMixin,
 )
 
@@ -13,7 +16,10 @@ class BaseReadOnlyViewSet(
         mixins.RetrieveModelMixin,
         MultiSerializerViewSetMixin,
         MultiPermissionViewSetMixin,
+        ConditionalResponseMixin,
         PaginatedResponseMixin,
+        ReplicaReadMixin,
+        AsyncViewMixin,
         viewsets.GenericViewSet):
 
     def get_serializer_context(self):
@@ -21,11 +27,18 @@ class BaseReadOnlyViewSet(
         context.update({"request": self.request})
         return context
 
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        return self.paginated_response(queryset)
+
     def retrieve(self, request, *args, **kwargs):
         obj = self.get_object()
+        not_modified = self.not_modified(obj=obj)
+        if not_modified is not None:
+            return not_modified
         serializer_class = self.get_serializer_class()
         serializer = serializer_class(obj)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return self.set_validators(Response(serializer.data, status=status.HTTP_200_OK))
 
 
 class BaseViewSet(
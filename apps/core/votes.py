@@ -0,0 +1,231 @@
+"""
+Buffered vote ingestion.
+
+With ``VOTE_INGESTION = 'buffered'`` the vote actions append the vote to a
+buffer and answer straight away with the user's vote and an estimated
+score. ``flush_votes`` (run by the ``flush_votes`` management command, or by
+``start_flusher`` in process) drains the buffer in batches, keeps the last
+vote of each user per target and applies the batch to the vote tables and
+counter columns with a handful of bulk statements, so a vote spike on one
+post costs one counter UPDATE per batch instead of one locked row per click.
+
+Only one flusher should run at a time.
+"""
+from collections import OrderedDict, deque, namedtuple
+from itertools import count
+import threading
+
+from django.apps import apps
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from core.models import BufferedVote
+from core.services import VOTE_COUNTERS, vote_deltas
+
+
+PendingVote = namedtuple('PendingVote', ['id', 'kind', 'target_id', 'user_id', 'vote'])
+
+VOTE_TARGETS = {
+    'post': {
+        'vote_model': 'posts.PostVote',
+        'target_field': 'post',
+        'counters': VOTE_COUNTERS,
+        'after_flush': 'posts.services.votes_flushed',
+    },
+    'comment': {
+        'vote_model': 'comments.PostCommentVote',
+        'target_field': 'post_comment',
+        'counters': ('score',),
+        'after_flush': 'comments.services.votes_flushed',
+    },
+}
+
+
+class DatabaseVoteBuffer:
+    """
+    Buffers votes in the BufferedVote table. Works across processes, so
+    web workers and the flush_votes command can run separately.
+    """
+
+    def append(self, kind, target_id, user_id, vote):
+        BufferedVote.objects.create(
+            kind=kind, target_id=target_id, user_id=user_id, vote=vote)
+
+    def read(self, limit):
+        rows = BufferedVote.objects.order_by('id')\
+            .values_list('id', 'kind', 'target_id', 'user_id', 'vote')[:limit]
+        return [PendingVote(*row) for row in rows]
+
+    def ack(self, entries):
+        BufferedVote.objects.filter(pk__in=[entry.id for entry in entries]).delete()
+
+
+class MemoryVoteBuffer:
+    """
+    Buffers votes in a process local queue. Votes are lost if the process
+    dies before a flush and are invisible to other processes, so this only
+    suits single process deployments running ``start_flusher``, and tests.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids = count(1)
+        self._queue = deque()
+
+    def append(self, kind, target_id, user_id, vote):
+        with self._lock:
+            self._queue.append(
+                PendingVote(next(self._ids), kind, target_id, user_id, vote))
+
+    def read(self, limit):
+        with self._lock:
+            return [self._queue[i] for i in range(min(limit, len(self._queue)))]
+
+    def ack(self, entries):
+        with self._lock:
+            for _ in entries:
+                self._queue.popleft()
+
+
+_buffers = {}
+
+
+def get_vote_buffer():
+    """
+    Returns the buffer configured by VOTE_BUFFER_BACKEND, one instance per
+    backend and process.
+    """
+    path = settings.VOTE_BUFFER_BACKEND
+    if path not in _buffers:
+        _buffers[path] = import_string(path)()
+    return _buffers[path]
+
+
+def is_buffered():
+    return settings.VOTE_INGESTION == 'buffered'
+
+
+def buffer_vote(kind, target, user, value):
+    """
+    Appends the vote of ``user`` on ``target`` to the buffer and returns an
+    estimated score: the stored score with the user's applied vote replaced
+    by ``value``. Votes of other users still in the buffer are not counted.
+    """
+    config = VOTE_TARGETS[kind]
+    applied = apps.get_model(config['vote_model']).objects\
+        .filter(user=user, **{config['target_field']: target})\
+        .values_list('vote', flat=True)\
+        .first() or 0
+    get_vote_buffer().append(kind, target.pk, user.pk, value)
+    return target.score + value - applied
+
+
+def flush_votes(buffer=None, batch_size=1000):
+    """
+    Applies everything in the buffer, ``batch_size`` entries per
+    transaction. Returns the number of buffered votes processed.
+    """
+    buffer = buffer or get_vote_buffer()
+    flushed = 0
+    while True:
+        entries = buffer.read(batch_size)
+        if not entries:
+            return flushed
+        apply_pending_votes(entries)
+        buffer.ack(entries)
+        flushed += len(entries)
+
+
+def apply_pending_votes(entries):
+    """
+    Keeps the last vote of each user per target among ``entries`` and
+    writes them with bulk statements, one UPDATE per touched target for
+    the counters.
+    """
+    latest = OrderedDict()
+    for entry in entries:
+        latest[(entry.kind, entry.target_id, entry.user_id)] = entry.vote
+
+    by_kind = {}
+    for (kind, target_id, user_id), vote in latest.items():
+        by_kind.setdefault(kind, {})[(target_id, user_id)] = vote
+
+    with transaction.atomic():
+        for kind, votes in by_kind.items():
+            _apply_kind(VOTE_TARGETS[kind], votes)
+
+
+def _apply_kind(config, votes):
+    vote_model = apps.get_model(config['vote_model'])
+    target_model = vote_model._meta.get_field(config['target_field']).related_model
+    target_column = config['target_field'] + '_id'
+    user_model = vote_model._meta.get_field('user').related_model
+    # targets and users deleted since the vote was queued are skipped
+    target_ids = set(target_model.objects
+        .filter(pk__in={target_id for target_id, _ in votes})
+        .values_list('pk', flat=True))
+    user_ids = set(user_model.objects
+        .filter(pk__in={user_id for _, user_id in votes})
+        .values_list('pk', flat=True))
+
+    existing = {
+        (getattr(row, target_column), row.user_id): row
+        for row in vote_model.objects.select_for_update().filter(**{
+            target_column + '__in': target_ids, 'user_id__in': user_ids})
+    }
+
+    now = timezone.now()
+    created, updated, deltas = [], [], {}
+    for (target_id, user_id), value in votes.items():
+        if target_id not in target_ids or user_id not in user_ids:
+            continue
+        row = existing.get((target_id, user_id))
+        old_vote = 0 if row is None else row.vote
+        if row is None:
+            created.append(vote_model(
+                user_id=user_id, vote=value, **{target_column: target_id}))
+        elif row.vote != value:
+            row.vote = value
+            row.updated_at = now
+            updated.append(row)
+        total = deltas.setdefault(target_id, [0, 0, 0])
+        for i, delta in enumerate(vote_deltas(old_vote, value)):
+            total[i] += delta
+
+    vote_model.objects.bulk_create(created)
+    vote_model.objects.bulk_update(updated, ['vote', 'updated_at'])
+
+    changed = []
+    for target_id, total in deltas.items():
+        changes = {
+            name: F(name) + delta
+            for name, delta in zip(VOTE_COUNTERS, total)
+            if name in config['counters'] and delta
+        }
+        if changes:
+            target_model.objects.filter(pk=target_id).update(**changes)
+            changed.append(target_id)
+
+    if changed:
+        import_string(config['after_flush'])(target_model.objects.filter(pk__in=changed))
+
+
+def start_flusher(interval=1.0, batch_size=1000):
+    """
+    Flushes the buffer every ``interval`` seconds from a daemon thread.
+    Meant for the memory buffer; with the database buffer prefer the
+    flush_votes command. Returns an Event that stops the thread when set.
+    """
+    def run():
+        while not stop.is_set():
+            close_old_connections()
+            flush_votes(batch_size=batch_size)
+            stop.wait(interval)
+
+    stop = threading.Event()
+    thread = threading.Thread(target=run, name='vote-flusher', daemon=True)
+    thread.start()
+    return stop
@@ -0,0 +1,9 @@
+from django.contrib import admin
+from feeds.models import FeedEntry
+
+
+@admin.register(FeedEntry)
+class FeedEntryAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'post', 'published_at')
+    raw_id_fields = ('user', 'post')
+    date_hierarchy = 'published_at'
@@ -0,0 +1,38 @@
+from django.db import models
+from django.contrib.auth.models import User
+from posts.models import Post
+
+
+class FeedEntry(models.Model):
+    """
+    A post pushed into the home feed of ``user`` when it was published
+    (fan-out-on-write). Each feed keeps at most FEED_MAX_ENTRIES rows,
+    see feeds.services.
+    """
+    user = models.ForeignKey(
+        User,
+        related_name="feed_entries",
+        on_delete=models.CASCADE
+    )
+    post = models.ForeignKey(
+        Post,
+        related_name="feed_entries",
+        on_delete=models.CASCADE
+    )
+    published_at = models.DateTimeField(
+        help_text="created_at of the post, copied so feeds are read from one index"
+    )
+
+    class Meta:
+        ordering = ["-published_at", "-post"]
+        verbose_name = "Feed Entry"
+        verbose_name_plural = "Feed Entries"
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'], name='unique_feed_entry'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-published_at', '-post'], name='feedentry_user_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.post_id} in the feed of {self.user_id}"
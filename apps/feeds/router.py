@@ -0,0 +1,6 @@
+from rest_framework_nested import routers
+from feeds.views import FeedViewSet
+
+
+router = routers.SimpleRouter()
+router.register(r'feed', FeedViewSet, basename='feed')
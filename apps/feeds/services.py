@@ -0,0 +1,279 @@
+"""
+Home feeds.
+
+A feed merges the posts of the users someone follows and of the groups
+they belong to, newest first. Most sources are fanned out on write: when
+a post is published it is copied into a FeedEntry row of every follower
+and member, and each feed is trimmed to FEED_MAX_ENTRIES rows, so reading
+a feed is one indexed query however many sources it has.
+
+Authors with more than FEED_PUSH_MAX_FOLLOWERS followers and groups with
+more than FEED_PUSH_MAX_MEMBERS members would cost one row per follower
+for every post, so they are fanned out on read instead: their posts are
+queried per source when the feed is read and k-way merged with the
+stored entries.
+"""
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import namedtuple
+from functools import partial
+from heapq import merge
+from itertools import islice
+import json
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.db.models import Count, Q
+from django.utils.dateparse import parse_datetime
+
+from core.db.concurrency import run_concurrently
+from feeds.models import FeedEntry
+from followers.models import UserFollower
+from groups.models import Group, GroupMember
+from groups.roles import get_member_group_ids
+from posts.models import Post
+
+
+FeedItem = namedtuple('FeedItem', ['published_at', 'post_id'])
+
+PULL_SOURCES_KEY = 'feed-pull-sources'
+
+
+def get_cache():
+    return caches[settings.FEED_CACHE_ALIAS]
+
+
+def get_pull_sources():
+    """
+    Returns the ids of the authors and of the groups fanned out on read,
+    as two frozensets. Recomputed every FEED_SOURCE_CACHE_TIMEOUT seconds.
+    """
+    cache = get_cache()
+    sources = cache.get(PULL_SOURCES_KEY, None)
+    if sources is None:
+        authors = UserFollower.objects\
+            .order_by()\
+            .values('followed_user')\
+            .annotate(total=Count('id'))\
+            .filter(total__gt=settings.FEED_PUSH_MAX_FOLLOWERS)\
+            .values_list('followed_user', flat=True)
+        groups = Group.objects\
+            .filter(members_count__gt=settings.FEED_PUSH_MAX_MEMBERS)\
+            .values_list('pk', flat=True)
+        sources = (frozenset(authors), frozenset(groups))
+        cache.set(PULL_SOURCES_KEY, sources, timeout=settings.FEED_SOURCE_CACHE_TIMEOUT)
+    return sources
+
+
+def get_recipients(post):
+    """
+    Returns the ids of the users whose stored feed receives ``post``: the
+    followers of its author and the members of its group, unless they are
+    fanned out on read.
+    """
+    pull_authors, pull_groups = get_pull_sources()
+    recipients = set()
+    if post.author_id not in pull_authors:
+        recipients.update(UserFollower.objects
+            .filter(followed_user_id=post.author_id)
+            .values_list('follower_id', flat=True))
+    if post.group_id is not None and post.group_id not in pull_groups:
+        recipients.update(GroupMember.objects
+            .filter(group_id=post.group_id)
+            .exclude(status=GroupMember.Status.BANNED)
+            .values_list('user_id', flat=True))
+    recipients.discard(post.author_id)
+    return recipients
+
+
+def fan_out_post(post):
+    """
+    Pushes ``post`` into the stored feeds of its recipients and trims
+    those feeds. Returns the number of feeds written.
+    """
+    recipients = get_recipients(post)
+    push_posts([post], recipients)
+    return len(recipients)
+
+
+def push_posts(posts, user_ids, batch_size=1000):
+    """
+    Stores ``posts`` in the feed of every user of ``user_ids`` and trims
+    those feeds to FEED_MAX_ENTRIES rows.
+    """
+    user_ids = list(user_ids)
+    if not user_ids or not posts:
+        return
+    with transaction.atomic():
+        FeedEntry.objects.bulk_create([
+            FeedEntry(user_id=user_id, post_id=post.pk, published_at=post.created_at)
+            for user_id in user_ids for post in posts
+        ], batch_size=batch_size, ignore_conflicts=True)
+        for start in range(0, len(user_ids), batch_size):
+            trim_feeds(user_ids[start:start + batch_size])
+
+
+TRIM_SQL = """
+    DELETE FROM {table} WHERE id IN (
+        SELECT id FROM (
+            SELECT id, ROW_NUMBER() OVER (
+                PARTITION BY user_id ORDER BY published_at DESC, post_id DESC
+            ) AS position
+            FROM {table} WHERE user_id IN ({users})
+        ) ranked WHERE position > %s
+    )
+"""
+
+
+def trim_feeds(user_ids):
+    """
+    Deletes everything past the newest FEED_MAX_ENTRIES entries of the
+    feeds of ``user_ids``, with one statement.
+    """
+    sql = TRIM_SQL.format(
+        table=connection.ops.quote_name(FeedEntry._meta.db_table),
+        users=', '.join(['%s'] * len(user_ids)),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, list(user_ids) + [settings.FEED_MAX_ENTRIES])
+
+
+def backfill_source(user_id, author_id=None, group_id=None):
+    """
+    Pushes the latest posts of a newly followed author or joined group
+    into the feed of ``user_id``. Sources fanned out on read are skipped.
+    """
+    pull_authors, pull_groups = get_pull_sources()
+    if author_id is not None and author_id not in pull_authors:
+        posts = published_posts().filter(author_id=author_id)
+    elif group_id is not None and group_id not in pull_groups:
+        posts = published_posts().filter(group_id=group_id)
+    else:
+        return
+    push_posts(list(posts.only('pk', 'created_at')[:settings.FEED_MAX_ENTRIES]), [user_id])
+
+
+def rebuild_feed(user_id):
+    """
+    Rewrites the stored feed of ``user_id`` from the latest posts of the
+    sources fanned out on write.
+    """
+    pull_authors, pull_groups = get_pull_sources()
+    authors = UserFollower.objects\
+        .filter(follower_id=user_id)\
+        .exclude(followed_user_id__in=pull_authors)\
+        .values('followed_user_id')
+    groups = GroupMember.objects\
+        .filter(user_id=user_id)\
+        .exclude(status=GroupMember.Status.BANNED)\
+        .exclude(group_id__in=pull_groups)\
+        .values('group_id')
+    posts = published_posts()\
+        .filter(Q(author_id__in=authors) | Q(group_id__in=groups))\
+        .exclude(author_id=user_id)\
+        .only('pk', 'created_at')[:settings.FEED_MAX_ENTRIES]
+    with transaction.atomic():
+        FeedEntry.objects.filter(user_id=user_id).delete()
+        push_posts(list(posts), [user_id])
+
+
+def published_posts():
+    return Post.objects.exclude(status=Post.STATUS.DRAFT).order_by('-created_at', '-id')
+
+
+def _source_items(queryset, before, limit):
+    if before is not None:
+        queryset = queryset.filter(_before(before, 'created_at', 'id'))
+    return [FeedItem(*row) for row in queryset.values_list('created_at', 'id')[:limit]]
+
+
+def _before(position, date_field, id_field):
+    published_at, post_id = position
+    return Q(**{date_field + '__lt': published_at}) | \
+        Q(**{date_field: published_at, id_field + '__lt': post_id})
+
+
+def get_feed_items(user, limit, before=None, request=None):
+    """
+    Returns the next ``limit`` FeedItems of the feed of ``user`` older than
+    ``before``, a (published_at, post_id) position, newest first.
+
+    The stored entries and every source fanned out on read are each read
+    with a query on their own (source, -created_at, -id) index, after
+    ``before`` and limited to ``limit`` rows, and the sorted streams are
+    k-way merged. The source queries run concurrently, see
+    core.db.concurrency. A post reached through several sources is
+    returned once.
+    """
+    pull_authors, pull_groups = get_pull_sources()
+    followed = set()
+    if pull_authors:
+        followed = set(UserFollower.objects
+            .filter(follower=user, followed_user_id__in=pull_authors)
+            .values_list('followed_user_id', flat=True))
+    pulled_groups = get_member_group_ids(user, request=request) & pull_groups
+
+    entries = FeedEntry.objects.filter(user=user).order_by('-published_at', '-post')
+    if before is not None:
+        entries = entries.filter(_before(before, 'published_at', 'post_id'))
+    streams = [
+        (FeedItem(*row) for row in entries.values_list('published_at', 'post_id')[:limit])
+    ]
+    sources = [published_posts().filter(author_id=author_id) for author_id in followed]
+    sources += [published_posts().filter(group_id=group_id) for group_id in pulled_groups]
+    streams += run_concurrently(*(
+        partial(_source_items, queryset, before, limit) for queryset in sources))
+
+    def unique(items):
+        seen = set()
+        for item in items:
+            if item.post_id not in seen:
+                seen.add(item.post_id)
+                yield item
+
+    newest_first = merge(*streams, key=lambda item: (item.published_at, item.post_id), reverse=True)
+    return list(islice(unique(newest_first), limit))
+
+
+def encode_cursor(item):
+    payload = json.dumps([item.published_at.isoformat(), item.post_id], separators=(',', ':'))
+    return urlsafe_b64encode(payload.encode('ascii')).decode('ascii')
+
+
+def decode_cursor(token):
+    """
+    Returns the (published_at, post_id) position of a cursor, raising
+    ValueError for malformed ones.
+    """
+    try:
+        published_at, post_id = json.loads(urlsafe_b64decode(token.encode('ascii')).decode('ascii'))
+        published_at = parse_datetime(published_at)
+    except (TypeError, ValueError, UnicodeError):
+        raise ValueError('Invalid cursor')
+    if published_at is None or not isinstance(post_id, int):
+        raise ValueError('Invalid cursor')
+    return published_at, post_id
+
+
+def remove_source(user_id, author_id=None, group_id=None):
+    """
+    Removes the posts of an unfollowed author or a left group from the
+    stored feed of ``user_id``, keeping those it still receives through
+    a group it belongs to or an author it follows.
+    """
+    entries = FeedEntry.objects.filter(user_id=user_id)
+    if author_id is not None:
+        groups = GroupMember.objects\
+            .filter(user_id=user_id)\
+            .exclude(status=GroupMember.Status.BANNED)\
+            .values('group_id')
+        entries.filter(post__author_id=author_id)\
+            .exclude(post__group_id__in=groups)\
+            .delete()
+    if group_id is not None:
+        authors = UserFollower.objects\
+            .filter(follower_id=user_id)\
+            .values('followed_user_id')
+        entries.filter(post__group_id=group_id)\
+            .exclude(post__author_id__in=authors)\
+            .delete()
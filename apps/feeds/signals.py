@@ -0,0 +1,58 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from feeds.services import backfill_source, fan_out_post, remove_source
+from followers.models import UserFollower
+from groups.models import GroupMember
+from posts.models import Post
+
+
+@receiver(pre_save, sender=Post)
+def post_status_hook(sender, instance, **kwargs):
+    # drafts are fanned out when they are published
+    instance._was_published = False
+    if instance.pk is not None:
+        instance._was_published = Post.objects\
+            .filter(pk=instance.pk)\
+            .exclude(status=Post.STATUS.DRAFT)\
+            .exists()
+
+
+@receiver(post_save, sender=Post)
+def post_published_hook(sender, instance, created, **kwargs):
+    if instance.status != Post.STATUS.DRAFT and not instance._was_published:
+        # outside the transaction saving the post, which would otherwise
+        # hold its locks for every feed written
+        transaction.on_commit(partial(fan_out_post, instance))
+
+
+# the feed writes of following, joining and leaving run once the change
+# committed, outside its transaction, like the fan out of a post
+
+
+@receiver(post_save, sender=UserFollower)
+def user_followed_hook(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(partial(
+            backfill_source, instance.follower_id, author_id=instance.followed_user_id))
+
+
+@receiver(post_delete, sender=UserFollower)
+def user_unfollowed_hook(sender, instance, **kwargs):
+    transaction.on_commit(partial(
+        remove_source, instance.follower_id, author_id=instance.followed_user_id))
+
+
+@receiver(post_save, sender=GroupMember)
+def member_joined_hook(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(partial(
+            backfill_source, instance.user_id, group_id=instance.group_id))
+
+
+@receiver(post_delete, sender=GroupMember)
+def member_left_hook(sender, instance, **kwargs):
+    transaction.on_commit(partial(
+        remove_source, instance.user_id, group_id=instance.group_id))
@@ -0,0 +1,6 @@
+from django.urls import path, include
+from .router import router
+
+urlpatterns = [
+    path('api/v1/', include(router.urls)),
+]
@@ -0,0 +1,50 @@
+from collections import OrderedDict
+from django.db.models import Prefetch
+from rest_framework import status, viewsets
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+from core.mixins import ReplicaReadMixin
+from feeds.services import decode_cursor, encode_cursor, get_feed_items
+from posts.models import Post
+from posts.serializers import PostSerializer
+from posts.services import visible_posts
+from tags.models import Tag
+
+
+class FeedViewSet(ReplicaReadMixin, viewsets.ViewSet):
+    """
+    The home feed of the current user: posts of followed users and joined
+    groups, newest first. Pass back the ``next`` url for the next page.
+    """
+    permission_classes = [IsAuthenticated, ]
+    page_size = 12
+    cursor_query_param = 'cursor'
+
+    def list(self, request):
+        before = None
+        token = request.query_params.get(self.cursor_query_param)
+        if token:
+            try:
+                before = decode_cursor(token)
+            except ValueError:
+                return Response({'error': 'Invalid cursor'}, status=status.HTTP_400_BAD_REQUEST)
+
+        items = get_feed_items(request.user, self.page_size, before=before, request=request)
+        posts = visible_posts(Post.objects.all(), request.user, request=request)\
+            .filter(pk__in=[item.post_id for item in items])\
+            .select_related('author', 'group')\
+            .prefetch_related(
+                Prefetch('tags', queryset=Tag.objects.select_related('tag_type')))
+        posts = {post.pk: post for post in posts}
+        page = [posts[item.post_id] for item in items if item.post_id in posts]
+        serializer = PostSerializer(page, many=True, context={'request': request})
+
+        next_link = None
+        if len(items) == self.page_size:
+            next_link = replace_query_param(
+                request.build_absolute_uri(), self.cursor_query_param, encode_cursor(items[-1]))
+        return Response(OrderedDict([
+            ('next', next_link),
+            ('results', serializer.data),
+        ]), status=status.HTTP_200_OK)
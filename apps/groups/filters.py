@@ -3,9 +3,27 @@ from groups.models import Group, GroupMember
 
 
 class GroupFilterSet(django_filters.rest_framework.FilterSet):
+    SORT_ORDERINGS = {
+        'new': ('-created_at', '-id'),
+        'old': ('created_at', 'id'),
+        'members': ('-members_count', '-id'),
+    }
+
+    sort = django_filters.ChoiceFilter(
+        choices=[(key, key) for key in SORT_ORDERINGS],
+        method='filter_sort'
+    )
+
     class Meta:
         model = Group
-        fields = ('group_type', 'members__user', 'members__member_type')
+        fields = ('group_type', 'members__user', 'members__member_type', 'sort')
+
+    def filter_sort(self, queryset, name, value):
+        """
+        Directory sort; ``members`` reads the stored members_count, backed
+        by an index on (members_count, id).
+        """
+        return queryset.order_by(*self.SORT_ORDERINGS[value])
 
 
 class GroupMemberFilterSet(django_filters.rest_framework.FilterSet):
@@ -0,0 +1,33 @@
+# Generated by Django 3.1.14 on 2026-10-18 17:28
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def populate_members_count(apps, schema_editor):
+    Group = apps.get_model('groups', 'Group')
+    GroupMember = apps.get_model('groups', 'GroupMember')
+    members = GroupMember.objects.filter(group=OuterRef('pk'))\
+        .order_by().values('group').annotate(total=Count('id')).values('total')
+    Group.objects.update(members_count=Coalesce(Subquery(members), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('groups', '0006_altered_group_model'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='members_count',
+            field=models.PositiveIntegerField(default=0, help_text='Number of GroupMember rows. Kept up to date by groups.signals.'),
+        ),
+        migrations.AddIndex(
+            model_name='group',
+            index=models.Index(fields=['-members_count', '-id'], name='group_members_idx'),
+        ),
+        migrations.RunPython(populate_members_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.1.14 on 2026-10-18 17:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('groups', '0007_added_group_members_count'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='groupmember',
+            index=models.Index(fields=['group', 'user'], name='groupmember_role_idx'),
+        ),
+    ]
@@ -32,11 +32,18 @@ class Group(TimeStampedModel):
         verbose_name="topics",
         related_name="groups"
     )
+    members_count = models.PositiveIntegerField(
+        default=0,
+        help_text="Number of GroupMember rows. Kept up to date by groups.signals."
+    )
 
     class Meta:
         ordering = ["-created_at"]
         verbose_name = "Group"
         verbose_name_plural = "Groups"
+        indexes = [
+            models.Index(fields=['-members_count', '-id'], name='group_members_idx'),
+        ]
 
     def __str__(self):
         return f"Group: {self.name}"
@@ -51,6 +51,9 @@ class GroupMember(TimeStampedModel):
         ordering = ["-created_at"]
         verbose_name = "Group Member"
         verbose_name_plural = "Group Members"
+        indexes = [
+            models.Index(fields=['group', 'user'], name='groupmember_role_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} added to {self.group.name} as {self.member_type}"
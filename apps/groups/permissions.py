@@ -1,35 +1,30 @@
 from rest_framework import permissions
-from groups.models import Group
+from groups.roles import has_group_capability
 
 
-class HasGroupEditPermissions(permissions.BasePermission):
-    def has_object_permission(self, request, view, obj):
-        user = request.user
-        try:
-            group_id = request.parser_context['kwargs']['pk']
-            group = Group.objects.filter(id=group_id)
-        except Exception as e:
+class HasGroupCapability(permissions.BasePermission):
+    """
+    Allows the request when the user's role in the group of the route
+    grants ``capability``, see groups.roles.
+    """
+    capability = None
+    group_kwarg = 'pk'
+
+    def has_permission(self, request, view):
+        group_id = view.kwargs.get(self.group_kwarg, None)
+        if group_id is None or not str(group_id).isdigit():
             return False
-        return user.has_perm('edit_groups', group)
+        return has_group_capability(
+            request.user, group_id, self.capability, request=request)
 
 
-class HasGroupDeletePermissions(permissions.BasePermission):
-    def has_object_permission(self, request, view, obj):
-        user = request.user
-        try:
-            group_id = request.parser_context['kwargs']['pk']
-            group = Group.objects.filter(id=group_id)
-        except Exception as e:
-            return False
-        return user.has_perm('delete_groups', group)
+class HasGroupEditPermissions(HasGroupCapability):
+    capability = 'edit_groups'
 
 
-class HasAddMembersPermissions(permissions.BasePermission):
-    def has_object_permission(self, request, view, obj):
-        user = request.user
-        try:
-            member_id = request.parser_context['kwargs']['pk']
-            member = Group.objects.filter(id=member_id)
-        except Exception as e:
-            return False
-        return user.has_perm('add_members', member)
+class HasGroupDeletePermissions(HasGroupCapability):
+    capability = 'delete_groups'
+
+
+class HasAddMembersPermissions(HasGroupCapability):
+    capability = 'add_members'
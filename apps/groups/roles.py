@@ -0,0 +1,168 @@
+"""
+Group roles.
+
+What a user may do in a group follows from their GroupMember row: the
+member type gives the capabilities and only ACTIVE members hold them. A
+role is resolved with one lookup on the (group, user) index and cached
+twice: on the request, so several permission checks and serializers of
+one request share it, and in the cache of settings.GROUP_ROLE_CACHE_ALIAS
+for GROUP_ROLE_CACHE_TIMEOUT seconds. groups.signals drops the cached
+role whenever the GroupMember row is saved or deleted; queryset updates
+bypass the signals and are only picked up once the entry expires. That
+cache has to be shared by every process, see core.checks, for a drop to
+reach all of them; the permission checks of groups.permissions can then
+trust the cached role.
+
+The ids of the groups a user belongs to are cached the same way, for
+visibility checks of PRIVATE groups, see ``get_member_group_ids``.
+"""
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import caches
+
+from groups.models import GroupMember
+
+
+MODERATOR_CAPABILITIES = frozenset({'add_members', 'edit_groups'})
+ADMIN_CAPABILITIES = MODERATOR_CAPABILITIES | {
+    'add_moderators', 'remove_moderators', 'change_members',
+    'delete_members', 'delete_groups',
+}
+
+ROLE_CAPABILITIES = {
+    GroupMember.MemberTypes.ADMIN: ADMIN_CAPABILITIES,
+    GroupMember.MemberTypes.MODERATOR: MODERATOR_CAPABILITIES,
+    GroupMember.MemberTypes.MEMBER: frozenset(),
+}
+
+
+class GroupRole(namedtuple('GroupRole', ['member_type', 'status'])):
+    """
+    The member type and status of a user in one group.
+    """
+    __slots__ = ()
+
+    @property
+    def capabilities(self):
+        if self.status != GroupMember.Status.ACTIVE:
+            return frozenset()
+        return ROLE_CAPABILITIES.get(self.member_type, frozenset())
+
+    def can(self, capability):
+        return capability in self.capabilities
+
+
+# cached for users who are not members, so that misses are cached too
+NO_ROLE = ''
+
+
+def get_cache():
+    return caches[settings.GROUP_ROLE_CACHE_ALIAS]
+
+
+def _role_key(group_id, user_id):
+    return f'group-role:{group_id}:{user_id}'
+
+
+def _memberships_key(user_id):
+    return f'group-memberships:{user_id}'
+
+
+def _request_roles(request):
+    if request is None:
+        return {}
+    roles = getattr(request, '_group_roles', None)
+    if roles is None:
+        roles = {}
+        request._group_roles = roles
+    return roles
+
+
+def get_roles(user, group_ids, request=None):
+    """
+    Returns the role of ``user`` in each of ``group_ids`` as a dict keyed
+    by group id, None where the user is not a member. Roles missing from
+    the request and the cache are loaded with a single IN query.
+    """
+    group_ids = {int(group_id) for group_id in group_ids}
+    if user is None or not user.is_authenticated or not group_ids:
+        return {group_id: None for group_id in group_ids}
+
+    local = _request_roles(request)
+    roles = {
+        group_id: local[(group_id, user.pk)]
+        for group_id in group_ids if (group_id, user.pk) in local
+    }
+    missing = group_ids - set(roles)
+    if missing:
+        cache = get_cache()
+        keys = {_role_key(group_id, user.pk): group_id for group_id in missing}
+        for key, value in cache.get_many(list(keys)).items():
+            roles[keys[key]] = GroupRole(*value) if value != NO_ROLE else None
+        missing -= set(roles)
+    if missing:
+        members = GroupMember.objects\
+            .filter(user=user, group_id__in=missing)\
+            .values_list('group_id', 'member_type', 'status')
+        loaded = {group_id: GroupRole(member_type, status)
+            for group_id, member_type, status in members}
+        get_cache().set_many({
+            _role_key(group_id, user.pk): tuple(loaded[group_id]) if group_id in loaded else NO_ROLE
+            for group_id in missing
+        }, timeout=settings.GROUP_ROLE_CACHE_TIMEOUT)
+        for group_id in missing:
+            roles[group_id] = loaded.get(group_id, None)
+
+    for group_id, role in roles.items():
+        local[(group_id, user.pk)] = role
+    return roles
+
+
+def get_role(user, group_id, request=None):
+    """
+    Returns the role of ``user`` in the group ``group_id``, or None.
+    """
+    return get_roles(user, [group_id], request=request).get(int(group_id), None)
+
+
+def has_group_capability(user, group_id, capability, request=None):
+    role = get_role(user, group_id, request=request)
+    return role is not None and role.can(capability)
+
+
+def get_member_group_ids(user, request=None):
+    """
+    Returns the ids of the groups ``user`` is a member of and not banned
+    from, as a frozenset. Empty for anonymous users.
+    """
+    if user is None or not user.is_authenticated:
+        return frozenset()
+    if request is not None and hasattr(request, '_group_memberships'):
+        return request._group_memberships
+    cache = get_cache()
+    key = _memberships_key(user.pk)
+    group_ids = cache.get(key, None)
+    if group_ids is None:
+        group_ids = frozenset(GroupMember.objects
+            .filter(user=user)
+            .exclude(status=GroupMember.Status.BANNED)
+            .order_by()
+            .values_list('group_id', flat=True))
+        cache.set(key, group_ids, timeout=settings.GROUP_ROLE_CACHE_TIMEOUT)
+    if request is not None:
+        request._group_memberships = group_ids
+    return group_ids
+
+
+def can_view_group(user, group, request=None):
+    """
+    Anyone can view PUBLIC and RESTRICTED groups, only members PRIVATE ones.
+    """
+    if group.group_type != group.Type.PRIVATE:
+        return True
+    return group.pk in get_member_group_ids(user, request=request)
+
+
+def invalidate_role(group_id, user_id):
+    get_cache().delete_many([_role_key(group_id, user_id), _memberships_key(user_id)])
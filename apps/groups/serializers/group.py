@@ -1,6 +1,9 @@
+from django.db import models
 from rest_framework import serializers
 from core.serializers import ModelReadOnlySerializer
 from groups.models import Group, GroupMember, MemberRequest
+from groups import roles
+from groups.services import build_member_requests
 from tags.serializers import TagSerializer, TagReadOnlySerializer
 
 
@@ -27,25 +30,66 @@ class GroupReadOnlyLightSerializer(ModelReadOnlySerializer):
         fields = ('id', 'name',)
 
 
+def serialize_role(role):
+    if role is None:
+        return None
+    return {
+        'member_type': role.member_type,
+        'status': role.status,
+        'capabilities': sorted(role.capabilities),
+    }
+
+
+class GroupListSerializer(serializers.ListSerializer):
+    """
+    Fetches the viewer's member requests and roles for the whole page at
+    once, so GroupSerializer reads them from dicts keyed by group id.
+    """
+    def to_representation(self, data):
+        groups = list(data.all() if isinstance(data, models.Manager) else data)
+        request = self.context.get('request', None)
+        user = request.user if request is not None else None
+        self.context['member_requests'] = build_member_requests(groups, user)
+        self.context['member_roles'] = roles.get_roles(
+            user, [group.pk for group in groups], request=request)
+        return super(GroupListSerializer, self).to_representation(groups)
+
+
 class GroupSerializer(serializers.ModelSerializer):
     topics = TagSerializer(required=False, many=True)
     members = serializers.SerializerMethodField()
     member_status = serializers.SerializerMethodField()
+    role = serializers.SerializerMethodField()
     group_type = serializers.SerializerMethodField()
 
     class Meta:
         model = Group
         fields = (
             'id', 'name', 'description', 'group_type', 'topics',
-            'archive_posts', 'created_at', 'members', 'member_status'
+            'archive_posts', 'created_at', 'members', 'member_status', 'role'
         )
+        list_serializer_class = GroupListSerializer
 
     def get_members(self, obj):
-        if hasattr(obj, 'members'):
-            return obj.members.count()
-        return 0
+        return obj.members_count
+
+    def get_role(self, obj):
+        member_roles = self.context.get('member_roles', None)
+        if member_roles is not None:
+            return serialize_role(member_roles.get(obj.pk, None))
+        request = self.context.get('request', None)
+        if request is None:
+            return None
+        return serialize_role(roles.get_role(request.user, obj.pk, request=request))
 
     def get_member_status(self, obj):
+        member_requests = self.context.get('member_requests', None)
+        if member_requests is not None:
+            member_request = member_requests.get(obj.pk, None)
+            if member_request is not None:
+                from groups.serializers import MemberRequestReadOnlySerializer
+                return MemberRequestReadOnlySerializer(member_request).data
+            return None
         request = self.context['request']
         if request and request.user and request.user.is_authenticated:
             member_request = MemberRequest.objects.filter(group=obj, user=request.user).first()
@@ -91,27 +135,40 @@ class GroupHeavySerializer(serializers.ModelSerializer):
     rules = serializers.SerializerMethodField()
     members_count = serializers.SerializerMethodField()
     member_status = serializers.SerializerMethodField()
+    role = serializers.SerializerMethodField()
     group_type = serializers.SerializerMethodField()
 
     class Meta:
         model = Group
         fields = (
             'id', 'name', 'description', 'group_type', 'topics', 'member_status',
-            'archive_posts', 'rules', 'members_count', 'created_at',
+            'role', 'archive_posts', 'rules', 'members_count', 'created_at',
         )
 
     def get_rules(self, obj):
         if hasattr(obj, 'rules'):
             from groups.serializers import GroupRuleSerializer
-            return GroupRuleSerializer(obj.rules.all(), many=True).data
+            rules = self.context.get('group_rules', None)
+            if rules is None:
+                rules = obj.rules.all()
+            return GroupRuleSerializer(rules, many=True).data
         return []
 
     def get_members_count(self, obj):
-        if hasattr(obj, 'members'):
-            return obj.members.count()
-        return 0
+        return obj.members_count
+
+    def get_role(self, obj):
+        request = self.context['request']
+        return serialize_role(roles.get_role(request.user, obj.pk, request=request))
 
     def get_member_status(self, obj):
+        member_requests = self.context.get('member_requests', None)
+        if member_requests is not None:
+            member_request = member_requests.get(obj.pk, None)
+            if member_request is not None:
+                from groups.serializers import MemberRequestReadOnlySerializer
+                return MemberRequestReadOnlySerializer(member_request).data
+            return None
         request = self.context['request']
         if request and request.user and request.user.is_authenticated:
             member_request = MemberRequest.objects.filter(group=obj, user=request.user).first()
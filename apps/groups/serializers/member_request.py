@@ -1,6 +1,6 @@
 from rest_framework import serializers
 from core.serializers import ModelReadOnlySerializer
-from groups.models import MemberRequest, GroupMember
+from groups.models import MemberRequest
 
 
 class MemberRequestReadOnlySerializer(ModelReadOnlySerializer):
@@ -18,11 +18,5 @@ class MemberRequestSerializer(serializers.ModelSerializer):
             'group': {'write_only': True}
         }
     def create(self, validated_data):
-        request = self.context['request']
-        member_request = MemberRequest.objects.create(**validated_data)
-        if member_request.group.group_type == 'PUBLIC':
-            member_request.is_approved = True
-            member_request.save()
-            if request.user:
-                member, created = GroupMember.objects.get_or_create(group=member_request.group, user=request.user)
-        return member_request
+        # groups.signals approves requests to PUBLIC groups and adds the member
+        return MemberRequest.objects.create(**validated_data)
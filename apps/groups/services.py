@@ -1,17 +1,62 @@
-from guardian.shortcuts import assign_perm, remove_perm
-from groups.models import Group, GroupMember
-
-
-def assign_permissions(member_type, user, group):
-    if member_type == GroupMember.MemberTypes.MEMBER.value:
-        return
-    elif member_type == GroupMember.MemberTypes.MODERATOR.value:
-        assign_perm('add_members', user, group)
-        assign_perm('edit_groups', user, group)
-    elif member_type == GroupMember.MemberTypes.ADMIN.value:
-        assign_permissions(GroupMember.MemberTypes.MODERATOR.value, user, group)
-        assign_perm('add_moderators', user, group)
-        assign_perm('remove_moderators', user, group)
-        assign_perm('change_members', user, group)
-        assign_perm('delete_members', user, group)
-        assign_perm('delete_groups', user, group)
+from functools import partial
+
+from django.db.models import Count, F, OuterRef, Prefetch, Subquery, Value, prefetch_related_objects
+from django.db.models.functions import Coalesce
+from core.cache import bump_all
+from core.db.concurrency import run_concurrently
+from groups.models import Group, GroupMember, MemberRequest
+from tags.models import Tag
+
+
+def adjust_members_count(group_id, delta):
+    """
+    Adds ``delta`` to the stored members count of the group ``group_id``.
+    """
+    Group.objects.filter(pk=group_id)\
+        .update(members_count=F('members_count') + delta)
+
+
+def rebuild_members_count(queryset=None):
+    """
+    Recomputes members_count from GroupMember in one UPDATE statement.
+    Returns the number of groups updated.
+    """
+    if queryset is None:
+        queryset = Group.objects.all()
+    members = GroupMember.objects.filter(group=OuterRef('pk'))\
+        .order_by()\
+        .values('group')\
+        .annotate(total=Count('id'))\
+        .values('total')
+    updated = queryset.update(members_count=Coalesce(Subquery(members), Value(0)))
+    bump_all('groups')
+    return updated
+
+
+def build_member_requests(groups, user=None):
+    """
+    Returns the member request of ``user`` for each of ``groups`` with a
+    single IN query, as a dict keyed by group id. Anonymous users have none.
+    """
+    if user is None or not user.is_authenticated:
+        return {}
+    requests = MemberRequest.objects\
+        .filter(group__in=[group.pk for group in groups], user=user)\
+        .order_by('created_at')
+    return {request.group_id: request for request in requests}
+
+
+def build_group_detail(group, user=None):
+    """
+    Loads what GroupHeavySerializer shows of ``group`` beyond its row: its
+    topics, its rules and the member request of ``user``, with queries run
+    concurrently, see core.db.concurrency. The topics are prefetched on
+    ``group``, the rest is returned as serializer context.
+    """
+    topics = Prefetch('topics', queryset=Tag.objects.select_related('tag_type'))
+    _, rules, member_requests = run_concurrently(
+        partial(prefetch_related_objects, [group], topics),
+        partial(list, group.rules.all()),
+        partial(build_member_requests, [group], user),
+    )
+    return {'group_rules': rules, 'member_requests': member_requests}
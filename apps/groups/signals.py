@@ -1,22 +1,31 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from groups.models import Group, GroupMember, MemberRequest
-from groups.services import assign_permissions
+from groups.roles import invalidate_role
+from groups.services import adjust_members_count
+
 
 @receiver(post_save, sender=MemberRequest)
 def member_request_created_hook(sender, instance, created, **kwargs):
+    # Requests to PUBLIC groups are granted on the spot
     if created and instance:
-        if instance.group.group_type == "PUBLIC":
-            member, created = GroupMember.objects.create(
+        if instance.group.group_type == Group.Type.PUBLIC:
+            GroupMember.objects.get_or_create(
                 group=instance.group,
                 user=instance.user
             )
+            MemberRequest.objects.filter(pk=instance.pk).update(is_approved=True)
+            instance.is_approved = True
+
+
+@receiver(post_save, sender=GroupMember)
+def member_created_hook(sender, instance, created, **kwargs):
+    if created:
+        adjust_members_count(instance.group_id, 1)
+    invalidate_role(instance.group_id, instance.user_id)
+
 
-@receiver(pre_save, sender=GroupMember)
-def permissions_for_member_type(sender, instance, created, **kwargs):
-    if created.id:
-        assign_permissions(
-            instance.member_type,
-            instance.member,
-            instance.group
-        )
+@receiver(post_delete, sender=GroupMember)
+def member_deleted_hook(sender, instance, **kwargs):
+    adjust_members_count(instance.group_id, -1)
+    invalidate_role(instance.group_id, instance.user_id)
@@ -4,6 +4,8 @@ from rest_framework.decorators import action
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import IsAuthenticated
 from core.views import BaseViewSet, BaseReadOnlyViewSet
+from core.cache import cached_response
+from core.pagination import KeysetPagination
 from groups.models import Group, GroupMember, MemberRequest
 from django.contrib.auth.models import User
 from groups.filters import GroupFilterSet
@@ -11,17 +13,26 @@ from groups.serializers import (
     GroupReadOnlySerializer, GroupSerializer,
     GroupCreateSerializer, GroupHeavySerializer
 )
+from django.db.models import Prefetch
 from posts.models import Post
-from posts.serializers import PostReadOnlySerializer
+from posts.filters import PostFilterSet
+from tags.models import Tag
+from posts.serializers import PostSerializer
 from groups.permissions import (
     HasGroupEditPermissions, HasGroupDeletePermissions
 )
+from groups.roles import can_view_group
+from groups.services import build_group_detail
 
 
 class GroupPagination(PageNumberPagination):
     page_size = 24
 
 
+class GroupPostCursorPagination(KeysetPagination):
+    page_size = 12
+
+
 class GroupViewSet(BaseViewSet):
     queryset = Group.objects.all().order_by('created_at')
     serializer_class = GroupSerializer
@@ -29,7 +40,7 @@ class GroupViewSet(BaseViewSet):
         'create' : GroupCreateSerializer,
         'update' : GroupCreateSerializer,
         'retrieve' : GroupHeavySerializer,
-        'posts': PostReadOnlySerializer
+        'posts': PostSerializer
     }
     permission_action_classes = {
         'update': [HasGroupEditPermissions,],
@@ -39,18 +50,34 @@ class GroupViewSet(BaseViewSet):
     }
     pagination_class = GroupPagination
     filterset_class = GroupFilterSet
+    cache_namespace = 'groups'
+    cache_depends = ('tags',)
+    async_actions = ('retrieve',)
 
+    def get_cache_namespaces(self):
+        namespaces = super(GroupViewSet, self).get_cache_namespaces()
+        if self.action == 'posts':
+            namespaces.append('posts')
+        return namespaces
+
+    @cached_response()
     def list(self, request):
-        queryset = self.queryset
-        serializer_class = self.get_serializer_class()
-        serializer = serializer_class(queryset, many=True, context={'request': request })
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        queryset = self.filter_queryset(self.get_queryset())\
+            .prefetch_related(
+                Prefetch('topics', queryset=Tag.objects.select_related('tag_type')))
+        return self.paginated_response(queryset, context={'request': request})
 
+    @cached_response()
     def retrieve(self, request, pk=None):
         group = self.get_object()
+        not_modified = self.not_modified(obj=group)
+        if not_modified is not None:
+            return not_modified
+        context = build_group_detail(group, request.user)
+        context['request'] = request
         serializer_class = self.get_serializer_class()
-        serializer = serializer_class(group, context={'request': request })
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        serializer = serializer_class(group, context=context)
+        return self.set_validators(Response(serializer.data, status=status.HTTP_200_OK))
 
     def create(self, request):
         data = request.data
@@ -84,12 +111,31 @@ class GroupViewSet(BaseViewSet):
         return Response(status=status.HTTP_403_FORBIDDEN)
 
     @action(detail=True)
+    @cached_response()
     def posts(self, request, pk=None):
-        group = self.get_object()
-        queryset = Post.objects.filter(group=group)
-        serializer_class = self.get_serializer_class()
-        serializer = serializer_class(queryset, many=True, context={'user': request.user })
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        """
+        The group feed: published posts of the group, cursor paginated and
+        sorted like the front page (``?sort=hot`` etc.). PRIVATE groups are
+        only visible to their members.
+        """
+        # the query parameters belong to PostFilterSet, not GroupFilterSet
+        group = generics.get_object_or_404(self.get_queryset(), pk=pk)
+        self.check_object_permissions(request, group)
+        if not can_view_group(request.user, group, request=request):
+            return Response(
+                {'error': 'This group is private'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        queryset = Post.objects.filter(group=group)\
+            .exclude(status=Post.STATUS.DRAFT)\
+            .select_related('author', 'group')\
+            .prefetch_related(
+                Prefetch('tags', queryset=Tag.objects.select_related('tag_type')))
+        filterset = PostFilterSet(request.query_params, queryset=queryset, request=request)
+        if not filterset.is_valid():
+            return Response(filterset.errors, status=status.HTTP_400_BAD_REQUEST)
+        return self.paginated_response(
+            filterset.qs, context={'request': request}, paginator=GroupPostCursorPagination())
 
     @action(detail=True)
     def add_topic(self, request, pk=None):
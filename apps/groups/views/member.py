@@ -4,6 +4,7 @@ from rest_framework.decorators import action
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import IsAuthenticated
 from core.views import BaseViewSet, BaseReadOnlyViewSet
+from core.pagination import KeysetPagination
 from groups.models import GroupMember
 from django.contrib.auth.models import User
 from groups.serializers import GroupMemberSerializer
@@ -14,20 +15,21 @@ class GroupMemberPagination(PageNumberPagination):
     page_size = 24
 
 
+class GroupMemberCursorPagination(KeysetPagination):
+    page_size = 24
+
+
 class GroupMemberViewSet(BaseReadOnlyViewSet):
     queryset = GroupMember.objects.all()
     serializer_class = GroupMemberSerializer
     permission_classes = [IsAuthenticated, ]
     pagination_class = GroupMemberPagination
+    cursor_pagination_class = GroupMemberCursorPagination
     filterset_class = GroupMemberFilterSet
-    
+
     def get_queryset(self):
         queryset = self.queryset
         if self.kwargs != {}:
             if 'group_pk' in self.kwargs:
                 queryset = queryset.filter(group__pk=self.kwargs['group_pk'])
-        return queryset
-
-    # def list(self, request, group_pk=None):
-    #     queryset = self.filter_queryset(self.get_queryset())
-    #     return self.paginated_response(queryset, context={'request': request})
+        return queryset.select_related('group', 'user')
@@ -1,12 +1,54 @@
 import django_filters
+from datetime import timedelta
+from django.utils import timezone
 from posts.models import Post
 from django.db import models
 
 
 class PostFilterSet(django_filters.FilterSet):
+    SORT_ORDERINGS = {
+        'new': ('-created_at', '-id'),
+        'hot': ('-hot_rank', '-id'),
+        'top': ('-score', '-id'),
+        'controversial': ('-controversy_rank', '-id'),
+        'rising': ('-rising_rank', '-id'),
+    }
+    TOP_WINDOWS = {
+        'day': timedelta(days=1),
+        'week': timedelta(weeks=1),
+        'all': None,
+    }
+
     title = django_filters.CharFilter(field_name='title', lookup_expr='contains')
     author = django_filters.CharFilter(field_name='author__username', lookup_expr='exact')
+    sort = django_filters.ChoiceFilter(
+        choices=[(key, key) for key in SORT_ORDERINGS],
+        method='filter_sort'
+    )
+    t = django_filters.ChoiceFilter(
+        choices=[(key, key) for key in TOP_WINDOWS],
+        method='filter_window'
+    )
 
     class Meta:
         model = Post
-        fields = ('title', 'status', 'group', 'author')
+        fields = ('title', 'status', 'group', 'author', 'sort', 't')
+
+    def filter_sort(self, queryset, name, value):
+        """
+        Orders by one of the precomputed rank columns, each backed by an
+        index on (rank, id).
+        """
+        queryset = queryset.order_by(*self.SORT_ORDERINGS[value])
+        if value == 'rising':
+            queryset = queryset.filter(rising_rank__gt=0)
+        return queryset
+
+    def filter_window(self, queryset, name, value):
+        """
+        Restricts ``sort=top`` to posts created inside the given window.
+        """
+        window = self.TOP_WINDOWS[value]
+        if window is None or self.form.cleaned_data.get('sort') != 'top':
+            return queryset
+        return queryset.filter(created_at__gte=timezone.now() - window)
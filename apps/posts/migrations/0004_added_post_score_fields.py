@@ -0,0 +1,50 @@
+# Generated by Django 3.1.14 on 2026-10-18 17:10
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def populate_vote_counters(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    PostVote = apps.get_model('posts', 'PostVote')
+
+    def _aggregate(expression):
+        votes = PostVote.objects.filter(post=OuterRef('pk'))\
+            .order_by()\
+            .values('post')\
+            .annotate(total=expression)\
+            .values('total')
+        return Coalesce(Subquery(votes), Value(0))
+
+    Post.objects.update(
+        score=_aggregate(Sum('vote')),
+        upvotes=_aggregate(Count('id', filter=Q(vote=1))),
+        downvotes=_aggregate(Count('id', filter=Q(vote=-1))),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0003_added_post_vote_model'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='downvotes',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='score',
+            field=models.IntegerField(default=0, help_text='Sum of all votes. Maintained incrementally, see posts.services'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='upvotes',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(populate_vote_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 3.1.14 on 2026-10-18 17:12
+
+from django.db import migrations, models
+from django.utils import timezone
+
+from posts.ranking import ranks
+
+
+def populate_ranks(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    now = timezone.now()
+    posts = list(Post.objects.all())
+    for post in posts:
+        for field, value in ranks(
+                post.score, post.upvotes, post.downvotes,
+                post.created_at, now).items():
+            setattr(post, field, value)
+    Post.objects.bulk_update(
+        posts, ['hot_rank', 'controversy_rank', 'rising_rank'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0004_added_post_score_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='controversy_rank',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='hot_rank',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='rising_rank',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-created_at', '-id'], name='post_new_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-hot_rank', '-id'], name='post_hot_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-score', '-id'], name='post_top_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-controversy_rank', '-id'], name='post_controversial_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-rising_rank', '-id'], name='post_rising_idx'),
+        ),
+        migrations.RunPython(populate_ranks, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 3.1.14 on 2026-10-18 17:19
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from posts.ranking import ranks
+
+
+def remove_duplicate_votes(apps, schema_editor):
+    """
+    Keeps the most recent vote of every (user, post) pair and recomputes
+    the counters of the posts that had duplicates.
+    """
+    Post = apps.get_model('posts', 'Post')
+    PostVote = apps.get_model('posts', 'PostVote')
+    duplicates = PostVote.objects.order_by().values('user_id', 'post_id')\
+        .annotate(total=Count('id')).filter(total__gt=1)
+    post_ids = set()
+    for pair in duplicates:
+        votes = PostVote.objects\
+            .filter(user_id=pair['user_id'], post_id=pair['post_id'])\
+            .order_by('-updated_at', '-id')
+        PostVote.objects.filter(pk__in=list(votes.values_list('pk', flat=True)[1:])).delete()
+        post_ids.add(pair['post_id'])
+
+    now = timezone.now()
+    for post in Post.objects.filter(pk__in=post_ids):
+        totals = PostVote.objects.filter(post=post).aggregate(
+            score=Sum('vote'),
+            upvotes=Count('id', filter=Q(vote=1)),
+            downvotes=Count('id', filter=Q(vote=-1)),
+        )
+        post.score = totals['score'] or 0
+        post.upvotes = totals['upvotes']
+        post.downvotes = totals['downvotes']
+        for field, value in ranks(
+                post.score, post.upvotes, post.downvotes,
+                post.created_at, now).items():
+            setattr(post, field, value)
+        post.save(update_fields=[
+            'score', 'upvotes', 'downvotes',
+            'hot_rank', 'controversy_rank', 'rising_rank'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0005_added_post_rank_fields'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_votes, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='postvote',
+            constraint=models.UniqueConstraint(fields=('user', 'post'), name='unique_post_vote'),
+        ),
+    ]
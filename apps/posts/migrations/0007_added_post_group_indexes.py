@@ -0,0 +1,21 @@
+# Generated by Django 3.1.14 on 2026-10-18 17:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0006_added_unique_post_vote'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(_negated=True, status='DRAFT'), fields=['group', '-created_at', '-id'], name='post_group_new_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(_negated=True, status='DRAFT'), fields=['group', '-hot_rank', '-id'], name='post_group_hot_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.1.14 on 2026-10-18 17:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0007_added_post_group_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(_negated=True, status='DRAFT'), fields=['author', '-created_at', '-id'], name='post_author_new_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.1.14 on 2026-10-18 17:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0008_added_post_author_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='postvote',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='postvote_user_idx'),
+        ),
+    ]
@@ -1,11 +1,12 @@
 from django.db import models
-from django.db.models import Sum
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 from core.models import TimeStampedModel
 from tags.models import Tag
 from django.core.validators import MinValueValidator, MaxValueValidator
 from groups.models import Group
+from posts.ranking import ranks
 import uuid
 
 class Post(TimeStampedModel):
@@ -37,22 +38,52 @@ class Post(TimeStampedModel):
         related_name="posts",
         on_delete=models.SET_NULL,
     )
+    score = models.IntegerField(
+        default=0,
+        help_text="Sum of all votes. Maintained incrementally, see posts.services"
+    )
+    upvotes = models.PositiveIntegerField(default=0)
+    downvotes = models.PositiveIntegerField(default=0)
+    hot_rank = models.FloatField(default=0)
+    controversy_rank = models.FloatField(default=0)
+    rising_rank = models.FloatField(default=0)
 
     class Meta:
         verbose_name = "Post"
         verbose_name_plural = "Posts"
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='post_new_idx'),
+            models.Index(fields=['-hot_rank', '-id'], name='post_hot_idx'),
+            models.Index(fields=['-score', '-id'], name='post_top_idx'),
+            models.Index(fields=['-controversy_rank', '-id'], name='post_controversial_idx'),
+            models.Index(fields=['-rising_rank', '-id'], name='post_rising_idx'),
+            # group feeds and home feeds read per source, which never show drafts
+            models.Index(
+                fields=['group', '-created_at', '-id'], name='post_group_new_idx',
+                condition=~models.Q(status='DRAFT')),
+            models.Index(
+                fields=['group', '-hot_rank', '-id'], name='post_group_hot_idx',
+                condition=~models.Q(status='DRAFT')),
+            models.Index(
+                fields=['author', '-created_at', '-id'], name='post_author_new_idx',
+                condition=~models.Q(status='DRAFT')),
+        ]
 
     def __str__(self):
         return f"Post: {self.uuid} published by {self.author.username}"
 
-    def _get_score(self):
-        score = 0
-        votes = PostVote.objects.filter(post=self)
-        if votes.exists():
-    	    score = votes.aggregate(Sum('vote'))['vote__sum'] or 0
-        return score
-    score = property(_get_score)
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            self.set_ranks()
+        super(Post, self).save(*args, **kwargs)
+
+    def set_ranks(self, now=None):
+        created_at = self.created_at or timezone.now()
+        for field, value in ranks(
+                self.score, self.upvotes, self.downvotes,
+                created_at, now).items():
+            setattr(self, field, value)
 
 
 class PostVote(TimeStampedModel):
@@ -77,6 +108,12 @@ class PostVote(TimeStampedModel):
         ordering = ['created_at',]
         verbose_name = "Post Vote"
         verbose_name_plural = "Post Votes"
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'], name='unique_post_vote'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='postvote_user_idx'),
+        ]
 
     def __str__(self):
         return f"{self.vote}  point by  {self.user.username}"
@@ -0,0 +1,59 @@
+from datetime import datetime, timedelta
+from math import log10
+
+from django.utils import timezone
+
+
+EPOCH = datetime(2005, 12, 8, 7, 46, 43, tzinfo=timezone.utc)
+HOT_GRAVITY = 45000
+RISING_WINDOW = timedelta(hours=24)
+
+
+def hot(score, created_at):
+    """
+    Reddit's hot rank. Every 12.5 hours of age is worth a factor of 10 in
+    score, so the rank never needs to be decayed after it is stored.
+    """
+    order = log10(max(abs(score), 1))
+    sign = 1 if score > 0 else -1 if score < 0 else 0
+    seconds = (created_at - EPOCH).total_seconds()
+    return round(sign * order + seconds / HOT_GRAVITY, 7)
+
+
+def controversy(upvotes, downvotes):
+    """
+    Many votes split evenly between up and down rank highest.
+    """
+    if upvotes <= 0 or downvotes <= 0:
+        return 0.0
+    magnitude = upvotes + downvotes
+    if upvotes > downvotes:
+        balance = downvotes / upvotes
+    else:
+        balance = upvotes / downvotes
+    return round(magnitude ** balance, 7)
+
+
+def rising(score, created_at, now=None):
+    """
+    Score per unit of age for posts younger than RISING_WINDOW, 0 after.
+    Depends on the current time, so stored values are decayed periodically
+    by the refresh_post_ranks command.
+    """
+    now = now or timezone.now()
+    age = now - created_at
+    if age > RISING_WINDOW or score <= 0:
+        return 0.0
+    hours = max(age.total_seconds(), 0) / 3600
+    return round(score / (hours + 2) ** 1.5, 7)
+
+
+def ranks(score, upvotes, downvotes, created_at, now=None):
+    """
+    Returns the stored rank columns for a post with the given counters.
+    """
+    return {
+        'hot_rank': hot(score, created_at),
+        'controversy_rank': controversy(upvotes, downvotes),
+        'rising_rank': rising(score, created_at, now),
+    }
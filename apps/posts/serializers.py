@@ -1,5 +1,7 @@
+from django.db import models
 from rest_framework import serializers
 from posts.models import Post, PostVote
+from posts.services import build_post_lookup
 from profiles.serializers import UserSerializer
 from tags.serializers import TagSerializer
 from comments.models import PostComment
@@ -16,9 +18,23 @@ class PostVoteSerializer(serializers.ModelSerializer):
         fields = ('id', 'vote')
 
 
+class PostListSerializer(serializers.ListSerializer):
+    """
+    Loads comment counts and the viewer's votes and bookmarks for the whole
+    page up front, so PostSerializer reads them from a lookup keyed by post
+    id instead of querying once per row.
+    """
+    def to_representation(self, data):
+        posts = list(data.all() if isinstance(data, models.Manager) else data)
+        request = self.context.get('request', None)
+        user = request.user if request is not None else None
+        self.context['post_lookup'] = build_post_lookup(posts, user)
+        return super(PostListSerializer, self).to_representation(posts)
+
+
 class PostSerializer(serializers.ModelSerializer):
     author = UserSerializer()
-    votes = serializers.ReadOnlyField(source='_get_score')
+    votes = serializers.ReadOnlyField(source='score')
     user_vote = serializers.SerializerMethodField()
     user_bookmark = serializers.SerializerMethodField()
     comments = serializers.SerializerMethodField()
@@ -32,11 +48,26 @@ class PostSerializer(serializers.ModelSerializer):
             'comments', 'created_at', 'updated_at', 'tags',
             'user_vote', 'user_bookmark', 'group', 'status',
         )
+        list_serializer_class = PostListSerializer
+
+    def _get_lookup(self, obj):
+        lookup = self.context.get('post_lookup', None)
+        if lookup is not None:
+            return lookup.get(obj.pk, None)
+        return None
 
     def get_comments(self, obj):
+        lookup = self._get_lookup(obj)
+        if lookup is not None:
+            return lookup['comments']
         return PostComment.objects.filter(post=obj, is_removed=False).count()
 
     def get_user_vote(self, obj):
+        lookup = self._get_lookup(obj)
+        if lookup is not None:
+            if lookup['user_vote'] is not None:
+                return PostVoteSerializer(lookup['user_vote']).data
+            return None
         request = self.context.get('request', None)
         if request is not None and request.user.is_authenticated:
             votes = PostVote.objects.filter(post=obj, user=request.user)\
@@ -46,6 +77,11 @@ class PostSerializer(serializers.ModelSerializer):
         return None
 
     def get_user_bookmark(self, obj):
+        lookup = self._get_lookup(obj)
+        if lookup is not None:
+            if lookup['user_bookmark'] is not None:
+                return PostBookmarkLightSerializer(lookup['user_bookmark']).data
+            return None
         request = self.context.get('request', None)
         if request is not None and request.user.is_authenticated:
             bookmarks = PostBookmark.objects.filter(post=obj, user=request.user)\
@@ -58,7 +94,7 @@ class PostSerializer(serializers.ModelSerializer):
 class PostReadOnlySerializer(ModelReadOnlySerializer):
     author = UserSerializer()
     group = GroupReadOnlyLightSerializer(required=False)
-    votes = serializers.ReadOnlyField(source='_get_score')
+    votes = serializers.ReadOnlyField(source='score')
 
     class Meta:
         model = Post
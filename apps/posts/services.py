@@ -0,0 +1,175 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models import Sum, Count, Q, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from posts.models import Post, PostVote
+from comments.models import PostComment
+from bookmarks.models import PostBookmark
+from core import votes
+from core.cache import bump_all, bump_object, bump_version
+from core.db.concurrency import run_concurrently
+from core.services import VOTE_COUNTERS, upsert_vote
+from groups.models import Group
+from groups.roles import get_member_group_ids
+
+
+def visible_posts(queryset, user, request=None, group_field='group'):
+    """
+    Excludes posts of PRIVATE groups ``user`` is not a member of. The
+    memberships come from one cached lookup, see groups.roles.
+    ``group_field`` leads to the group of the post, e.g. ``post__group``
+    to filter comments.
+    """
+    hidden = Q(**{f'{group_field}__group_type': Group.Type.PRIVATE})
+    group_ids = get_member_group_ids(user, request=request)
+    if group_ids:
+        hidden &= ~Q(**{f'{group_field}_id__in': group_ids})
+    return queryset.exclude(hidden)
+
+
+def cast_vote(post, user, value):
+    """
+    Stores ``value`` as the vote of ``user`` on ``post`` and updates the
+    counters of the post in the same round trip, see
+    core.services.upsert_vote. The new counters are mirrored on ``post``
+    and its ranks are rewritten when the vote changed, see
+    rewrite_ranks. Returns the vote.
+
+    With buffered vote ingestion the vote is only queued and ``post.score``
+    is set to the estimated score, see core.votes.
+    """
+    if votes.is_buffered():
+        post.score = votes.buffer_vote('post', post, user, value)
+        return value
+    old_vote, new_vote, values = upsert_vote(
+        PostVote, post, user, value, counters=VOTE_COUNTERS)
+    for name, stored in values.items():
+        setattr(post, name, stored)
+    if old_vote != new_vote:
+        rewrite_ranks(post)
+        bump_object('posts', post.uuid)
+    return new_vote
+
+
+def rewrite_ranks(post):
+    """
+    Recomputes the rank columns of ``post`` from the counters stored in
+    its row, locked for the duration, rather than from the ones a vote
+    returned: concurrent votes commit in any order, and ranks derived
+    from an older score could otherwise overwrite newer ones.
+    """
+    with transaction.atomic():
+        stored = Post.objects.select_for_update()\
+            .values(*VOTE_COUNTERS)\
+            .get(pk=post.pk)
+        for name, value in stored.items():
+            setattr(post, name, value)
+        post.set_ranks()
+        Post.objects.filter(pk=post.pk).update(
+            hot_rank=post.hot_rank,
+            controversy_rank=post.controversy_rank,
+            rising_rank=post.rising_rank,
+        )
+    return post
+
+
+def votes_flushed(queryset):
+    """
+    Called by core.votes after buffered votes changed the counters of the
+    posts in ``queryset``.
+    """
+    refresh_ranks(queryset)
+    bump_all('posts')
+
+
+def refresh_ranks(queryset, now=None, batch_size=1000):
+    """
+    Recomputes the rank columns of every post in ``queryset`` from its
+    stored counters. Returns the number of posts updated.
+    """
+    fields = ['hot_rank', 'controversy_rank', 'rising_rank']
+    now = now or timezone.now()
+    queryset = queryset.only(
+        'id', 'created_at', 'score', 'upvotes', 'downvotes', *fields)
+    updated = 0
+    last_id = 0
+    while True:
+        batch = list(queryset.filter(id__gt=last_id).order_by('id')[:batch_size])
+        if not batch:
+            break
+        for post in batch:
+            post.set_ranks(now)
+        Post.objects.bulk_update(batch, fields)
+        updated += len(batch)
+        last_id = batch[-1].pk
+    if updated:
+        bump_version('posts')
+    return updated
+
+
+def rebuild_vote_counters(queryset=None):
+    """
+    Recomputes score, upvotes and downvotes from PostVote in one UPDATE
+    statement. Returns the number of posts updated.
+    """
+    if queryset is None:
+        queryset = Post.objects.all()
+
+    def _aggregate(expression):
+        votes = PostVote.objects.filter(post=OuterRef('pk'))\
+            .order_by()\
+            .values('post')\
+            .annotate(total=expression)\
+            .values('total')
+        return Coalesce(Subquery(votes), Value(0))
+
+    updated = queryset.update(
+        score=_aggregate(Sum('vote')),
+        upvotes=_aggregate(Count('id', filter=Q(vote=1))),
+        downvotes=_aggregate(Count('id', filter=Q(vote=-1))),
+    )
+    bump_all('posts')
+    return updated
+
+
+def build_post_lookup(posts, user=None):
+    """
+    Collects everything PostSerializer needs beyond the post row for a page
+    of ``posts``: the comment count, plus the vote and bookmark of ``user``
+    when authenticated. Costs one grouped query and at most two IN queries
+    regardless of page size, run concurrently, see core.db.concurrency.
+    Returns a dict keyed by post id.
+    """
+    ids = [post.pk for post in posts]
+    lookup = {
+        pk: {'comments': 0, 'user_vote': None, 'user_bookmark': None}
+        for pk in ids
+    }
+    if not ids:
+        return lookup
+
+    querysets = [
+        PostComment.objects
+            .filter(post_id__in=ids, is_removed=False)
+            .order_by()
+            .values('post_id')
+            .annotate(total=Count('id'))
+    ]
+    if user is not None and user.is_authenticated:
+        querysets += [
+            PostVote.objects.filter(post_id__in=ids, user=user).order_by('updated_at'),
+            PostBookmark.objects.filter(post_id__in=ids, user=user).order_by('updated_at'),
+        ]
+    comments, *viewer = run_concurrently(*(partial(list, queryset) for queryset in querysets))
+
+    for row in comments:
+        lookup[row['post_id']]['comments'] = row['total']
+    if viewer:
+        votes, bookmarks = viewer
+        for vote in votes:
+            lookup[vote.post_id]['user_vote'] = vote
+        for bookmark in bookmarks:
+            lookup[bookmark.post_id]['user_bookmark'] = bookmark
+    return lookup
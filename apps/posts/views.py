@@ -1,5 +1,7 @@
 from posts.models import Post, PostVote
 from core.views import BaseViewSet, BaseReadOnlyViewSet
+from core.pagination import ConcurrentPaginator, KeysetPagination
+from core.cache import cached_response
 from posts.serializers import PostSerializer, PostEditSerializer
 from rest_framework import viewsets, generics, status, filters
 from rest_framework.response import Response
@@ -9,46 +11,67 @@ from rest_framework.permissions import IsAuthenticated
 from comments.serializers import PostCommentCreateSerializer, PostCommentSerializer
 from django.contrib.auth.models import User
 from posts.filters import PostFilterSet
+from tags.models import Tag
+from django.db.models import Prefetch
+from posts.services import build_post_lookup, cast_vote, visible_posts
+from core.services import VOTE_VALUES
 
 
 class PostPagination(PageNumberPagination):
     page_size = 12
+    django_paginator_class = ConcurrentPaginator
+
+
+class PostCursorPagination(KeysetPagination):
+    page_size = 12
 
 
 class PostViewSet(BaseReadOnlyViewSet):
-    queryset = Post.objects.all().exclude(status=Post.STATUS.DRAFT)
+    queryset = Post.objects.all()\
+        .select_related('author', 'group')\
+        .prefetch_related(
+            Prefetch('tags', queryset=Tag.objects.select_related('tag_type')))\
+        .exclude(status=Post.STATUS.DRAFT)
     serializer_class = PostSerializer
     pagination_class = PostPagination
+    cursor_pagination_class = PostCursorPagination
     lookup_field = 'uuid'
     filterset_class = PostFilterSet
+    cache_namespace = 'posts'
+    cache_depends = ('tags',)
+    async_actions = ('list', 'retrieve')
+
+    def get_queryset(self):
+        return visible_posts(self.queryset, self.request.user, request=self.request)
 
     def get_serializer_context(self):
         context = super(PostViewSet, self).get_serializer_context()
         context.update({'source': 'Post'})
         return context
 
+    @cached_response()
     def list(self, request):
         queryset = self.filter_queryset(self.get_queryset())
         return self.paginated_response(queryset, context={'request': request})
 
+    @cached_response()
     def retrieve(self, request, uuid=None):
         post = self.get_object()
+        not_modified = self.not_modified(obj=post)
+        if not_modified is not None:
+            return not_modified
+        context = {
+            'request': request,
+            'post_lookup': build_post_lookup([post], request.user),
+        }
         serializer_class = self.get_serializer_class()
-        serializer = serializer_class(post, context={'request': request})
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        serializer = serializer_class(post, context=context)
+        return self.set_validators(Response(serializer.data, status=status.HTTP_200_OK))
 
     def _common_vote_method(self, request, method):
         post = self.get_object()
-        user = request.user
-        vote, created = PostVote.objects.get_or_create(post=post, user=user)
-        if method == "upvote":
-            vote.vote = 1
-        elif method == "downvote":
-            vote.vote = -1
-        else:
-            vote.vote = 0
-        vote.save()
-        return Response({"vote": vote.vote, "votes": post.score}, status=status.HTTP_200_OK)
+        vote = cast_vote(post, request.user, VOTE_VALUES[method])
+        return Response({"vote": vote, "votes": post.score}, status=status.HTTP_200_OK)
 
     @action(detail=True, methods=['put'])
     def upvote(self, request, uuid=None):
@@ -64,11 +87,18 @@ class PostViewSet(BaseReadOnlyViewSet):
 
 
 class PostSelfViewSet(BaseViewSet):
-    queryset = Post.objects.all().order_by('-created_at')
+    queryset = Post.objects.all()\
+        .select_related('author', 'group')\
+        .prefetch_related(
+            Prefetch('tags', queryset=Tag.objects.select_related('tag_type')))\
+        .order_by('-created_at')
     lookup_field = 'uuid'
     serializer_class = PostEditSerializer
     pagination_class = PostPagination
+    cursor_pagination_class = PostCursorPagination
     permission_classes = [IsAuthenticated, ]
+    # authors edit from several devices, their drafts are read from the primary
+    replica_actions = ()
     serializer_action_classes = {
         'list' : PostSerializer,
         'create' : PostEditSerializer,
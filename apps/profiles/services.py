@@ -0,0 +1,110 @@
+"""
+Profile activity.
+
+The overview of a user merges their posts, comments and votes newest
+first. Each kind is read with its own query on a (user, created_at, id)
+index, limited to one page, and the sorted streams are k-way merged, so
+a page costs one short query per kind however long the history is.
+"""
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import namedtuple
+from heapq import merge
+from itertools import islice
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+from comments.models import PostComment, PostCommentVote
+from posts.models import Post, PostVote
+from posts.services import visible_posts
+
+
+Activity = namedtuple('Activity', ['created_at', 'rank', 'id', 'kind', 'instance'])
+
+# the largest id any database backend accepts as a query parameter
+MAX_ID = 2 ** 63 - 1
+
+
+def activity_querysets(user, viewer=None, request=None):
+    """
+    Returns the queryset of each activity kind of ``user``, with the
+    relations their serializers need, leaving out what happened in
+    PRIVATE groups ``viewer`` is not a member of, see
+    posts.services.visible_posts. The position of a kind is its rank,
+    which breaks ties between kinds created at the same instant.
+    """
+    return {
+        'post': visible_posts(Post.objects
+            .filter(author=user)
+            .exclude(status=Post.STATUS.DRAFT)
+            .select_related('author', 'group'),
+            viewer, request=request),
+        'comment': visible_posts(
+            PostComment.objects.filter(user=user),
+            viewer, request=request, group_field='post__group'),
+        'post_vote': visible_posts(PostVote.objects
+            .filter(user=user)
+            .exclude(vote=0)
+            .select_related('post__author', 'post__group'),
+            viewer, request=request, group_field='post__group'),
+        'comment_vote': visible_posts(PostCommentVote.objects
+            .filter(user=user)
+            .exclude(vote=0)
+            .select_related('post_comment'),
+            viewer, request=request, group_field='post_comment__post__group'),
+    }
+
+
+def _after(position, rank):
+    """
+    Rows of the stream of ``rank`` that come after ``position`` in the
+    order (created_at, rank, id) descending.
+    """
+    created_at, position_rank, position_id = position
+    if rank < position_rank:
+        return Q(created_at__lte=created_at)
+    if rank > position_rank:
+        return Q(created_at__lt=created_at)
+    return Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=position_id)
+
+
+def _stream(kind, rank, queryset):
+    for instance in queryset:
+        yield Activity(instance.created_at, rank, instance.pk, kind, instance)
+
+
+def get_overview(user, limit, after=None, viewer=None, request=None):
+    """
+    Returns the next ``limit`` Activity items of ``user`` visible to
+    ``viewer`` after the position ``after``, newest first.
+    """
+    streams = []
+    querysets = activity_querysets(user, viewer=viewer, request=request)
+    for rank, (kind, queryset) in enumerate(querysets.items()):
+        if after is not None:
+            queryset = queryset.filter(_after(after, rank))
+        streams.append(_stream(kind, rank, queryset.order_by('-created_at', '-id')[:limit]))
+    newest_first = merge(*streams, key=lambda item: item[:3], reverse=True)
+    return list(islice(newest_first, limit))
+
+
+def encode_cursor(item):
+    payload = json.dumps([item.created_at.isoformat(), item.rank, item.id], separators=(',', ':'))
+    return urlsafe_b64encode(payload.encode('ascii')).decode('ascii')
+
+
+def decode_cursor(token):
+    """
+    Returns the (created_at, rank, id) position of a cursor, raising
+    ValueError for malformed ones.
+    """
+    try:
+        created_at, rank, pk = json.loads(urlsafe_b64decode(token.encode('ascii')).decode('ascii'))
+        created_at = parse_datetime(created_at)
+    except (TypeError, ValueError, UnicodeError):
+        raise ValueError('Invalid cursor')
+    if created_at is None or not isinstance(rank, int) or not isinstance(pk, int) \
+            or not 0 <= pk <= MAX_ID:
+        raise ValueError('Invalid cursor')
+    return created_at, rank, pk
@@ -6,23 +6,53 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from rest_framework.utils.urls import replace_query_param
 from rest_framework import status, filters
+from collections import OrderedDict
+from core.pagination import KeysetPagination
+from comments.models import PostComment, PostCommentVote
 from comments.serializers import PostCommentLightSerializer, PostCommentVoteSerializer
+from groups.models import GroupInvite, MemberRequest
 from groups.serializers import GroupInviteReadOnlySerializer, GroupSerializer, MemberRequestSerializer
-from posts.serializers import PostVoteHeavySerializer
+from posts.models import PostVote
+from posts.serializers import PostReadOnlySerializer, PostVoteHeavySerializer
 from bookmarks.serializers import PostBookmarkReadOnlySerializer
 from bookmarks.models import PostBookmark
+from posts.services import visible_posts
+from profiles.services import decode_cursor, encode_cursor, get_overview
+
+
+class ProfileActivityCursorPagination(KeysetPagination):
+    page_size = 24
+
+
+class PostVoteCursorPagination(ProfileActivityCursorPagination):
+    cursor_query_param = 'posts_cursor'
+
+
+class CommentVoteCursorPagination(ProfileActivityCursorPagination):
+    cursor_query_param = 'comments_cursor'
+
+
+ACTIVITY_SERIALIZERS = {
+    'post': PostReadOnlySerializer,
+    'comment': PostCommentLightSerializer,
+    'post_vote': PostVoteHeavySerializer,
+    'comment_vote': PostCommentVoteSerializer,
+}
 
 
 class ProfileViewSet(BaseViewSet):
     queryset = User.objects.all()
     lookup_field = 'username'
     serializer_class = UserSerializer
+    replica_actions = ('list', 'retrieve', 'user_comments', 'user_upvotes', 'user_downvotes', 'overview')
     serializer_action_classes = {
         'user_comments': PostCommentLightSerializer,
         'requested_groups': MemberRequestSerializer,
         'invitations': GroupInviteReadOnlySerializer,
         'invites': GroupInviteReadOnlySerializer,
+        'user_invites': GroupInviteReadOnlySerializer,
         'user_upvotes': PostVoteHeavySerializer,
         'bookmarks': PostBookmarkReadOnlySerializer
     }
@@ -30,6 +60,7 @@ class ProfileViewSet(BaseViewSet):
         'requested_groups': [IsAuthenticated,],
         'invitations': [IsAuthenticated,],
         'invites': [IsAuthenticated,],
+        'user_invites': [IsAuthenticated,],
         'bookmarks': [IsAuthenticated],
     }
     search_fields = ['first_name', 'last_name', 'username']
@@ -126,57 +157,59 @@ class ProfileViewSet(BaseViewSet):
     @action(detail=True)
     def user_comments(self, request, username=None):
         user = self.get_object()
-        if hasattr(user, 'postcomment_comments'):
-            queryset = user.postcomment_comments.all().order_by('-created_at')
-            serializer_class = self.get_serializer_class()
-            serializer = serializer_class(queryset, many=True)
-            return Response(serializer.data, status=status.HTTP_200_OK)
-        return Response({}, status=status.HTTP_404_NOT_FOUND)
+        queryset = visible_posts(
+            PostComment.objects.filter(user=user).order_by('-created_at'),
+            request.user, request=request, group_field='post__group')
+        return self.paginated_response(
+            queryset, paginator=ProfileActivityCursorPagination())
 
     @action(detail=True)
     def requested_groups(self, request, username=None):
         user = self.get_object()
-        if user.is_authenticated and hasattr(user, 'requested_groups'):
-            queryset = user.requested_groups.all().order_by('-created_at')
-            serializer_class = self.get_serializer_class()
-            serializer = serializer_class(queryset, many=True)
-            return Response(serializer.data, status=status.HTTP_200_OK)
-        return Response({}, status=status.HTTP_404_NOT_FOUND)
+        queryset = MemberRequest.objects.filter(user=user).order_by('-created_at')
+        return self.paginated_response(
+            queryset, paginator=ProfileActivityCursorPagination())
 
     @action(detail=True)
     def invitations(self, request, username=None):
         """ Group invites sent by user """
         user = self.get_object()
-        if user.is_authenticated and hasattr(user, 'invitations'):
-            queryset = user.invitations.all().order_by('-created_at')
-            serializer_class = self.get_serializer_class()
-            serializer = serializer_class(queryset, many=True)
-            return Response(serializer.data, status=status.HTTP_200_OK)
-        return Response({}, status=status.HTTP_404_NOT_FOUND)
+        queryset = GroupInvite.objects.filter(created_by=user).order_by('-created_at')
+        return self.paginated_response(
+            queryset, paginator=ProfileActivityCursorPagination())
 
     @action(detail=True)
     def user_invites(self, request, username=None):
         """ Group invites sent to user """
         user = self.get_object()
-        if user.is_authenticated and hasattr(user, 'invites'):
-            queryset = user.invites.all().order_by('-created_at')
-            serializer_class = self.get_serializer_class()
-            serializer = serializer_class(queryset, many=True)
-            return Response(serializer.data, status=status.HTTP_200_OK)
-        return Response({}, status=status.HTTP_404_NOT_FOUND)
+        queryset = GroupInvite.objects.filter(user=user).order_by('-created_at')
+        return self.paginated_response(
+            queryset, paginator=ProfileActivityCursorPagination())
 
     def _common_vote_method(self, request, user_vote):
+        """
+        Posts and comments are paginated separately, with the
+        ``posts_cursor`` and ``comments_cursor`` parameters.
+        """
         user = self.get_object()
-        post_queryset = user.post_votes.all().order_by('-created_at')\
-            .filter(vote=user_vote)
-        comment_queryset = user.postcommentvote_votes.all()\
-            .order_by('-created_at').filter(vote=user_vote)
-        post_serializer = PostVoteHeavySerializer(post_queryset, many=True)
-        comment_serializer = PostCommentVoteSerializer(comment_queryset, many=True)
-        return Response({
-            "posts": post_serializer.data,
-            "comments": comment_serializer.data
-        }, status=status.HTTP_200_OK)
+        post_queryset = visible_posts(PostVote.objects
+            .filter(user=user, vote=user_vote)
+            .select_related('post__author', 'post__group')
+            .order_by('-created_at'),
+            request.user, request=request, group_field='post__group')
+        comment_queryset = visible_posts(PostCommentVote.objects
+            .filter(user=user, vote=user_vote)
+            .select_related('post_comment')
+            .order_by('-created_at'),
+            request.user, request=request, group_field='post_comment__post__group')
+        pages = OrderedDict()
+        for name, queryset, paginator, serializer_class in (
+                ('posts', post_queryset, PostVoteCursorPagination(), PostVoteHeavySerializer),
+                ('comments', comment_queryset, CommentVoteCursorPagination(), PostCommentVoteSerializer)):
+            page = paginator.paginate_queryset(queryset, request=request, view=self)
+            serializer = serializer_class(page, many=True)
+            pages[name] = paginator.get_paginated_response(serializer.data).data
+        return Response(pages, status=status.HTTP_200_OK)
 
     @action(detail=True)
     def user_upvotes(self, request, username=None):
@@ -192,12 +225,43 @@ class ProfileViewSet(BaseViewSet):
     def bookmarks(self, request, username=None):
         """ Returns user bookmarks """
         user = self.get_object()
-        if user.is_authenticated:
-            queryset = PostBookmark.objects.filter(user__username=user.username).order_by('-created_at')
-            serializer_class = self.get_serializer_class()
-            serializer = serializer_class(queryset, many=True)
-            return Response(serializer.data, status=status.HTTP_200_OK)
-        return Response({}, status=status.HTTP_404_NOT_FOUND)
+        queryset = visible_posts(PostBookmark.objects
+            .filter(user=user)
+            .select_related('post__author', 'post__group')
+            .order_by('-created_at'),
+            request.user, request=request, group_field='post__group')
+        return self.paginated_response(
+            queryset, paginator=ProfileActivityCursorPagination())
+
+    @action(detail=True)
+    def overview(self, request, username=None):
+        """ Returns user posts, comments and votes, newest first """
+        user = self.get_object()
+        after = None
+        token = request.query_params.get('cursor')
+        if token:
+            try:
+                after = decode_cursor(token)
+            except ValueError:
+                return Response({'error': 'Invalid cursor'}, status=status.HTTP_400_BAD_REQUEST)
+        page_size = ProfileActivityCursorPagination.page_size
+        items = get_overview(user, page_size, after=after, viewer=request.user, request=request)
+        results = [
+            OrderedDict([
+                ('type', item.kind),
+                ('created_at', item.created_at),
+                ('data', ACTIVITY_SERIALIZERS[item.kind](item.instance).data),
+            ])
+            for item in items
+        ]
+        next_link = None
+        if len(items) == page_size:
+            next_link = replace_query_param(
+                request.build_absolute_uri(), 'cursor', encode_cursor(items[-1]))
+        return Response(OrderedDict([
+            ('next', next_link),
+            ('results', results),
+        ]), status=status.HTTP_200_OK)
 
 
 class IsAuthenticatedView(APIView):
@@ -0,0 +1,113 @@
+# Generated by Django 3.1.14 on 2026-10-18 18:07
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+import django.db.models.deletion
+
+
+OPEN_STATUSES = ('INITIATED', 'VERIFIED')
+
+
+def populate_rollups(apps, schema_editor):
+    ReportTarget = apps.get_model('reports', 'ReportTarget')
+    ReportCount = apps.get_model('reports', 'ReportCount')
+    for kind, model_name, field in (('post', 'PostReport', 'post_id'),
+            ('user', 'UserProfileReport', 'reported_user_id')):
+        rows = apps.get_model('reports', model_name).objects\
+            .order_by()\
+            .values_list(field, 'report_type_id', 'status')\
+            .annotate(total=Count('id'), last=Max('created_at'))
+        targets = {}
+        counts = []
+        for target_id, report_type_id, status, total, last in rows:
+            target = targets.setdefault(target_id, ReportTarget(kind=kind, target_id=target_id))
+            if status in OPEN_STATUSES:
+                target.open_reports += total
+            if target.last_reported_at is None or last > target.last_reported_at:
+                target.last_reported_at = last
+            counts.append((target, report_type_id, status, total))
+        ReportTarget.objects.bulk_create(targets.values())
+        ids = dict(ReportTarget.objects.filter(kind=kind).values_list('target_id', 'id'))
+        ReportCount.objects.bulk_create(
+            ReportCount(target_id=ids[target.target_id], report_type_id=report_type_id,
+                status=status, count=total)
+            for target, report_type_id, status, total in counts)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0003_post_report_model'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportCount',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(max_length=10)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Report Count',
+                'verbose_name_plural': 'Report Counts',
+            },
+        ),
+        migrations.CreateModel(
+            name='ReportTarget',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('post', 'Post'), ('user', 'User')], max_length=8)),
+                ('target_id', models.PositiveIntegerField()),
+                ('open_reports', models.IntegerField(default=0)),
+                ('last_reported_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Report Target',
+                'verbose_name_plural': 'Report Targets',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='postreport',
+            index=models.Index(fields=['status', 'created_at'], name='postreport_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='postreport',
+            index=models.Index(fields=['post', 'status'], name='postreport_target_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userprofilereport',
+            index=models.Index(fields=['status', 'created_at'], name='userprofilereport_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userprofilereport',
+            index=models.Index(fields=['reported_user', 'status'], name='userprofilereport_target_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reporttarget',
+            index=models.Index(fields=['kind', '-open_reports', '-last_reported_at'], name='reporttarget_queue_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='reporttarget',
+            constraint=models.UniqueConstraint(fields=('kind', 'target_id'), name='reporttarget_unique'),
+        ),
+        migrations.AddField(
+            model_name='reportcount',
+            name='report_type',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='reports.reporttype'),
+        ),
+        migrations.AddField(
+            model_name='reportcount',
+            name='target',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='counts', to='reports.reporttarget'),
+        ),
+        migrations.AddConstraint(
+            model_name='reportcount',
+            constraint=models.UniqueConstraint(fields=('target', 'report_type', 'status'), name='reportcount_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='reportcount',
+            constraint=models.UniqueConstraint(condition=models.Q(report_type=None), fields=('target', 'status'), name='reportcount_untyped_unique'),
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,4 @@
 from .types import ReportType
 from .user import UserProfileReport
 from .post import PostReport
+from .rollup import ReportTarget, ReportCount
@@ -13,6 +13,10 @@ class PostReport(AbstractReport):
 
     class Meta:
         ordering = ['-created_at',]
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='postreport_status_idx'),
+            models.Index(fields=['post', 'status'], name='postreport_target_idx'),
+        ]
         verbose_name = 'Post Report'
         verbose_name_plural = 'Post Reports'
 
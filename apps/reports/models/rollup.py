@@ -0,0 +1,64 @@
+from django.db import models
+
+from reports.models.types import ReportType
+
+
+class ReportTarget(models.Model):
+    """
+    One reported post or user with its number of open (INITIATED or
+    VERIFIED) reports, ordering the moderation queue. Kept up to date by
+    reports.signals and reports.services.transition_reports.
+    """
+    class Kind(models.TextChoices):
+        POST = "post"
+        USER = "user"
+
+    kind = models.CharField(max_length=8, choices=Kind.choices)
+    target_id = models.PositiveIntegerField()
+    open_reports = models.IntegerField(default=0)
+    last_reported_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Report Target'
+        verbose_name_plural = 'Report Targets'
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'target_id'], name='reporttarget_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['kind', '-open_reports', '-last_reported_at'],
+                name='reporttarget_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.target_id}: {self.open_reports} open reports"
+
+
+class ReportCount(models.Model):
+    """
+    Number of reports of a target per report type and status.
+    """
+    target = models.ForeignKey(
+        ReportTarget,
+        on_delete=models.CASCADE,
+        related_name='counts'
+    )
+    report_type = models.ForeignKey(
+        ReportType, null=True,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    status = models.CharField(max_length=10)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Report Count'
+        verbose_name_plural = 'Report Counts'
+        constraints = [
+            models.UniqueConstraint(fields=['target', 'report_type', 'status'],
+                name='reportcount_unique'),
+            models.UniqueConstraint(fields=['target', 'status'],
+                condition=models.Q(report_type=None), name='reportcount_untyped_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.target}: {self.count} {self.status}"
@@ -13,6 +13,10 @@ class UserProfileReport(AbstractReport):
 
     class Meta:
         ordering = ['-created_at',]
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='userprofilereport_status_idx'),
+            models.Index(fields=['reported_user', 'status'], name='userprofilereport_target_idx'),
+        ]
         verbose_name = 'User Profile Report'
         verbose_name_plural = 'User Profile Reports'
 
@@ -1,7 +1,8 @@
 from rest_framework_nested import routers
 
-from reports.views import ReportTypeViewSet
+from reports.views import ModerationViewSet, ReportTypeViewSet
 
 router = routers.SimpleRouter()
 
 router.register('report_types', ReportTypeViewSet)
+router.register('moderation', ModerationViewSet, basename='moderation')
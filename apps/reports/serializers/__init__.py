@@ -1,3 +1,4 @@
 from .types import ReportTypeSerializer
 from .post import PostReportSerializer, PostReportLightSerializer
 from .user import UserProfileReportSerializer, UserProfileReportLightSerializer
+from .moderation import ReportTargetSerializer
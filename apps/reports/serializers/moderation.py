@@ -0,0 +1,38 @@
+from rest_framework import serializers
+from reports.models import ReportCount, ReportTarget
+
+
+class ReportCountSerializer(serializers.ModelSerializer):
+    report_type = serializers.ReadOnlyField(source='report_type.title', default=None)
+
+    class Meta:
+        model = ReportCount
+        fields = ('report_type', 'status', 'count')
+
+
+class ReportTargetSerializer(serializers.ModelSerializer):
+    """
+    Expects the reported posts or users in ``context['targets']``, keyed
+    by id, and their counts prefetched.
+    """
+    target = serializers.SerializerMethodField()
+    counts = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ReportTarget
+        fields = (
+            'kind', 'target_id', 'target', 'open_reports',
+            'last_reported_at', 'counts',
+        )
+
+    def get_target(self, obj):
+        target = self.context['targets'].get(obj.target_id)
+        if target is None:
+            return None
+        if obj.kind == ReportTarget.Kind.POST:
+            return {'uuid': target.uuid, 'title': target.title}
+        return {'username': target.username}
+
+    def get_counts(self, obj):
+        counts = [count for count in obj.counts.all() if count.count]
+        return ReportCountSerializer(counts, many=True).data
@@ -0,0 +1,196 @@
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Max
+from django.utils import timezone
+
+from core.models import OutboxMessage
+from core.outbox import enqueue_messages
+from reports.abstracts import AbstractReport
+from reports.models import PostReport, ReportCount, ReportTarget, UserProfileReport
+
+
+STATUS = AbstractReport.STATUS
+
+# reports still waiting for a moderator
+OPEN_STATUSES = (STATUS.INITIATED, STATUS.VERIFIED)
+
+# statuses moderators can move reports to, with the statuses they may come from
+TRANSITIONS = {
+    STATUS.VERIFIED: (STATUS.INITIATED,),
+    STATUS.REJECTED: (STATUS.INITIATED, STATUS.VERIFIED),
+    STATUS.RESOLVED: (STATUS.VERIFIED,),
+}
+
+# report model and target field of each kind of ReportTarget
+REPORT_MODELS = {
+    ReportTarget.Kind.POST: (PostReport, 'post'),
+    ReportTarget.Kind.USER: (UserProfileReport, 'reported_user'),
+}
+
+
+def report_target(report):
+    """
+    Returns the ReportTarget kind and target id of ``report``.
+    """
+    for kind, (model, field) in REPORT_MODELS.items():
+        if isinstance(report, model):
+            return kind, getattr(report, f'{field}_id')
+    raise TypeError(f'{type(report).__name__} is not a report')
+
+
+def _add_by_delta(queryset, field, deltas):
+    # one UPDATE per distinct delta rather than one per row
+    by_delta = defaultdict(list)
+    for pk, delta in deltas.items():
+        if delta:
+            by_delta[delta].append(pk)
+    for delta, pks in by_delta.items():
+        queryset.filter(pk__in=pks).update(**{field: F(field) + delta})
+
+
+def adjust_rollups(kind, deltas, reported_at=None):
+    """
+    Adds ``deltas``, a dict of report counts keyed by (target id, report
+    type id, status), to the ReportCount rows and the open_reports of the
+    targets of ``kind``, creating missing rows. The targets' last_reported_at
+    is set to ``reported_at`` when given.
+    """
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    target_ids = {target_id for target_id, _, _ in deltas}
+    ReportTarget.objects.bulk_create(
+        [ReportTarget(kind=kind, target_id=target_id) for target_id in target_ids],
+        ignore_conflicts=True)
+    targets = dict(ReportTarget.objects
+        .filter(kind=kind, target_id__in=target_ids)
+        .values_list('target_id', 'id'))
+
+    ReportCount.objects.bulk_create([
+        ReportCount(target_id=targets[target_id], report_type_id=report_type_id, status=status)
+        for target_id, report_type_id, status in deltas
+    ], ignore_conflicts=True)
+    counts = {
+        (target_id, report_type_id, status): pk
+        for pk, target_id, report_type_id, status in ReportCount.objects
+            .filter(target_id__in=targets.values())
+            .values_list('id', 'target__target_id', 'report_type_id', 'status')
+    }
+    _add_by_delta(ReportCount.objects, 'count', {
+        counts[key]: delta for key, delta in deltas.items()
+    })
+
+    open_deltas = Counter()
+    for (target_id, _, status), delta in deltas.items():
+        if status in OPEN_STATUSES:
+            open_deltas[targets[target_id]] += delta
+    _add_by_delta(ReportTarget.objects, 'open_reports', open_deltas)
+    if reported_at is not None:
+        ReportTarget.objects.filter(pk__in=targets.values())\
+            .update(last_reported_at=reported_at)
+
+
+def rebuild_rollups():
+    """
+    Recomputes every ReportTarget and ReportCount from the reports with one
+    grouped query per kind of report. Returns the number of targets.
+    """
+    with transaction.atomic():
+        ReportTarget.objects.all().delete()
+        for kind, (model, field) in REPORT_MODELS.items():
+            rows = model.objects\
+                .order_by()\
+                .values_list(f'{field}_id', 'report_type_id', 'status')\
+                .annotate(total=Count('id'), last=Max('created_at'))
+            targets = {}
+            counts = []
+            for target_id, report_type_id, status, total, last in rows:
+                target = targets.setdefault(target_id, ReportTarget(kind=kind, target_id=target_id))
+                if status in OPEN_STATUSES:
+                    target.open_reports += total
+                if target.last_reported_at is None or last > target.last_reported_at:
+                    target.last_reported_at = last
+                counts.append((target_id, report_type_id, status, total))
+            ReportTarget.objects.bulk_create(targets.values(), batch_size=1000)
+            ids = dict(ReportTarget.objects.filter(kind=kind).values_list('target_id', 'id'))
+            ReportCount.objects.bulk_create([
+                ReportCount(target_id=ids[target_id], report_type_id=report_type_id,
+                    status=status, count=total)
+                for target_id, report_type_id, status, total in counts
+            ], batch_size=1000)
+        return ReportTarget.objects.count()
+
+
+def report_mail(report):
+    """
+    Returns the unsaved OutboxMessage about the current status of
+    ``report``, or None: new reports are mailed to HOME_EMAIL, verified
+    and rejected ones to the reporter.
+    """
+    if isinstance(report, PostReport):
+        subject = "Post Report Initiated"
+        object_link = "https://localhost:8000/" + str(report.post.uuid) + "/"
+        title = report.post.title
+    else:
+        subject = "User Profile Report Initiated"
+        object_link = "http://localhost:8000/" + str(report.reported_user.username) + "/"
+        title = report.reported_user.username
+    reporter = report.reporter
+    context = {
+        "reporter_name" : reporter.first_name + " " + reporter.last_name,
+        "reporter_username": reporter.username,
+        "object_link" : object_link,
+        "title": title,
+        "url" : report.url,
+        "status": report.status,
+    }
+    if report.status == STATUS.INITIATED:
+        template_name = "report_initiated_mail.html"
+        recipient = settings.HOME_EMAIL
+    elif report.status in (STATUS.VERIFIED, STATUS.REJECTED) and reporter.email:
+        subject = "Report Progress"
+        template_name = "report_progress_mail.html"
+        recipient = reporter.email
+    else:
+        return None
+    return OutboxMessage(
+        key=f"{report._meta.model_name}:{report.pk}:{report.status}",
+        subject=subject, template_name=template_name,
+        recipients=[recipient], context=context)
+
+
+def transition_reports(kind, status, report_ids=None, target_ids=None):
+    """
+    Moves the reports of ``kind`` in ``report_ids``, or all the reports of
+    the targets in ``target_ids``, to ``status`` with a single UPDATE.
+    Reports whose status cannot move to ``status``, see TRANSITIONS, are
+    left alone. The rollups and the reporters' mail follow in the same
+    transaction. Returns the number of reports moved.
+    """
+    model, field = REPORT_MODELS[kind]
+    queryset = model.objects.filter(status__in=TRANSITIONS[status])
+    if report_ids is not None:
+        queryset = queryset.filter(pk__in=report_ids)
+    if target_ids is not None:
+        queryset = queryset.filter(**{f'{field}_id__in': target_ids})
+
+    with transaction.atomic():
+        rows = list(queryset.select_for_update()
+            .values_list('id', f'{field}_id', 'report_type_id', 'status'))
+        if not rows:
+            return 0
+        ids = [row[0] for row in rows]
+        moved = model.objects.filter(pk__in=ids)\
+            .update(status=status, updated_at=timezone.now())
+
+        deltas = Counter()
+        for _, target_id, report_type_id, old_status in rows:
+            deltas[(target_id, report_type_id, old_status)] -= 1
+            deltas[(target_id, report_type_id, status)] += 1
+        adjust_rollups(kind, deltas)
+
+        reports = model.objects.filter(pk__in=ids).select_related('reporter', field)
+        enqueue_messages(filter(None, (report_mail(report) for report in reports)))
+    return moved
@@ -1,65 +1,46 @@
-from django.conf import settings
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
-from core.services import mail
+from core.outbox import enqueue_messages
 from reports.models import PostReport, UserProfileReport
+from reports.services import adjust_rollups, report_mail, report_target
+
+
+@receiver(pre_save, sender=PostReport)
+@receiver(pre_save, sender=UserProfileReport)
+def report_rollup_previous_hook(sender, instance, **kwargs):
+    # remember what the rollups counted the report as before this save
+    instance._rollup_previous = None
+    if instance.pk is not None:
+        instance._rollup_previous = sender.objects\
+            .filter(pk=instance.pk)\
+            .values_list('report_type_id', 'status')\
+            .first()
+
+
+@receiver(post_save, sender=PostReport)
+@receiver(post_save, sender=UserProfileReport)
+def report_rollup_hook(sender, instance, created, **kwargs):
+    kind, target_id = report_target(instance)
+    deltas = {(target_id, instance.report_type_id, instance.status): 1}
+    previous = getattr(instance, '_rollup_previous', None)
+    if previous is not None:
+        key = (target_id,) + previous
+        deltas[key] = deltas.get(key, 0) - 1
+    adjust_rollups(kind, deltas, reported_at=instance.created_at if created else None)
+
+
+@receiver(post_delete, sender=PostReport)
+@receiver(post_delete, sender=UserProfileReport)
+def report_deleted_rollup_hook(sender, instance, **kwargs):
+    kind, target_id = report_target(instance)
+    adjust_rollups(kind, {(target_id, instance.report_type_id, instance.status): -1})
 
 
 @receiver(post_save, sender=PostReport)
 def post_reported_mail_hook(sender, instance, created, **kwargs):
-    if instance.status == 'INITIATED':
-        try:
-            recipient = settings.HOME_EMAIL
-            reporter = instance.reporter
-            subject = "Post Report Initiated"
-            template_name = "report_initiated_mail.html"
-            context = {
-                "reporter_name" : reporter.first_name + " " + reporter.last_name,
-                "reporter_username": reporter.username,
-                "object_link" : "https://localhost:8000/" + str(instance.post.uuid) + "/",
-                "title": instance.post.title,
-                "url" : instance.url,
-            }
-            mail(subject, template_name, recipient, context)
-        except:
-            pass
-        else:
-            pass
-    if instance.status == 'VERIFIED' or instance.report == 'REJECTED':
-        try:
-            recipient = instance.reporter.email
-            subject = "Report Progress"
-        except:
-            pass
-        else:
-            pass
+    enqueue_messages(filter(None, [report_mail(instance)]))
 
 
 @receiver(post_save, sender=UserProfileReport)
 def user_profile_reported_mail_hook(sender, instance, created, **kwargs):
-    if instance.status == 'INITIATED':
-        try:
-            recipient = settings.HOME_EMAIL
-            reporter = instance.reporter
-            subject = "User Profile Report Initiated"
-            template_name = "report_initiated_mail.html"
-            context = {
-                "reporter_name" : reporter.first_name + " " + reporter.last_name,
-                "reporter_username": reporter.username,
-                "object_link" : "http://localhost:8000/" + str(instance.reported_user.username) + "/",
-                "title": instance.reported_user.username,
-                "url" : instance.url,
-            }
-            mail(subject, template_name, recipient, context)
-        except:
-            pass
-        else:
-            pass
-    if instance.status == 'VERIFIED' or instance.report == 'REJECTED':
-        try:
-            recipient = instance.reporter.email
-            subject = "Report Progress"
-        except:
-            pass
-        else:
-            pass
+    enqueue_messages(filter(None, [report_mail(instance)]))
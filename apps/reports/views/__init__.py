@@ -1,3 +1,4 @@
 from .types import ReportTypeViewSet
 from .post import PostReportViewSet
 from .user import UserProfileReportViewSet
+from .moderation import ModerationViewSet
@@ -0,0 +1,82 @@
+from django.contrib.auth.models import User
+from django.db.models import Prefetch
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+
+from posts.models import Post
+from reports.models import ReportCount, ReportTarget
+from reports.serializers import ReportTargetSerializer
+from reports.services import TRANSITIONS, transition_reports
+
+
+class ModerationPagination(PageNumberPagination):
+    page_size = 24
+
+
+class ModerationViewSet(viewsets.ViewSet):
+    """
+    Staff only. ``list`` is the moderation queue: the posts, or users with
+    ``kind=user``, with open reports, most open reports first, then most
+    recently reported. ``transition`` moves many reports at once.
+    """
+    permission_classes = [IsAdminUser]
+    target_models = {
+        ReportTarget.Kind.POST: Post,
+        ReportTarget.Kind.USER: User,
+    }
+
+    def _kind(self, kind):
+        if kind not in self.target_models:
+            return None, Response(
+                {'error': 'kind must be post or user'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return kind, None
+
+    def list(self, request):
+        kind, error = self._kind(request.query_params.get('kind', ReportTarget.Kind.POST))
+        if error is not None:
+            return error
+        queryset = ReportTarget.objects\
+            .filter(kind=kind, open_reports__gt=0)\
+            .order_by('-open_reports', '-last_reported_at')\
+            .prefetch_related(Prefetch(
+                'counts', queryset=ReportCount.objects.select_related('report_type')))
+        paginator = ModerationPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        targets = self.target_models[kind].objects.in_bulk([target.target_id for target in page])
+        serializer = ReportTargetSerializer(page, many=True, context={'targets': targets})
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['post'])
+    def transition(self, request):
+        """
+        Moves the reports of ``kind`` listed in ``reports``, or every report
+        of the targets listed in ``targets``, to ``status``. Reports that
+        cannot take that status are skipped.
+        """
+        data = request.data
+        kind, error = self._kind(data.get('kind', ReportTarget.Kind.POST))
+        if error is not None:
+            return error
+        new_status = data.get('status')
+        if new_status not in TRANSITIONS:
+            return Response(
+                {'error': 'status must be one of ' + ', '.join(TRANSITIONS)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        report_ids = data.get('reports')
+        target_ids = data.get('targets')
+        ids = [value for value in (report_ids, target_ids) if value is not None]
+        if len(ids) != 1 or not isinstance(ids[0], list) \
+                or not all(isinstance(pk, int) for pk in ids[0]):
+            return Response(
+                {'error': 'give either reports or targets as a list of ids'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        moved = transition_reports(
+            kind, new_status, report_ids=report_ids, target_ids=target_ids)
+        return Response({'status': new_status, 'moved': moved}, status=status.HTTP_200_OK)
@@ -1,3 +1,4 @@
+from django.db import transaction
 from rest_framework import status
 from rest_framework.decorators import action
 from rest_framework.pagination import PageNumberPagination
@@ -62,7 +63,9 @@ class PostReportViewSet(BaseViewSet):
         serializer_class = self.get_serializer_class()
         serializer = serializer_class(data=data)
         if (serializer.is_valid(raise_exception=False)):
-            serializer.save()
+            # the report mail is queued in the same transaction, see core.outbox
+            with transaction.atomic():
+                serializer.save()
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
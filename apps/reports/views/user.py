@@ -1,3 +1,4 @@
+from django.db import transaction
 from rest_framework import status
 from rest_framework.decorators import action
 from rest_framework.pagination import PageNumberPagination
@@ -45,7 +46,7 @@ class UserProfileReportViewSet(BaseViewSet):
         if user_username is not None:
             try:
                 data['reported_user'] = User.objects.get(username=user_username).pk
-            except UserProfile.DoesNotExist:
+            except User.DoesNotExist:
                 return Response(
                     {'error': 'Wrong Username'},
                     status=status.HTTP_404_NOT_FOUND
@@ -59,7 +60,9 @@ class UserProfileReportViewSet(BaseViewSet):
         serializer_class = self.get_serializer_class()
         serializer = serializer_class(data=data)
         if serializer.is_valid():
-            serializer.save()
+            # the report mail is queued in the same transaction, see core.outbox
+            with transaction.atomic():
+                serializer.save()
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -0,0 +1,252 @@
+"""
+Autocomplete of tag names, group names and usernames.
+
+Each kind is held in memory as a sorted array of (casefolded name, id)
+pairs, so the names starting with a prefix are a contiguous range found
+with two bisections. Suggestions are the most popular names of that
+range: tags by number of posts, groups by members count, users by number
+of followers. Ranges longer than SCAN_LIMIT, i.e. short prefixes of big
+tables, would take too long to rank on every keystroke, so their top
+names are memoized until a name under that prefix changes.
+
+An index is loaded from the database in a background thread, started in
+each worker by gunicorn's post_fork hook (see ``warm``) or else by the
+first lookup; lookups find no names until it is loaded. It is then kept
+up to date by search.signals, once the changes commit, in the process
+they are made in; changes made while a copy loads are applied again to
+the loaded copy. Other processes only see them once their copy is older
+than AUTOCOMPLETE_MAX_AGE seconds and is reloaded the same way; a reload
+that fails is retried once the copy is found too old again. Bulk changes,
+like queryset updates and cascading deletes, are picked up the same way.
+PRIVATE groups are never suggested.
+"""
+from bisect import bisect_left, insort
+from collections import namedtuple
+from heapq import nlargest
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connections
+from django.db.models import Count
+
+from followers.models import UserFollower
+from groups.models import Group
+from posts.models import Post
+from tags.models import Tag
+
+
+Suggestion = namedtuple('Suggestion', ['id', 'name', 'popularity'])
+
+# ranges up to this long are ranked on every lookup
+SCAN_LIMIT = 1000
+MAX_LIMIT = 20
+
+# sorts after every character, bounds the range of a prefix
+LAST_CHARACTER = '\U0010ffff'
+
+
+class PrefixIndex:
+    """
+    Names of one kind with their popularity, see the module docstring.
+    ``load`` returns (id, name, popularity) rows from the database.
+    """
+
+    def __init__(self, load):
+        self.load = load
+        self.lock = threading.RLock()
+        self.built_at = None
+        self.refreshing = False
+        self.loader = None
+        self.pending = []
+        self.keys = []
+        self.entries = {}
+        self.top = {}
+
+    def refresh(self):
+        """
+        Starts loading a fresh copy in a background thread, unless one is
+        loading already. Returns the thread, or None.
+        """
+        with self.lock:
+            if self.refreshing:
+                return None
+            self.refreshing = True
+            self.loader = threading.Thread(
+                target=self._load_in_background, name='autocomplete', daemon=True)
+        self.loader.start()
+        return self.loader
+
+    def _load_in_background(self):
+        try:
+            self._build()
+        finally:
+            # gives pooled connections back, see core.db
+            connections.close_all()
+
+    def _build(self):
+        try:
+            rows = list(self.load())
+            keys = sorted((name.casefold(), pk) for pk, name, _ in rows)
+            entries = {pk: Suggestion(pk, name, popularity) for pk, name, popularity in rows}
+            with self.lock:
+                self.keys, self.entries, self.top = keys, entries, {}
+                self.built_at = time.monotonic()
+                # the rows may predate these changes; popularity changes the
+                # rows already had are counted twice until the next reload
+                for change, args in self.pending:
+                    getattr(self, change)(*args)
+        finally:
+            with self.lock:
+                self.pending = []
+                self.refreshing = False
+
+    def _ensure_built(self):
+        if self.refreshing:
+            return
+        max_age = settings.AUTOCOMPLETE_MAX_AGE
+        if self.built_at is None or (max_age and time.monotonic() - self.built_at > max_age):
+            # keep serving the current copy, if any, while a fresh one loads
+            self.refresh()
+
+    def suggest(self, prefix, limit):
+        """
+        Returns the ``limit`` most popular Suggestions whose name starts
+        with ``prefix``, ignoring case.
+        """
+        self._ensure_built()
+        prefix = prefix.casefold()
+        with self.lock:
+            start = bisect_left(self.keys, (prefix,))
+            end = bisect_left(self.keys, (prefix + LAST_CHARACTER,), start)
+            if end - start <= SCAN_LIMIT:
+                ids = self._rank(start, end, limit)
+            else:
+                ids = self.top.get(prefix, None)
+                if ids is None:
+                    ids = self._rank(start, end, MAX_LIMIT)
+                    self.top[prefix] = ids
+            return [self.entries[pk] for pk in ids[:limit]]
+
+    def _rank(self, start, end, limit):
+        entries = self.entries
+        return nlargest(
+            limit, (pk for _, pk in self.keys[start:end]),
+            key=lambda pk: entries[pk].popularity)
+
+    def _forget_prefixes(self, key):
+        for length in range(len(key) + 1):
+            self.top.pop(key[:length], None)
+
+    def _change(self, change, *args):
+        # a copy loading now may miss the change, it is applied to it too
+        if self.refreshing:
+            self.pending.append((change, args))
+        if self.built_at is not None:
+            getattr(self, change)(*args)
+
+    def _remove(self, pk):
+        entry = self.entries.pop(pk, None)
+        if entry is None:
+            return None
+        key = (entry.name.casefold(), pk)
+        position = bisect_left(self.keys, key)
+        if position < len(self.keys) and self.keys[position] == key:
+            del self.keys[position]
+        self._forget_prefixes(key[0])
+        return entry
+
+    def _put(self, pk, name, popularity):
+        entry = self._remove(pk)
+        if entry is not None:
+            popularity = entry.popularity
+        self.entries[pk] = Suggestion(pk, name, popularity)
+        insort(self.keys, (name.casefold(), pk))
+        self._forget_prefixes(name.casefold())
+
+    def _adjust(self, pk, delta):
+        entry = self.entries.get(pk, None)
+        if entry is None:
+            return
+        self.entries[pk] = entry._replace(popularity=max(entry.popularity + delta, 0))
+        self._forget_prefixes(entry.name.casefold())
+
+    def put(self, pk, name, popularity=0):
+        """
+        Adds or renames the entry ``pk``. Existing entries keep their
+        popularity, new ones start at ``popularity``.
+        """
+        with self.lock:
+            self._change('_put', pk, name, popularity)
+
+    def remove(self, pk):
+        with self.lock:
+            self._change('_remove', pk)
+
+    def adjust(self, pk, delta):
+        """
+        Moves the popularity of the entry ``pk`` by ``delta``.
+        """
+        with self.lock:
+            self._change('_adjust', pk, delta)
+
+    def reset(self):
+        """
+        Drops the index, it is loaded again on next use.
+        """
+        with self.lock:
+            self.built_at = None
+            self.keys, self.entries, self.top = [], {}, {}
+
+
+def _load_tags():
+    posts = dict(Post.tags.through.objects
+        .order_by()
+        .values('tag_id')
+        .annotate(total=Count('id'))
+        .values_list('tag_id', 'total'))
+    for pk, name in Tag.objects.values_list('id', 'name').iterator():
+        yield pk, name, posts.get(pk, 0)
+
+
+def _load_groups():
+    return Group.objects\
+        .exclude(group_type=Group.Type.PRIVATE)\
+        .values_list('id', 'name', 'members_count')\
+        .iterator()
+
+
+def _load_users():
+    followers = dict(UserFollower.objects
+        .order_by()
+        .values('followed_user_id')
+        .annotate(total=Count('id'))
+        .values_list('followed_user_id', 'total'))
+    for pk, username in User.objects.filter(is_active=True).values_list('id', 'username').iterator():
+        yield pk, username, followers.get(pk, 0)
+
+
+INDEXES = {
+    'tag': PrefixIndex(_load_tags),
+    'group': PrefixIndex(_load_groups),
+    'user': PrefixIndex(_load_users),
+}
+
+
+def suggest(kind, prefix, limit):
+    return INDEXES[kind].suggest(prefix, min(limit, MAX_LIMIT))
+
+
+def warm():
+    """
+    Starts loading every index in the background, see the module
+    docstring. Returns the threads started.
+    """
+    threads = [index.refresh() for index in INDEXES.values()]
+    return [thread for thread in threads if thread is not None]
+
+
+def reset():
+    for index in INDEXES.values():
+        index.reset()
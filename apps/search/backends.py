@@ -0,0 +1,187 @@
+"""
+Full-text search backends.
+
+Posts are indexed on their title and content, comments on their text. The
+index lives in the database and is kept in sync by the database itself,
+so bulk inserts and queryset updates are covered too:
+
+- on SQLite, FTS5 tables using the post and comment tables as external
+  content, maintained by triggers (see migration search 0001);
+- on PostgreSQL, ``search_vector`` tsvector columns generated from the
+  indexed fields, with GIN indexes.
+
+A backend narrows a queryset to the matches of a search and annotates
+them with ``search_rank``, higher being more relevant, so the usual
+filters and visibility rules still compose with it. Highlighted snippets
+are only computed for the page being returned, see ``highlights``.
+
+Ranking costs time per match, so words found in most rows would make a
+search as slow as a scan: only the SEARCH_MAX_CANDIDATES newest matches
+left by the filters of the queryset are ranked.
+"""
+from collections import namedtuple
+from html import escape
+import re
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+
+from comments.models import PostComment
+from posts.models import Post
+
+
+SearchIndex = namedtuple('SearchIndex', ['model', 'table', 'fields', 'weights'])
+
+INDEXES = {
+    'post': SearchIndex(Post, 'search_post', ('title', 'content'), (4.0, 1.0)),
+    'comment': SearchIndex(PostComment, 'search_comment', ('_comment',), (1.0,)),
+}
+
+# words beyond the first MAX_TERMS are ignored
+MAX_TERMS = 10
+
+# private use characters mark the matches in snippets until they are escaped
+MARK_START = '\ue000'
+MARK_END = '\ue001'
+
+
+def search_terms(query):
+    """
+    The words of ``query``. Operators and punctuation are dropped, all
+    words have to match.
+    """
+    return re.findall(r'\w+', query)[:MAX_TERMS]
+
+
+def mark_matches(snippet):
+    """
+    Escapes ``snippet`` and wraps the matched words in <mark> tags.
+    """
+    if snippet is None:
+        return None
+    return escape(snippet).replace(MARK_START, '<mark>').replace(MARK_END, '</mark>')
+
+
+class SQLiteSearchBackend:
+    SNIPPET_TOKENS = 24
+
+    def match_expression(self, terms):
+        return ' '.join('"{}"'.format(term.replace('"', '')) for term in terms)
+
+    def search(self, queryset, index, terms):
+        table = connection.ops.quote_name(index.table)
+        source = connection.ops.quote_name(index.model._meta.db_table)
+        weights = ', '.join(str(weight) for weight in index.weights)
+        match = self.match_expression(terms)
+        matches = queryset.extra(
+            tables=[index.table],
+            where=[f'{table}.rowid = {source}.id', f'{table} MATCH %s'],
+            params=[match],
+        )
+        # FTS5 walks matches by descending rowid and applies rowid ranges
+        # inside the index, so the oldest candidate bounds the search
+        oldest = self._oldest_candidate(matches)
+        if oldest is not None:
+            matches = matches.extra(where=[f'{table}.rowid >= %s'], params=[oldest])
+        return matches.extra(select={'search_rank': f'-bm25({table}, {weights})'})
+
+    def _oldest_candidate(self, matches):
+        """
+        The id of the SEARCH_MAX_CANDIDATES-th newest of ``matches``, which
+        carry the filters of the search, or None if there are fewer.
+        """
+        if not settings.SEARCH_MAX_CANDIDATES:
+            return None
+        position = settings.SEARCH_MAX_CANDIDATES - 1
+        oldest = list(matches.order_by('-pk').values_list('pk', flat=True)[position:position + 1])
+        return oldest[0] if oldest else None
+
+    def highlights(self, index, ids, terms):
+        if not ids:
+            return {}
+        table = connection.ops.quote_name(index.table)
+        snippets = ', '.join(
+            f'snippet({table}, {column}, %s, %s, %s, {self.SNIPPET_TOKENS})'
+            for column in range(len(index.fields))
+        )
+        sql = (
+            f"SELECT rowid, {snippets} FROM {table} "
+            f"WHERE {table} MATCH %s AND rowid IN ({', '.join(['%s'] * len(ids))})"
+        )
+        params = [MARK_START, MARK_END, '…'] * len(index.fields)
+        params += [self.match_expression(terms)] + list(ids)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+        return {row[0]: dict(zip(index.fields, row[1:])) for row in rows}
+
+    def rebuild(self, index):
+        """
+        Reindexes every row and merges the index segments.
+        """
+        table = connection.ops.quote_name(index.table)
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {table}({table}) VALUES ('rebuild')")
+            cursor.execute(f"INSERT INTO {table}({table}) VALUES ('optimize')")
+
+
+class PostgresSearchBackend:
+    CONFIG = 'english'
+    HEADLINE_OPTIONS = (
+        f'StartSel={MARK_START}, StopSel={MARK_END}, '
+        'MaxWords=35, MinWords=15, MaxFragments=2'
+    )
+
+    def search(self, queryset, index, terms):
+        source = connection.ops.quote_name(index.model._meta.db_table)
+        query = 'plainto_tsquery(%s::regconfig, %s)'
+        matches = queryset.extra(
+            where=[f'{source}.search_vector @@ {query}'],
+            params=[self.CONFIG, ' '.join(terms)],
+        )
+        if settings.SEARCH_MAX_CANDIDATES:
+            # the newest matches that pass the filters of the queryset
+            candidates = matches.order_by('-pk').values('pk')[:settings.SEARCH_MAX_CANDIDATES]
+            matches = matches.filter(pk__in=candidates)
+        return matches.extra(
+            select={'search_rank': f'ts_rank_cd({source}.search_vector, {query})'},
+            select_params=[self.CONFIG, ' '.join(terms)],
+        )
+
+    def highlights(self, index, ids, terms):
+        if not ids:
+            return {}
+        source = connection.ops.quote_name(index.model._meta.db_table)
+        headlines = ', '.join(
+            f'ts_headline(%s::regconfig, {connection.ops.quote_name(field)}, query, %s)'
+            for field in index.fields
+        )
+        sql = (
+            f'SELECT id, {headlines} FROM {source}, plainto_tsquery(%s::regconfig, %s) query '
+            f"WHERE id IN ({', '.join(['%s'] * len(ids))})"
+        )
+        params = [self.CONFIG, self.HEADLINE_OPTIONS] * len(index.fields)
+        params += [self.CONFIG, ' '.join(terms)] + list(ids)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+        return {row[0]: dict(zip(index.fields, row[1:])) for row in rows}
+
+    def rebuild(self, index):
+        # search_vector is a generated column, only the index can be rebuilt
+        with connection.cursor() as cursor:
+            cursor.execute(f'REINDEX INDEX {connection.ops.quote_name(index.table + "_idx")}')
+
+
+BACKENDS = {
+    'sqlite': SQLiteSearchBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+def get_backend():
+    try:
+        return BACKENDS[connection.vendor]()
+    except KeyError:
+        raise ImproperlyConfigured(f'Full-text search is not available on {connection.vendor}')
@@ -0,0 +1,87 @@
+from django.db import migrations
+
+
+# FTS5 tables reading their text from the indexed table (external content)
+# and triggers keeping them in sync with it
+SQLITE_INDEX = (
+    """CREATE VIRTUAL TABLE {index} USING fts5(
+        {columns}, content='{table}', content_rowid='id', tokenize='porter unicode61'
+    )""",
+    """CREATE TRIGGER {index}_insert AFTER INSERT ON {table} BEGIN
+        INSERT INTO {index}(rowid, {columns}) VALUES (new.id, {new});
+    END""",
+    """CREATE TRIGGER {index}_delete AFTER DELETE ON {table} BEGIN
+        INSERT INTO {index}({index}, rowid, {columns}) VALUES ('delete', old.id, {old});
+    END""",
+    """CREATE TRIGGER {index}_update AFTER UPDATE OF {columns} ON {table}
+    WHEN {changed} BEGIN
+        INSERT INTO {index}({index}, rowid, {columns}) VALUES ('delete', old.id, {old});
+        INSERT INTO {index}(rowid, {columns}) VALUES (new.id, {new});
+    END""",
+    "INSERT INTO {index}({index}) VALUES ('rebuild')",
+)
+
+SQLITE_DROP = (
+    'DROP TRIGGER IF EXISTS {index}_insert',
+    'DROP TRIGGER IF EXISTS {index}_delete',
+    'DROP TRIGGER IF EXISTS {index}_update',
+    'DROP TABLE IF EXISTS {index}',
+)
+
+# generated columns need PostgreSQL 12
+POSTGRES_INDEX = (
+    'ALTER TABLE {table} ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ({vector}) STORED',
+    'CREATE INDEX {index}_idx ON {table} USING GIN (search_vector)',
+)
+
+POSTGRES_DROP = (
+    'DROP INDEX IF EXISTS {index}_idx',
+    'ALTER TABLE {table} DROP COLUMN IF EXISTS search_vector',
+)
+
+INDEXES = (
+    ('search_post', 'posts_post', {'title': 'A', 'content': 'B'}),
+    ('search_comment', 'comments_postcomment', {'_comment': 'A'}),
+)
+
+
+def _statements(schema_editor, sqlite, postgres):
+    vendor = schema_editor.connection.vendor
+    for index, table, columns in INDEXES:
+        if vendor == 'sqlite':
+            statements, names = sqlite, {
+                'columns': ', '.join(columns),
+                'new': ', '.join(f'new.{column}' for column in columns),
+                'old': ', '.join(f'old.{column}' for column in columns),
+                'changed': ' OR '.join(f'old.{column} IS NOT new.{column}' for column in columns),
+            }
+        elif vendor == 'postgresql':
+            statements, names = postgres, {
+                'vector': ' || '.join(
+                    f"setweight(to_tsvector('english', coalesce({column}, '')), '{weight}')"
+                    for column, weight in columns.items()),
+            }
+        else:
+            continue
+        for statement in statements:
+            schema_editor.execute(statement.format(index=index, table=table, **names))
+
+
+def create_indexes(apps, schema_editor):
+    _statements(schema_editor, SQLITE_INDEX, POSTGRES_INDEX)
+
+
+def drop_indexes(apps, schema_editor):
+    _statements(schema_editor, SQLITE_DROP, POSTGRES_DROP)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0009_added_post_vote_user_index'),
+        ('comments', '0006_added_comment_user_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
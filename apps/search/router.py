@@ -0,0 +1,7 @@
+from rest_framework_nested import routers
+from search.views import AutocompleteViewSet, SearchViewSet
+
+
+router = routers.SimpleRouter()
+router.register(r'search', SearchViewSet, basename='search')
+router.register(r'autocomplete', AutocompleteViewSet, basename='autocomplete')
@@ -0,0 +1,19 @@
+from rest_framework import serializers
+
+from comments.models import PostComment
+from profiles.serializers import UserSerializer
+
+
+class CommentSearchSerializer(serializers.ModelSerializer):
+    user = UserSerializer()
+    comment = serializers.ReadOnlyField(source='_get_comment')
+    votes = serializers.ReadOnlyField(source='score')
+    post_uuid = serializers.ReadOnlyField(source='post.uuid')
+    post_title = serializers.ReadOnlyField(source='post.title')
+
+    class Meta:
+        model = PostComment
+        fields = (
+            'id', 'user', 'comment', 'votes', 'created_at',
+            'parent', 'post_uuid', 'post_title',
+        )
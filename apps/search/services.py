@@ -0,0 +1,73 @@
+from django.db.models import Prefetch
+
+from comments.models import PostComment
+from posts.models import Post
+from posts.services import visible_posts
+from search.backends import INDEXES, get_backend, mark_matches
+from tags.models import Tag
+
+
+def searchable(kind, user, request=None, group=None, tag=None, author=None):
+    """
+    The posts or comments ``user`` may find, restricted to a group id, a
+    tag name and an author username when given.
+    """
+    if kind == 'post':
+        queryset = visible_posts(
+            Post.objects.exclude(status=Post.STATUS.DRAFT), user, request=request)
+        prefix = ''
+        author_field = 'author'
+    else:
+        queryset = visible_posts(
+            PostComment.objects.filter(is_removed=False).exclude(post__status=Post.STATUS.DRAFT),
+            user, request=request, group_field='post__group')
+        prefix = 'post__'
+        author_field = 'user'
+    if group is not None:
+        queryset = queryset.filter(**{f'{prefix}group_id': group})
+    if tag is not None:
+        queryset = queryset.filter(**{f'{prefix}tags__name': tag})
+    if author is not None:
+        queryset = queryset.filter(**{f'{author_field}__username': author})
+    return queryset
+
+
+def search(kind, terms, user, offset, limit, request=None, **filters):
+    """
+    Returns the ``limit`` most relevant posts or comments matching every
+    word of ``terms`` after the first ``offset``, most relevant first,
+    each with ``search_rank`` and ``highlights``, a dict of snippets of
+    the indexed fields with the matches in <mark> tags.
+
+    Matches are ranked on their ids alone, so sorting many matches does
+    not carry whole rows along; the page is then loaded by id.
+    """
+    backend = get_backend()
+    index = INDEXES[kind]
+    ranked = backend.search(searchable(kind, user, request=request, **filters), index, terms)\
+        .order_by('-search_rank', '-id')\
+        .values_list('id', 'search_rank')[offset:offset + limit]
+    ranks = dict(ranked)
+    if not ranks:
+        return []
+
+    if kind == 'post':
+        queryset = Post.objects\
+            .select_related('author', 'group')\
+            .prefetch_related(Prefetch('tags', queryset=Tag.objects.select_related('tag_type')))
+    else:
+        queryset = PostComment.objects.select_related('user', 'post')
+    found = queryset.in_bulk(list(ranks))
+    snippets = backend.highlights(index, list(ranks), terms)
+    results = []
+    for pk, rank in ranks.items():
+        if pk not in found:
+            continue
+        result = found[pk]
+        result.search_rank = rank
+        result.highlights = {
+            field.lstrip('_'): mark_matches(snippet)
+            for field, snippet in snippets.get(pk, {}).items()
+        }
+        results.append(result)
+    return results
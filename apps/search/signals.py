@@ -0,0 +1,98 @@
+"""
+Keeps the autocomplete indexes of search.autocomplete up to date. The
+indexes are only changed once the transaction of a change commits, so
+rolled back changes never reach them.
+"""
+from functools import partial
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from followers.models import UserFollower
+from groups.models import Group, GroupMember
+from posts.models import Post
+from search.autocomplete import INDEXES
+from tags.models import Tag
+
+
+def on_commit(method, *args):
+    transaction.on_commit(partial(method, *args))
+
+
+@receiver(post_save, sender=Tag)
+def tag_saved(sender, instance, **kwargs):
+    on_commit(INDEXES['tag'].put, instance.pk, instance.name)
+
+
+@receiver(post_delete, sender=Tag)
+def tag_deleted(sender, instance, **kwargs):
+    on_commit(INDEXES['tag'].remove, instance.pk)
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def post_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    index = INDEXES['tag']
+    if action == 'pre_clear' and not reverse:
+        # pk_set is not given on clear, read the tags before they go
+        if index.built_at is not None or index.refreshing:
+            for tag_id in instance.tags.values_list('id', flat=True):
+                on_commit(index.adjust, tag_id, -1)
+        return
+    if action not in ('post_add', 'post_remove') or not pk_set:
+        return
+    delta = 1 if action == 'post_add' else -1
+    if reverse:
+        on_commit(index.adjust, instance.pk, delta * len(pk_set))
+    else:
+        for tag_id in pk_set:
+            on_commit(index.adjust, tag_id, delta)
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, **kwargs):
+    if instance.group_type == Group.Type.PRIVATE:
+        on_commit(INDEXES['group'].remove, instance.pk)
+    else:
+        on_commit(INDEXES['group'].put, instance.pk, instance.name, instance.members_count)
+
+
+@receiver(post_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    on_commit(INDEXES['group'].remove, instance.pk)
+
+
+@receiver(post_save, sender=GroupMember)
+def member_saved(sender, instance, created, **kwargs):
+    if created:
+        on_commit(INDEXES['group'].adjust, instance.group_id, 1)
+
+
+@receiver(post_delete, sender=GroupMember)
+def member_deleted(sender, instance, **kwargs):
+    on_commit(INDEXES['group'].adjust, instance.group_id, -1)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, **kwargs):
+    if instance.is_active:
+        on_commit(INDEXES['user'].put, instance.pk, instance.username)
+    else:
+        on_commit(INDEXES['user'].remove, instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    on_commit(INDEXES['user'].remove, instance.pk)
+
+
+@receiver(post_save, sender=UserFollower)
+def follower_saved(sender, instance, created, **kwargs):
+    if created:
+        on_commit(INDEXES['user'].adjust, instance.followed_user_id, 1)
+
+
+@receiver(post_delete, sender=UserFollower)
+def follower_deleted(sender, instance, **kwargs):
+    on_commit(INDEXES['user'].adjust, instance.followed_user_id, -1)
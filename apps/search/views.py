@@ -0,0 +1,130 @@
+from collections import OrderedDict
+
+from rest_framework import status, viewsets
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from core.mixins import ReplicaReadMixin
+from posts.serializers import PostSerializer
+from search import autocomplete
+from search.backends import search_terms
+from search.serializers import CommentSearchSerializer
+from search.services import search
+
+
+class SearchViewSet(ReplicaReadMixin, viewsets.ViewSet):
+    """
+    Full-text search over posts, or comments with ``type=comment``, most
+    relevant first. ``q`` holds the words to find, all of which have to
+    match; ``group`` (id), ``tag`` (name) and ``author`` (username)
+    narrow the results. Pass back the ``next`` url for the next page.
+    """
+    page_size = 20
+    max_page = 50
+    serializer_classes = {
+        'post': PostSerializer,
+        'comment': CommentSearchSerializer,
+    }
+
+    def list(self, request):
+        params = request.query_params
+        terms = search_terms(params.get('q', ''))
+        if not terms:
+            return Response(
+                {'error': 'q must contain at least one word'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        kind = params.get('type', 'post')
+        if kind not in self.serializer_classes:
+            return Response(
+                {'error': 'type must be post or comment'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            page = int(params.get('page', 1))
+            group = int(params['group']) if params.get('group') else None
+        except ValueError:
+            return Response(
+                {'error': 'page and group must be integers'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not 1 <= page <= self.max_page:
+            return Response(
+                {'error': f'page must be between 1 and {self.max_page}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        results = search(
+            kind, terms, request.user,
+            offset=(page - 1) * self.page_size, limit=self.page_size + 1, request=request,
+            group=group, tag=params.get('tag') or None, author=params.get('author') or None)
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        serializer = self.serializer_classes[kind](results, many=True, context={'request': request})
+
+        next_link = None
+        if has_more and page < self.max_page:
+            next_link = replace_query_param(request.build_absolute_uri(), 'page', page + 1)
+        previous_link = None
+        if page > 1:
+            previous_link = replace_query_param(request.build_absolute_uri(), 'page', page - 1)
+        return Response(OrderedDict([
+            ('next', next_link),
+            ('previous', previous_link),
+            ('results', [
+                OrderedDict([
+                    ('type', kind),
+                    ('rank', round(result.search_rank, 6)),
+                    ('highlights', result.highlights),
+                    ('data', data),
+                ])
+                for result, data in zip(results, serializer.data)
+            ]),
+        ]), status=status.HTTP_200_OK)
+
+
+class AutocompleteViewSet(viewsets.ViewSet):
+    """
+    Suggests tag names, group names and usernames starting with ``q``,
+    most popular first, from the in-memory indexes of search.autocomplete.
+    ``types`` restricts the kinds, e.g. ``types=tag,user``, and ``limit``
+    the suggestions of each kind.
+    """
+    kinds = OrderedDict([
+        ('tag', 'tags'),
+        ('group', 'groups'),
+        ('user', 'users'),
+    ])
+    default_limit = 8
+
+    def list(self, request):
+        params = request.query_params
+        prefix = params.get('q', '').strip()
+        if not prefix:
+            return Response(
+                {'error': 'q is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        kinds = [kind for kind in params.get('types', ','.join(self.kinds)).split(',') if kind]
+        if not kinds or any(kind not in self.kinds for kind in kinds):
+            return Response(
+                {'error': 'types must be a list of tag, group and user'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            limit = int(params.get('limit', self.default_limit))
+        except ValueError:
+            limit = 0
+        if not 1 <= limit <= autocomplete.MAX_LIMIT:
+            return Response(
+                {'error': f'limit must be between 1 and {autocomplete.MAX_LIMIT}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response(OrderedDict([
+            (self.kinds[kind], [
+                suggestion._asdict()
+                for suggestion in autocomplete.suggest(kind, prefix, limit)
+            ])
+            for kind in self.kinds if kind in kinds
+        ]), status=status.HTTP_200_OK)
@@ -1,6 +1,7 @@
 from django.shortcuts import render
 from .models import Tag
 from core.views import BaseViewSet
+from core.cache import cached_response
 from .serializers import TagSerializer
 from .filters import TagFilterSet
 
@@ -10,3 +11,12 @@ class TagViewSet(BaseViewSet):
     serializer_class = TagSerializer
     filterset_class = TagFilterSet
     ordering = ['-created_at']
+    cache_namespace = 'tags'
+
+    @cached_response()
+    def list(self, request, *args, **kwargs):
+        return super(TagViewSet, self).list(request, *args, **kwargs)
+
+    @cached_response()
+    def retrieve(self, request, *args, **kwargs):
+        return super(TagViewSet, self).retrieve(request, *args, **kwargs)
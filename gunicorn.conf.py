@@ -0,0 +1,53 @@
+"""
+Gunicorn settings, overridable from the environment.
+
+With GUNICORN_THREADS above 1 each worker serves requests from that many
+threads. Every thread keeps its own persistent database connection for
+CONN_MAX_AGE seconds, or, with DB_POOL_SIZE set, the threads of a worker
+share a pool of that many connections; see core.db.
+
+With ASYNC_VIEWS the app is served from reddit_clone.asgi by uvicorn
+workers instead, each holding many connections on one event loop; the
+hot read routes then run on the threads of that loop's executor, see
+core.mixins.AsyncViewMixin.
+"""
+import multiprocessing
+import os
+
+
+asgi = os.environ.get('ASYNC_VIEWS', 'False').lower() in ('true', '1', 'yes', 'on')
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+# the settings see how many processes serve the app, see core.checks
+os.environ['WEB_CONCURRENCY'] = str(workers)
+threads = int(os.environ.get('GUNICORN_THREADS', '1'))
+if asgi:
+    wsgi_app = 'reddit_clone.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    wsgi_app = 'reddit_clone.wsgi:application'
+    worker_class = 'gthread' if threads > 1 else 'sync'
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '30'))
+keepalive = 5
+# recycle workers now and then, staggered so they do not restart together
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', '1000'))
+max_requests_jitter = max_requests // 10
+
+
+def on_starting(server):
+    # refuse to start with settings that break once several workers run,
+    # e.g. a process local response cache
+    import django
+    from django.core.management import call_command
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'reddit_clone.settings')
+    django.setup()
+    call_command('check')
+
+
+def post_fork(server, worker):
+    # load the autocomplete indexes before the first lookup needs them
+    from search import autocomplete
+
+    autocomplete.warm()
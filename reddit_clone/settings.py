@@ -77,7 +77,9 @@ INSTALLED_APPS = [
     'bookmarks',
     'followers',
     'reports',
-    'groups'
+    'groups',
+    'feeds',
+    'search',
 ]
 
 REST_FRAMEWORK = {
@@ -92,8 +94,10 @@ REST_FRAMEWORK = {
 }
 
 MIDDLEWARE = [
+    'core.middleware.SQLProfileMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'core.middleware.StaticFilesMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -159,6 +163,124 @@ else:
         }
     }
 
+# Connections, see core.db. Connections are kept open for CONN_MAX_AGE
+# seconds, 0 closes them after every request, and with CONN_HEALTH_CHECKS
+# a kept connection is checked before a request reuses it. DB_POOL_SIZE
+# above 0 shares a pool of that many connections between the threads of
+# each worker instead; a request waits up to DB_POOL_TIMEOUT seconds for one.
+CONN_MAX_AGE = int(get_env_variable('CONN_MAX_AGE', '60'))
+CONN_HEALTH_CHECKS = get_env_variable('CONN_HEALTH_CHECKS', 'True').lower() in ('true', '1', 'yes', 'on')
+DB_POOL_SIZE = int(get_env_variable('DB_POOL_SIZE', '0'))
+DB_POOL_TIMEOUT = float(get_env_variable('DB_POOL_TIMEOUT', '10'))
+
+# Independent queries of a request, e.g. the viewer's votes and bookmarks
+# of a page of posts, run at the same time on a pool of QUERY_THREADS
+# threads per process, each with its own connection; 0 runs them one after
+# the other, the default with SQLite, whose queries run in process and only
+# pay for the threads. See core.db.concurrency.
+QUERY_THREADS = int(get_env_variable(
+    'QUERY_THREADS', '0' if DATABASES['default']['ENGINE'].endswith('sqlite3') else '4'))
+
+# ASGI deployment, see gunicorn.conf.py. With ASYNC_VIEWS the hot read
+# routes are async views running their viewset on a worker thread, see
+# core.mixins.AsyncViewMixin.
+ASYNC_VIEWS = get_env_variable('ASYNC_VIEWS', 'False').lower() in ('true', '1', 'yes', 'on')
+
+# Read replicas, see core.db.routers. DATABASE_REPLICA_URLS is a comma
+# separated list of database urls, DATABASE_REPLICA_WEIGHTS optionally their
+# comma separated weights, 1 by default. The reads of the list and retrieve
+# API requests go to the replicas that lag at most REPLICA_MAX_LAG seconds,
+# checked every REPLICA_CHECK_INTERVAL seconds; clients that wrote in the
+# last REPLICA_PIN_SECONDS read from the primary.
+DATABASE_REPLICA_URLS = get_env_variable('DATABASE_REPLICA_URLS', '')
+DATABASE_REPLICA_WEIGHTS = get_env_variable('DATABASE_REPLICA_WEIGHTS', '')
+DATABASE_REPLICAS = {}
+replica_urls = [url for url in DATABASE_REPLICA_URLS.split(',') if url]
+if replica_urls:
+    import dj_database_url
+for number, url in enumerate(replica_urls, 1):
+    DATABASES[f'replica_{number}'] = dict(dj_database_url.parse(url), TEST={'MIRROR': 'default'})
+    DATABASE_REPLICAS[f'replica_{number}'] = 1
+for alias, weight in zip(DATABASE_REPLICAS, filter(None, DATABASE_REPLICA_WEIGHTS.split(','))):
+    DATABASE_REPLICAS[alias] = int(weight)
+if DATABASE_REPLICAS:
+    DATABASE_ROUTERS = ['core.db.routers.ReplicaRouter']
+REPLICA_PIN_SECONDS = int(get_env_variable('REPLICA_PIN_SECONDS', '10'))
+REPLICA_MAX_LAG = float(get_env_variable('REPLICA_MAX_LAG', '5'))
+REPLICA_CHECK_INTERVAL = float(get_env_variable('REPLICA_CHECK_INTERVAL', '5'))
+
+POOLED_ENGINES = {
+    'django.db.backends.postgresql': 'core.db.backends.postgresql',
+    'django.db.backends.postgresql_psycopg2': 'core.db.backends.postgresql',
+    'django.db.backends.sqlite3': 'core.db.backends.sqlite3',
+}
+for database in DATABASES.values():
+    database['CONN_MAX_AGE'] = CONN_MAX_AGE
+    if DB_POOL_SIZE > 0 and database['ENGINE'] in POOLED_ENGINES:
+        # pooled connections go back to the pool at the end of each request
+        database['CONN_MAX_AGE'] = 0
+        database['ENGINE'] = POOLED_ENGINES[database['ENGINE']]
+        database['POOL_SIZE'] = DB_POOL_SIZE
+        database['POOL_TIMEOUT'] = DB_POOL_TIMEOUT
+
+# Caches. CACHE_BACKEND and CACHE_LOCATION select any Django cache backend:
+# the local memory default only suits a single process, several workers or
+# nodes need a shared one such as memcached, or
+# django.core.cache.backends.filebased.FileBasedCache with a directory all
+# of them can reach. The check core.E001 refuses local memory when
+# WEB_CONCURRENCY, the number of processes serving the app, set by
+# gunicorn.conf.py, is above 1.
+WEB_CONCURRENCY = int(get_env_variable('WEB_CONCURRENCY', '1'))
+CACHES = {
+    'default': {
+        'BACKEND': get_env_variable('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': get_env_variable('CACHE_LOCATION', 'reddit-clone'),
+    }
+}
+
+# Anonymous response cache, see core.cache. Entries are fresh for
+# RESPONSE_CACHE_TIMEOUT seconds and may be served stale for
+# RESPONSE_CACHE_STALE more seconds while one request rebuilds them.
+RESPONSE_CACHE_ALIAS = 'default'
+RESPONSE_CACHE_TIMEOUT = int(get_env_variable('RESPONSE_CACHE_TIMEOUT', '60'))
+RESPONSE_CACHE_STALE = int(get_env_variable('RESPONSE_CACHE_STALE', '300'))
+RESPONSE_CACHE_LOCK_TIMEOUT = 10
+
+# Roles of users in groups, see groups.roles.
+GROUP_ROLE_CACHE_ALIAS = 'default'
+GROUP_ROLE_CACHE_TIMEOUT = int(get_env_variable('GROUP_ROLE_CACHE_TIMEOUT', '300'))
+
+# Home feeds, see feeds.services. Posts are copied into the feed rows of
+# followers and members, at most FEED_MAX_ENTRIES per user, except for
+# authors and groups above the FEED_PUSH_MAX_* limits, which are queried
+# when feeds are read.
+FEED_CACHE_ALIAS = 'default'
+FEED_MAX_ENTRIES = int(get_env_variable('FEED_MAX_ENTRIES', '500'))
+FEED_PUSH_MAX_FOLLOWERS = int(get_env_variable('FEED_PUSH_MAX_FOLLOWERS', '1000'))
+FEED_PUSH_MAX_MEMBERS = int(get_env_variable('FEED_PUSH_MAX_MEMBERS', '1000'))
+FEED_SOURCE_CACHE_TIMEOUT = 300
+
+# Vote ingestion: 'sync' applies each vote inside the request, 'buffered'
+# appends it to VOTE_BUFFER_BACKEND and leaves it to the flush_votes command.
+VOTE_INGESTION = get_env_variable('VOTE_INGESTION', 'sync')
+VOTE_BUFFER_BACKEND = get_env_variable('VOTE_BUFFER_BACKEND', 'core.votes.DatabaseVoteBuffer')
+
+# Full-text search, see search.backends. Only the SEARCH_MAX_CANDIDATES
+# newest matches of a search are ranked, 0 ranks all of them.
+SEARCH_MAX_CANDIDATES = int(get_env_variable('SEARCH_MAX_CANDIDATES', '10000'))
+
+# Autocomplete indexes, see search.autocomplete. Each process reloads its
+# copy in the background once it is AUTOCOMPLETE_MAX_AGE seconds old so it
+# sees the changes made by other processes; 0 never reloads.
+AUTOCOMPLETE_MAX_AGE = int(get_env_variable('AUTOCOMPLETE_MAX_AGE', '300'))
+
+# SQL profiling of API requests, see core.middleware. A share of
+# SQL_PROFILE_SAMPLE_RATE requests is profiled, 0 turns it off; profiles
+# are appended as JSON lines to SQL_PROFILE_SINK when it is set.
+SQL_PROFILE_SAMPLE_RATE = float(get_env_variable('SQL_PROFILE_SAMPLE_RATE', '0'))
+SQL_PROFILE_DUPLICATE_THRESHOLD = int(get_env_variable('SQL_PROFILE_DUPLICATE_THRESHOLD', '2'))
+SQL_PROFILE_SINK = get_env_variable('SQL_PROFILE_SINK', '')
+
 AUTHENTICATION_BACKENDS = (
     'django.contrib.auth.backends.ModelBackend',
     'allauth.account.auth_backends.AuthenticationBackend',
@@ -175,6 +297,14 @@ EMAIL_HOST_PASSWORD = 'admin123'
 EMAIL_PORT = 587
 EMAIL_USE_TLS = True
 
+# Mail outbox, see core.outbox. Failed messages are retried after
+# OUTBOX_RETRY_DELAY seconds, doubling every attempt, up to
+# OUTBOX_MAX_ATTEMPTS attempts. A worker holds the messages of its batch
+# for OUTBOX_LEASE seconds, they are retried after that if it dies.
+OUTBOX_RETRY_DELAY = int(get_env_variable('OUTBOX_RETRY_DELAY', '60'))
+OUTBOX_MAX_ATTEMPTS = int(get_env_variable('OUTBOX_MAX_ATTEMPTS', '8'))
+OUTBOX_LEASE = int(get_env_variable('OUTBOX_LEASE', '300'))
+
 LOGIN_REDIRECT_URL  = 'angular_app'
 LOGOUT_REDIRECT_URL = 'angular_app'
 
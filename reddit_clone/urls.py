@@ -46,6 +46,8 @@ urlpatterns = [
     path('', include('groups.urls')),
     path('', include('profiles.urls')),
     path('', include('reports.urls')),
+    path('', include('feeds.urls')),
+    path('', include('search.urls')),
         path(
         "api/swagger/",
         schema_view.with_ui("swagger", cache_timeout=0),
@@ -0,0 +1,196 @@
+"""
+Concurrent queries and ASGI deployment tests for the Reddit clone API
+"""
+import asyncio
+import threading
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.paginator import EmptyPage, PageNotAnInteger
+from django.http import HttpResponse
+from django.test import (
+    AsyncClient, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+)
+from rest_framework import status
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from bookmarks.models import PostBookmark
+from comments.models import PostComment
+from core.db.concurrency import run_concurrently
+from core.db.routers import PIN_COOKIE
+from core.instrumentation import capture_sql
+from core.middleware import ReplicaRoutingMiddleware
+from core.pagination import ConcurrentPaginator
+from groups.models import Group, GroupRule
+from groups.views import GroupViewSet
+from posts.models import Post, PostVote
+from posts.views import PostViewSet
+from comments.views import PostCommentViewSet
+
+
+@override_settings(QUERY_THREADS=4)
+class RunConcurrentlyTest(SimpleTestCase):
+    """Test cases for run_concurrently"""
+
+    def test_calls_run_at_the_same_time(self):
+        """Test every call waits on the others and results keep their order"""
+        barrier = threading.Barrier(3, timeout=5)
+
+        def call(value):
+            barrier.wait()
+            return value, threading.current_thread()
+
+        results = run_concurrently(*(lambda value=value: call(value) for value in 'abc'))
+        self.assertEqual([value for value, _ in results], ['a', 'b', 'c'])
+        self.assertEqual(len({thread for _, thread in results}), 3)
+        self.assertIs(results[0][1], threading.current_thread())
+
+    def test_errors_after_every_call(self):
+        """Test an error is raised once the other calls finished"""
+        finished = []
+
+        def fail():
+            raise ValueError('first')
+
+        with self.assertRaisesMessage(ValueError, 'first'):
+            run_concurrently(fail, lambda: finished.append(True))
+        self.assertEqual(finished, [True])
+
+    @override_settings(QUERY_THREADS=0)
+    def test_disabled(self):
+        """Test the calls run in the calling thread without query threads"""
+        threads = run_concurrently(threading.current_thread, threading.current_thread)
+        self.assertEqual(threads, [threading.current_thread()] * 2)
+
+
+@override_settings(QUERY_THREADS=4)
+class TransactionFallbackTest(TestCase):
+    """Test cases for run_concurrently inside a transaction"""
+
+    def test_sequential_in_transaction(self):
+        """Test calls see the uncommitted rows of the transaction"""
+        user = User.objects.create_user(username='testuser', password='testpass123')
+        results = run_concurrently(
+            threading.current_thread, lambda: User.objects.filter(pk=user.pk).exists())
+        self.assertEqual(results, [threading.current_thread(), True])
+
+
+@override_settings(QUERY_THREADS=4)
+class ConcurrentQueriesTest(TransactionTestCase):
+    """Test cases for queries run on the query threads"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        for i in range(30):
+            Post.objects.create(title=f'Post {i}', content='Test content', author=self.user)
+
+    def test_captures_count_every_thread(self):
+        """Test SQL captures count the queries of the query threads"""
+        with capture_sql() as stats:
+            posts, total = run_concurrently(
+                lambda: list(Post.objects.all()), Post.objects.count)
+        self.assertEqual((len(posts), total), (30, 30))
+        self.assertEqual(stats.queries, 2)
+        self.assertEqual(stats.rows, 31)
+
+    def test_paginator(self):
+        """Test pages are loaded with their count and validated after"""
+        paginator = ConcurrentPaginator(Post.objects.order_by('id'), 12)
+        page = paginator.page('3')
+        self.assertEqual(len(page.object_list), 6)
+        self.assertEqual(paginator.count, 30)
+        self.assertFalse(page.has_next())
+        with self.assertRaises(EmptyPage):
+            ConcurrentPaginator(Post.objects.order_by('id'), 12).page(4)
+        with self.assertRaises(EmptyPage):
+            ConcurrentPaginator(Post.objects.order_by('id'), 12).page(0)
+        with self.assertRaises(PageNotAnInteger):
+            ConcurrentPaginator(Post.objects.order_by('id'), 12).page('x')
+
+
+@override_settings(ASYNC_VIEWS=True, QUERY_THREADS=4)
+class AsyncViewTest(TransactionTestCase):
+    """Test cases for the async views of the hot read routes"""
+
+    def setUp(self):
+        """Set up a post with a comment, vote and bookmark, and a group with a rule"""
+        cache.clear()
+        self.factory = APIRequestFactory()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.group = Group.objects.create(name='Public')
+        GroupRule.objects.create(group=self.group, title='Be nice', description='Please')
+        self.post = Post.objects.create(
+            title='Async post', content='Test content', author=self.user, group=self.group)
+        PostComment.objects.create(post=self.post, user=self.user, _comment='First')
+        PostVote.objects.create(post=self.post, user=self.user, vote=1)
+        PostBookmark.objects.create(post=self.post, user=self.user)
+
+    def _get(self, viewset, actions, path, **kwargs):
+        view = viewset.as_view(actions)
+        self.assertTrue(asyncio.iscoroutinefunction(view))
+        request = self.factory.get(path)
+        force_authenticate(request, user=self.user)
+        response = async_to_sync(view)(request, **kwargs)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_post_list_and_detail(self):
+        """Test posts carry the comment count and the viewer's vote and bookmark"""
+        data = self._get(PostViewSet, {'get': 'list'}, '/api/v1/posts/')
+        self.assertEqual(data['count'], 1)
+        post = data['results'][0]
+        self.assertEqual(post['comments'], 1)
+        self.assertEqual(post['user_vote']['vote'], 1)
+        self.assertIsNotNone(post['user_bookmark'])
+        data = self._get(
+            PostViewSet, {'get': 'retrieve'}, f'/api/v1/posts/{self.post.uuid}/', uuid=self.post.uuid)
+        self.assertEqual(data['title'], 'Async post')
+
+    def test_comment_thread(self):
+        """Test comment threads are served asynchronously"""
+        data = self._get(
+            PostCommentViewSet, {'get': 'thread'},
+            f'/api/v1/posts/{self.post.uuid}/comments/thread/', post_uuid=self.post.uuid)
+        self.assertEqual([comment['comment'] for comment in data['results']], ['First'])
+
+    def test_group_detail(self):
+        """Test group details carry their topics and rules"""
+        data = self._get(GroupViewSet, {'get': 'retrieve'}, f'/api/v1/groups/{self.group.pk}/', pk=self.group.pk)
+        self.assertEqual(data['name'], 'Public')
+        self.assertEqual([rule['title'] for rule in data['rules']], ['Be nice'])
+        self.assertIsNone(data['member_status'])
+
+    def test_other_routes_stay_sync(self):
+        """Test routes without async actions, or without the setting, are sync views"""
+        self.assertFalse(asyncio.iscoroutinefunction(PostCommentViewSet.as_view({'get': 'list'})))
+        with override_settings(ASYNC_VIEWS=False):
+            self.assertFalse(asyncio.iscoroutinefunction(PostViewSet.as_view({'get': 'list'})))
+
+
+class AsgiHandlerTest(TransactionTestCase):
+    """Test cases for requests through the ASGI handler"""
+
+    def test_request(self):
+        """Test the middleware runs asynchronously and serves the API"""
+        user = User.objects.create_user(username='testuser', password='testpass123')
+        Post.objects.create(title='Async post', content='Test content', author=user)
+
+        async def get():
+            return await AsyncClient().get('/api/v1/posts/')
+
+        response = async_to_sync(get)()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['count'], 1)
+
+    @override_settings(DATABASE_REPLICAS={'replica': 1})
+    def test_replica_routing_middleware(self):
+        """Test the routing middleware pins writers when used as async middleware"""
+        async def get_response(request):
+            return HttpResponse()
+
+        middleware = ReplicaRoutingMiddleware(get_response)
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+        request = APIRequestFactory().post('/api/v1/posts/')
+        response = async_to_sync(middleware)(request)
+        self.assertIn(PIN_COOKIE, response.cookies)
@@ -0,0 +1,176 @@
+"""
+Autocomplete tests for the Reddit clone API
+"""
+import threading
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.test import TransactionTestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from followers.models import UserFollower
+from groups.models import Group, GroupMember
+from posts.models import Post
+from search import autocomplete
+from tags.models import Tag
+
+
+@override_settings(AUTOCOMPLETE_MAX_AGE=0)
+class AutocompleteTest(TransactionTestCase):
+    """Test cases for the autocomplete endpoint and its indexes"""
+
+    def setUp(self):
+        """Set up tags, groups and users of different popularity"""
+        autocomplete.reset()
+        self.addCleanup(autocomplete.reset)
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='pyuser', password='testpass123')
+        self.famous = User.objects.create_user(username='PyFamous')
+        User.objects.create_user(username='pyinactive', is_active=False)
+        UserFollower.objects.create(followed_user=self.famous, follower=self.user)
+
+        self.python = Tag.objects.create(name='python')
+        self.pytest = Tag.objects.create(name='pytest')
+        Tag.objects.create(name='rust')
+        for i in range(2):
+            post = Post.objects.create(title=f'Post {i}', content='Content', author=self.user)
+            post.tags.add(self.pytest)
+
+        self.small = Group.objects.create(name='Pyramids')
+        self.big = Group.objects.create(name='Python devs')
+        Group.objects.create(name='Pysecret', group_type=Group.Type.PRIVATE)
+        GroupMember.objects.create(group=self.big, user=self.user)
+
+    def _load(self):
+        for thread in autocomplete.warm():
+            thread.join()
+
+    def _names(self, query):
+        response = self.client.get('/api/v1/autocomplete/' + query)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return {key: [item['name'] for item in items] for key, items in response.data.items()}
+
+    def test_ranked_by_popularity(self):
+        """Test names match the prefix ignoring case, most popular first"""
+        self._load()
+        self.assertEqual(self._names('?q=PY'), {
+            'tags': ['pytest', 'python'],
+            'groups': ['Python devs', 'Pyramids'],
+            'users': ['PyFamous', 'pyuser'],
+        })
+        self.assertEqual(self._names('?q=pyt&types=tag,group&limit=1'), {
+            'tags': ['pytest'],
+            'groups': ['Python devs'],
+        })
+
+    def test_lookups_do_not_query(self):
+        """Test the database is only read to build the indexes"""
+        self._load()
+        with self.assertNumQueries(0):
+            self._names('?q=pyth')
+
+    def test_follows_changes(self):
+        """Test saves and deletes update a built index"""
+        self._load()
+        post = Post.objects.create(title='Post', content='Content', author=self.user)
+        post.tags.add(self.python)
+        self.python.posts.add(*Post.objects.exclude(pk=post.pk))
+        for i in range(2):
+            GroupMember.objects.create(group=self.small, user=User.objects.create_user(username=f'm{i}'))
+        self.famous.delete()
+        Tag.objects.create(name='pydantic')
+        self.big.name = 'Snakes'
+        self.big.save()
+        with self.assertNumQueries(0):
+            self.assertEqual(self._names('?q=py'), {
+                'tags': ['python', 'pytest', 'pydantic'],
+                'groups': ['Pyramids'],
+                'users': ['pyuser'],
+            })
+        post.tags.clear()
+        self.assertEqual(self._names('?q=py&types=tag')['tags'][:2], ['pytest', 'python'])
+
+    def test_rolled_back_changes_are_ignored(self):
+        """Test the index only follows changes once they commit"""
+        self._load()
+        with transaction.atomic():
+            Tag.objects.create(name='pydantic')
+            self.assertEqual(self._names('?q=pyd&types=tag')['tags'], [])
+        self.assertEqual(self._names('?q=pyd&types=tag')['tags'], ['pydantic'])
+        try:
+            with transaction.atomic():
+                Tag.objects.create(name='pyramid')
+                raise ValueError
+        except ValueError:
+            pass
+        self.assertEqual(self._names('?q=pyr&types=tag')['tags'], [])
+
+    def test_loads_in_background(self):
+        """Test lookups find nothing until the index loaded, without waiting for it"""
+        index = autocomplete.INDEXES['tag']
+        loaded = threading.Event()
+        load = index.load
+
+        def slow_load():
+            loaded.wait(5)
+            return load()
+
+        with mock.patch.object(index, 'load', slow_load):
+            self.assertEqual(self._names('?q=py&types=tag')['tags'], [])
+            loader = index.loader
+            loaded.set()
+            loader.join()
+        self.assertEqual(self._names('?q=py&types=tag')['tags'], ['pytest', 'python'])
+
+    def test_changes_during_load_are_kept(self):
+        """Test changes committed while a copy loads are applied to it"""
+        index = autocomplete.INDEXES['tag']
+        read, resume = threading.Event(), threading.Event()
+        load = index.load
+
+        def slow_load():
+            rows = list(load())
+            read.set()
+            resume.wait(5)
+            return rows
+
+        with mock.patch.object(index, 'load', slow_load):
+            loader = index.refresh()
+            read.wait(5)
+            Tag.objects.create(name='pydantic')
+            self.python.delete()
+            resume.set()
+            loader.join()
+        self.assertEqual(self._names('?q=py&types=tag')['tags'], ['pytest', 'pydantic'])
+
+    def test_failed_reload_is_retried(self):
+        """Test a reload that raises does not stop later reloads, nor keep its connection"""
+        index = autocomplete.INDEXES['tag']
+        self._load()
+        with mock.patch.object(index, 'load', side_effect=RuntimeError), \
+                mock.patch.object(autocomplete.connections, 'close_all') as close_all, \
+                mock.patch.object(threading, 'excepthook'):
+            index.refresh().join()
+        self.assertFalse(index.refreshing)
+        close_all.assert_called_once_with()
+        self.assertEqual(self._names('?q=pyt&types=tag')['tags'], ['pytest', 'python'])
+
+    def test_short_prefixes_are_memoized(self):
+        """Test the top names of long ranges are kept until they change"""
+        Tag.objects.bulk_create(Tag(name=f'tag{i}') for i in range(autocomplete.SCAN_LIMIT + 1))
+        popular = Tag.objects.get(name='tag7')
+        Post.objects.create(title='Post', content='Content', author=self.user).tags.add(popular)
+        self._load()
+        self.assertEqual(self._names('?q=t&types=tag&limit=1')['tags'], ['tag7'])
+        self.assertIn('t', autocomplete.INDEXES['tag'].top)
+        Tag.objects.create(name='tagged')
+        self.assertNotIn('t', autocomplete.INDEXES['tag'].top)
+
+    def test_invalid_parameters(self):
+        """Test missing prefixes and bad parameters are rejected"""
+        for query in ('', '?q=', '?q=py&types=post', '?q=py&types=',
+                '?q=py&limit=0', '?q=py&limit=21', '?q=py&limit=x'):
+            response = self.client.get('/api/v1/autocomplete/' + query)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, query)
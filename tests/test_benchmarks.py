@@ -0,0 +1,99 @@
+"""
+Tests for the SQL instrumentation and the API benchmark command.
+"""
+from io import StringIO
+import json
+import os
+import tempfile
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from core.instrumentation import capture_sql
+from posts.models import Post
+
+
+class CaptureSqlTest(TestCase):
+    """Test cases for capture_sql"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        for i in range(3):
+            Post.objects.create(title=f'Post {i}', content='Test content', author=self.user)
+
+    def test_counts_queries_and_rows(self):
+        """Every statement and every fetched row is counted"""
+        with capture_sql() as stats:
+            list(Post.objects.all())
+            Post.objects.count()
+        self.assertEqual(stats.queries, 2)
+        self.assertEqual(stats.rows, 4)
+        self.assertGreaterEqual(stats.duration, 0)
+
+    def test_nested_captures(self):
+        """An inner capture also counts towards the outer one"""
+        with capture_sql() as outer:
+            Post.objects.first()
+            with capture_sql() as inner:
+                list(Post.objects.all())
+        self.assertEqual(inner.queries, 1)
+        self.assertEqual(outer.queries, 2)
+        self.assertEqual(outer.rows, 4)
+        with capture_sql() as after:
+            pass
+        list(Post.objects.all())
+        self.assertEqual(after.queries, 0)
+
+
+class BenchmarkApiCommandTest(TestCase):
+    """Test cases for the benchmark_api command"""
+
+    def setUp(self):
+        call_command('generate_dataset', posts=50, users=10, groups=2, stdout=StringIO())
+        self.directory = tempfile.TemporaryDirectory()
+        self.baseline = os.path.join(self.directory.name, 'baseline.json')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _run(self, *args):
+        call_command(
+            'benchmark_api', '--requests', '1', '--warmup', '0', '--baseline', self.baseline,
+            *args, stdout=StringIO())
+
+    def test_update_baseline_then_compare(self):
+        """A run within the budgets it just recorded passes"""
+        self._run('--only', 'posts-list,groups-posts,users-overview', '--update-baseline')
+        with open(self.baseline) as baseline_file:
+            endpoints = json.load(baseline_file)['endpoints']
+        self.assertEqual(set(endpoints), {'posts-list', 'groups-posts', 'users-overview'})
+        self.assertEqual(endpoints['posts-list']['budget']['queries'],
+            endpoints['posts-list']['baseline']['queries'])
+        output = os.path.join(self.directory.name, 'results.json')
+        self._run('--only', 'posts-list', '--output', output)
+        with open(output) as output_file:
+            result = json.load(output_file)['endpoints']['posts-list']
+        for metric in ('p50_ms', 'p95_ms', 'queries', 'rows', 'bytes'):
+            self.assertIn(metric, result)
+
+    def test_exceeded_budget_fails(self):
+        """An endpoint issuing more queries than its budget fails the run"""
+        self._run('--only', 'posts-list', '--update-baseline')
+        with open(self.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        baseline['endpoints']['posts-list']['budget']['queries'] -= 1
+        with open(self.baseline, 'w') as baseline_file:
+            json.dump(baseline, baseline_file)
+        with self.assertRaisesMessage(CommandError, 'posts-list: queries'):
+            self._run('--only', 'posts-list')
+
+    def test_every_endpoint_responds(self):
+        """Every endpoint of the suite answers with 200 on a generated dataset"""
+        self._run('--update-baseline')
+        with open(self.baseline) as baseline_file:
+            endpoints = json.load(baseline_file)['endpoints']
+        # the generated dataset has no tags
+        self.assertNotIn('tags-detail', endpoints)
+        self.assertIn('comments-thread', endpoints)
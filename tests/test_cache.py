@@ -0,0 +1,102 @@
+"""
+Anonymous response cache tests for the Reddit clone API
+"""
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from core.cache import bump_version
+from core.checks import check_shared_caches
+from groups.models import Group
+from posts.models import Post
+from posts.services import cast_vote
+from tags.models import Tag
+
+
+class ResponseCacheTest(TestCase):
+    """Test cases for core.cache on posts, groups and tags"""
+
+    def setUp(self):
+        """Set up a post, a group and a tag with an empty cache"""
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.post = Post.objects.create(title='Post', content='Content', author=self.user)
+        self.group = Group.objects.create(name='Group')
+        self.tag = Tag.objects.create(name='Tag')
+        self.detail = f'/api/v1/posts/{self.post.uuid}/'
+
+    def test_hit_skips_database(self):
+        """Test a repeated anonymous request is answered from the cache"""
+        first = self.client.get('/api/v1/posts/')
+        self.assertEqual(first['X-Cache'], 'MISS')
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get('/api/v1/posts/')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(second.data, first.data)
+
+    def test_authenticated_requests_bypass(self):
+        """Test logged in users always get a fresh response"""
+        self.client.force_authenticate(user=self.user)
+        self.client.get('/api/v1/posts/')
+        response = self.client.get('/api/v1/posts/')
+        self.assertFalse(response.has_header('X-Cache'))
+
+    def test_save_invalidates(self):
+        """Test saving a post refreshes its detail and the listings"""
+        self.client.get(self.detail)
+        self.client.get('/api/v1/posts/')
+        self.post.title = 'Renamed'
+        self.post.save()
+        self.assertEqual(self.client.get(self.detail).data['title'], 'Renamed')
+        self.assertEqual(self.client.get('/api/v1/posts/').data['results'][0]['title'], 'Renamed')
+
+    def test_vote_invalidates(self):
+        """Test a vote refreshes the cached score"""
+        self.client.get(self.detail)
+        cast_vote(self.post, self.user, 1)
+        self.assertEqual(self.client.get(self.detail).data['votes'], 1)
+
+    def test_stale_while_revalidate(self):
+        """Test a stale entry is served while another request rebuilds it"""
+        self.client.get('/api/v1/posts/')
+        bump_version('posts')
+        with mock.patch.object(caches['default'], 'add', return_value=False):
+            response = self.client.get('/api/v1/posts/')
+        self.assertEqual(response['X-Cache'], 'STALE')
+        self.assertEqual(self.client.get('/api/v1/posts/')['X-Cache'], 'MISS')
+
+    def test_groups_and_tags(self):
+        """Test groups and tags are cached and follow their own saves"""
+        for url in ('/api/v1/groups/', f'/api/v1/groups/{self.group.pk}/', '/api/v1/tags/'):
+            self.client.get(url)
+            self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+        self.tag.name = 'Renamed'
+        self.tag.save()
+        self.assertEqual(self.client.get('/api/v1/tags/')['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get('/api/v1/groups/')['X-Cache'], 'MISS')
+
+
+class SharedCacheCheckTest(SimpleTestCase):
+    """Test cases for the core.E001 system check"""
+
+    LOCMEM = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+    FILES = {'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': '/tmp/reddit-clone-cache'}}
+
+    def test_local_memory_with_several_workers(self):
+        """Test process local response and role caches are refused once several workers run"""
+        with override_settings(WEB_CONCURRENCY=1, CACHES=self.LOCMEM):
+            self.assertEqual(check_shared_caches(None), [])
+        with override_settings(WEB_CONCURRENCY=3, CACHES=self.LOCMEM):
+            self.assertEqual(
+                [error.id for error in check_shared_caches(None)], ['core.E001', 'core.E001'])
+        with override_settings(WEB_CONCURRENCY=3, CACHES=self.FILES):
+            self.assertEqual(check_shared_caches(None), [])
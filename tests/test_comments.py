@@ -0,0 +1,222 @@
+"""
+Comment thread tests for the Reddit clone API
+"""
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from comments.models import PostComment
+from comments.services import rebuild_comment_counters
+from posts.models import Post
+
+
+class PostCommentThreadTest(TestCase):
+    """Test cases for materialized paths and the thread endpoint"""
+
+    def setUp(self):
+        """Set up a post with a small comment tree"""
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.post = Post.objects.create(title='Post', content='Test content', author=self.user)
+        self.url = f'/api/v1/posts/{self.post.uuid}/comments/'
+
+        self.first = self._comment('first')
+        self.reply = self._comment('reply', parent=self.first)
+        self.nested = self._comment('nested', parent=self.reply)
+        self.second = self._comment('second')
+        self.removed = self._comment('removed')
+        self.orphan = self._comment('orphan', parent=self.removed)
+        PostComment.objects.filter(pk=self.removed.pk).update(is_removed=True)
+        self._comment('gone', parent=self.second)
+        PostComment.objects.filter(_comment='gone').update(is_removed=True)
+
+    def _comment(self, text, parent=None):
+        return PostComment.objects.create(
+            post=self.post, user=self.user, _comment=text, parent=parent)
+
+    REMOVED = 'This comment has been removed'
+
+    def _texts(self, nodes):
+        return [(node['comment'], self._texts(node['replies'])) for node in nodes]
+
+    def test_paths(self):
+        """Test paths and depths are set on create"""
+        self.nested.refresh_from_db()
+        self.assertEqual(self.nested.depth, 2)
+        self.assertEqual(
+            self.nested.path.split('/'),
+            [str(pk).zfill(10) for pk in (self.first.pk, self.reply.pk, self.nested.pk)]
+        )
+
+    def test_thread(self):
+        """Test the thread comes back nested, keeping removed comments with replies"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url + 'thread/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self._texts(response.data['results']), [
+            ('first', [('reply', [('nested', [])])]),
+            ('second', []),
+            (self.REMOVED, [('orphan', [])]),
+        ])
+        self.assertFalse(response.data['truncated'])
+        comment_queries = [
+            query for query in queries
+            if query['sql'].startswith('SELECT "comments_postcomment"."id"')]
+        self.assertEqual(len(comment_queries), 1)
+
+    def test_thread_depth_and_limit(self):
+        """Test depth bounds the levels and limit the number of comments"""
+        response = self.client.get(self.url + 'thread/?depth=1')
+        self.assertEqual(
+            [node['comment'] for node in response.data['results']],
+            ['first', 'second', self.REMOVED])
+        response = self.client.get(self.url + 'thread/?limit=2')
+        self.assertEqual(self._texts(response.data['results']), [('first', [('reply', [])])])
+        self.assertTrue(response.data['truncated'])
+        response = self.client.get(self.url + 'thread/?limit=6')
+        self.assertEqual(len(response.data['results']), 3)
+        self.assertFalse(response.data['truncated'])
+
+    def test_subtree(self):
+        """Test parent loads only the replies below a comment"""
+        response = self.client.get(self.url + f'thread/?parent={self.first.pk}')
+        self.assertEqual(self._texts(response.data['results']), [('reply', [('nested', [])])])
+
+    def test_invalid_parameters(self):
+        """Test bad depth values are rejected"""
+        response = self.client.get(self.url + 'thread/?depth=x')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_list_hides_removed_without_replies(self):
+        """Test the top level list keeps removed comments only when they have replies"""
+        response = self.client.get(self.url)
+        self.assertEqual(
+            [comment['comment'] for comment in response.data['results']],
+            ['first', 'second', self.REMOVED])
+        self.assertEqual(response.data['results'][1]['child_count'], 0)
+
+
+class PostCommentCounterTest(TestCase):
+    """Test cases for the stored child_count and score of comments"""
+
+    def setUp(self):
+        """Set up a post with a top level comment created through the API"""
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.post = Post.objects.create(title='Post', content='Test content', author=self.user)
+        self.url = f'/api/v1/posts/{self.post.uuid}/comments/'
+        self.parent = self._create('parent comment')
+
+    def _create(self, text, parent=None):
+        data = {'user': self.user.pk, 'comment': text}
+        if parent is not None:
+            data['parent'] = parent
+        response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data['id']
+
+    def _parent(self):
+        return PostComment.objects.get(pk=self.parent)
+
+    def test_reply_and_remove(self):
+        """Test replies and soft removals move the parent's child_count"""
+        first = self._create('first reply', parent=self.parent)
+        self._create('second reply', parent=self.parent)
+        self.assertEqual(self._parent().child_count, 2)
+        self.client.delete(f'{self.url}{first}/')
+        self.client.delete(f'{self.url}{first}/')
+        self.assertEqual(self._parent().child_count, 1)
+
+    def test_reply_depth_is_bounded(self):
+        """Test replies stop at the depth whose path still fits the column"""
+        parent = self._parent()
+        PostComment.objects.filter(pk=parent.pk).update(depth=PostComment.MAX_DEPTH - 1)
+        reply = PostComment.objects.get(pk=self._create('deepest reply', parent=self.parent))
+        self.assertEqual(reply.depth, PostComment.MAX_DEPTH)
+        self.assertLessEqual(len('/'.join(['0' * PostComment.PATH_STEP] * (reply.depth + 1))), 512)
+
+        response = self.client.post(
+            self.url, {'user': self.user.pk, 'comment': 'too deep', 'parent': reply.pk}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('parent', response.data)
+
+    def test_reply_stays_on_its_post(self):
+        """Test a reply naming a comment of another post as parent is rejected"""
+        other = Post.objects.create(title='Other', content='Test content', author=self.user)
+        response = self.client.post(
+            f'/api/v1/posts/{other.uuid}/comments/',
+            {'user': self.user.pk, 'comment': 'stray reply', 'parent': self.parent}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('parent', response.data)
+        self.assertFalse(PostComment.objects.filter(post=other).exists())
+        self.assertEqual(self._parent().child_count, 0)
+
+    def test_votes(self):
+        """Test the vote actions keep the stored score"""
+        response = self.client.put(f'{self.url}{self.parent}/upvote/')
+        self.assertEqual(response.data['votes'], 1)
+        response = self.client.put(f'{self.url}{self.parent}/downvote/')
+        self.assertEqual(response.data['votes'], -1)
+        self.client.put(f'{self.url}{self.parent}/remove_vote/')
+        self.assertEqual(self._parent().score, 0)
+
+    def test_rebuild_command(self):
+        """Test the repair command recomputes drifted counters"""
+        self._create('reply', parent=self.parent)
+        self.client.put(f'{self.url}{self.parent}/upvote/')
+        PostComment.objects.update(child_count=7, score=-3)
+        call_command('rebuild_comment_counters', stdout=StringIO())
+        parent = self._parent()
+        self.assertEqual((parent.child_count, parent.score), (1, 1))
+
+    def test_rebuild_in_batches(self):
+        """Test rebuilding a subset in batches leaves other comments alone"""
+        replies = [self._create(f'reply {i}', parent=self.parent) for i in range(3)]
+        self._create('nested', parent=replies[0])
+        other = Post.objects.create(title='Other', content='Test content', author=self.user)
+        outside = PostComment.objects.create(post=other, user=self.user, _comment='outside')
+        PostComment.objects.update(child_count=7, score=-3)
+
+        queryset = PostComment.objects.filter(post=self.post)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(rebuild_comment_counters(queryset, batch_size=2), 5)
+        self.assertEqual(self._parent().child_count, 3)
+        self.assertEqual(PostComment.objects.get(pk=replies[0]).child_count, 1)
+        self.assertEqual(PostComment.objects.get(pk=replies[1]).score, 0)
+        outside.refresh_from_db()
+        self.assertEqual((outside.child_count, outside.score), (7, -3))
+        # Three batches of a read, two grouped queries and an update, then the empty read
+        self.assertEqual(len(queries), 13)
+
+    def test_list_reads_stored_counters(self):
+        """Test a page of comments costs no per comment queries"""
+        for i in range(5):
+            self._create(f'comment {i}')
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url)
+        for i in range(5):
+            self._create(f'more {i}')
+        with CaptureQueriesContext(connection) as more_queries:
+            self.client.get(self.url)
+        self.assertEqual(len(queries), len(more_queries))
+
+    def test_mentions(self):
+        """Test mentions are resolved in bulk and unknown users ignored"""
+        others = [User.objects.create_user(username=f'other{i}') for i in range(5)]
+        ids = [other.pk for other in others]
+        data = {'user': self.user.pk, 'comment': 'hello', 'mentioned_users': ids + [9999]}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(sorted(user['id'] for user in response.data['mentioned_users']), ids)
+        data['mentioned_users'] = ids[:1]
+        with CaptureQueriesContext(connection) as fewer_queries:
+            self.client.post(self.url, data, format='json')
+        self.assertEqual(len(queries), len(fewer_queries))
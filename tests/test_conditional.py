@@ -0,0 +1,109 @@
+"""
+Conditional GET tests for the Reddit clone API
+"""
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from bookmarks.models import PostBookmark
+from comments.models import PostComment
+from groups.models import Group, GroupMember, MemberRequest
+from posts.models import Post
+
+
+class ConditionalGetTest(TestCase):
+    """Test cases for ETag and Last-Modified on read endpoints"""
+
+    def setUp(self):
+        """Set up a post with a comment and a logged in client"""
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.post = Post.objects.create(title='Post', content='Content', author=self.user)
+        self.comment = PostComment.objects.create(
+            post=self.post, user=self.user, _comment='comment')
+        self.comments = f'/api/v1/posts/{self.post.uuid}/comments/'
+
+    def _revalidate(self, url, response):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_post_list_not_modified(self):
+        """Test polling an unchanged post list costs no query"""
+        response = self.client.get('/api/v1/posts/')
+        with self.assertNumQueries(0):
+            again = self._revalidate('/api/v1/posts/', response)
+        self.assertEqual(again.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(again.content, b'')
+
+    def test_vote_changes_etag(self):
+        """Test a vote, which leaves updated_at alone, still changes the ETag"""
+        url = f'/api/v1/posts/{self.post.uuid}/'
+        response = self.client.get(url)
+        self.client.put(url + 'upvote/')
+        again = self._revalidate(url, response)
+        self.assertEqual(again.status_code, status.HTTP_200_OK)
+        self.assertEqual(again.data['votes'], 1)
+
+    def test_comment_list(self):
+        """Test comment polls get 304 until a comment is added"""
+        response = self.client.get(self.comments)
+        self.assertEqual(
+            self._revalidate(self.comments, response).status_code,
+            status.HTTP_304_NOT_MODIFIED)
+        PostComment.objects.create(post=self.post, user=self.user, _comment='another')
+        self.assertEqual(
+            self._revalidate(self.comments, response).status_code, status.HTTP_200_OK)
+
+    def test_etag_depends_on_viewer(self):
+        """Test another user never gets a 304 for someone else's payload"""
+        response = self.client.get('/api/v1/posts/')
+        self.client.force_authenticate(user=None)
+        self.assertEqual(
+            self._revalidate('/api/v1/posts/', response).status_code, status.HTTP_200_OK)
+
+    def test_bookmarks_change_etag(self):
+        """Test the viewer's bookmarks, which bump no post version, still change the ETag"""
+        url = f'/api/v1/posts/{self.post.uuid}/'
+        response = self.client.get(url)
+        bookmark = PostBookmark.objects.create(post=self.post, user=self.user)
+        again = self._revalidate(url, response)
+        self.assertEqual(again.status_code, status.HTTP_200_OK)
+        self.assertIsNotNone(again.data['user_bookmark'])
+
+        response = self.client.get('/api/v1/posts/')
+        bookmark.delete()
+        again = self._revalidate('/api/v1/posts/', response)
+        self.assertEqual(again.status_code, status.HTTP_200_OK)
+        self.assertIsNone(again.data['results'][0]['user_bookmark'])
+
+    def test_membership_changes_etag(self):
+        """Test member requests and memberships change the ETag of the viewer"""
+        group = Group.objects.create(name='Private', group_type=Group.Type.PRIVATE)
+        Post.objects.create(title='Hidden', content='Content', author=self.user, group=group)
+        url = f'/api/v1/groups/{group.pk}/'
+        response = self.client.get(url)
+        MemberRequest.objects.create(group=group, user=self.user)
+        self.assertEqual(self._revalidate(url, response).status_code, status.HTTP_200_OK)
+
+        response = self.client.get('/api/v1/posts/')
+        self.assertEqual(response.data['count'], 1)
+        GroupMember.objects.create(group=group, user=self.user)
+        again = self._revalidate('/api/v1/posts/', response)
+        self.assertEqual(again.status_code, status.HTTP_200_OK)
+        self.assertEqual(again.data['count'], 2)
+
+    def test_last_modified_without_versions(self):
+        """Test lists without a cache namespace validate on updated_at and count"""
+        group = Group.objects.create(name='Group')
+        GroupMember.objects.create(group=group, user=self.user)
+        url = f'/api/v1/groups/{group.pk}/members/'
+        response = self.client.get(url)
+        self.assertTrue(response.has_header('Last-Modified'))
+        again = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(again.status_code, status.HTTP_304_NOT_MODIFIED)
+        GroupMember.objects.create(
+            group=group, user=User.objects.create_user(username='other', password='x'))
+        self.assertEqual(self._revalidate(url, response).status_code, status.HTTP_200_OK)
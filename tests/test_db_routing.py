@@ -0,0 +1,196 @@
+"""
+Connection management and read replica routing tests for the Reddit clone API
+"""
+import os
+import sqlite3
+import tempfile
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection, connections, transaction
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.cache import bump_object
+from core.db import ConnectionPool, PoolTimeout, check_connections
+from core.db import routers
+from posts.models import Post
+
+
+class ConnectionPoolTest(SimpleTestCase):
+    """Test cases for the in-process connection pool"""
+
+    def setUp(self):
+        """Set up a pool of two connections to a temporary SQLite file"""
+        handle, self.path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(handle)
+        self.addCleanup(os.remove, self.path)
+        self.pool = ConnectionPool(
+            lambda: sqlite3.connect(self.path, check_same_thread=False), 2, timeout=0.05)
+        self.addCleanup(self.pool.close)
+
+    def test_reuse_and_limit(self):
+        """Test released connections are reused and the size is enforced"""
+        first = self.pool.acquire()
+        second = self.pool.acquire()
+        with self.assertRaises(PoolTimeout):
+            self.pool.acquire()
+        self.pool.release(first)
+        self.assertIs(self.pool.acquire(), first)
+        self.assertEqual(self.pool.opened, 2)
+
+    def test_broken_connections_are_dropped(self):
+        """Test connections failing the rollback or the ping are replaced"""
+        broken = self.pool.acquire()
+        broken.close()
+        self.pool.release(broken)
+        self.assertEqual(self.pool.opened, 0)
+
+        stale = self.pool.acquire()
+        self.pool.release(stale)
+        stale.close()
+        self.pool.check_after = 0
+        fresh = self.pool.acquire()
+        self.assertIsNot(fresh, stale)
+        fresh.execute('SELECT 1')
+        self.assertEqual(self.pool.opened, 1)
+
+
+class ReplicaSetTest(SimpleTestCase):
+    """Test cases for picking replicas"""
+
+    def setUp(self):
+        routers.replicas.reset()
+        self.addCleanup(routers.replicas.reset)
+
+    @override_settings(DATABASE_REPLICAS={'a': 2, 'b': 1, 'c': 0}, REPLICA_MAX_LAG=5)
+    def test_weighted_round_robin(self):
+        """Test replicas are picked in proportion to their weight, skipping lagging ones"""
+        lags = {'a': 0, 'b': 1, 'c': 0}
+        with mock.patch.object(routers, 'replica_lag', side_effect=lambda alias: lags[alias]):
+            self.assertEqual([routers.replicas.choose() for _ in range(6)], ['a', 'b', 'a'] * 2)
+            lags['a'] = 30
+            with self.assertLogs('core.db', 'WARNING'):
+                routers.replicas.check()
+            self.assertEqual([routers.replicas.choose() for _ in range(2)], ['b', 'b'])
+
+    @override_settings(DATABASE_REPLICAS={'a': 1}, REPLICA_CHECK_INTERVAL=0)
+    def test_unusable_replicas_fall_back(self):
+        """Test no replica is picked when none passes its health check"""
+        with mock.patch.object(routers, 'replica_lag', side_effect=OSError), \
+                mock.patch.object(routers, 'connections'), \
+                self.assertLogs('core.db', 'WARNING'):
+            self.assertIsNone(routers.replicas.choose())
+        with mock.patch.object(routers, 'replica_lag', return_value=0):
+            self.assertEqual(routers.replicas.choose(), 'a')
+
+
+# the query threads would keep their connections to the replicas of earlier tests
+@override_settings(
+    DATABASE_REPLICAS={'replica': 1}, DATABASE_ROUTERS=['core.db.routers.ReplicaRouter'],
+    QUERY_THREADS=0)
+class ReplicaRoutingTest(TransactionTestCase):
+    """Test cases for reads from a replica with read-your-writes pinning"""
+
+    def setUp(self):
+        """Set up a replica copied from the primary, then change the primary"""
+        routers.replicas.reset()
+        self.addCleanup(routers.replicas.reset)
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.post = Post.objects.create(title='Replica title', content='Content', author=self.user)
+
+        handle, path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        connection.ensure_connection()
+        replica = sqlite3.connect(path)
+        connection.connection.backup(replica)
+        replica.close()
+        connections.databases['replica'] = dict(connection.settings_dict, NAME=path)
+        self.addCleanup(self._drop_replica)
+        Post.objects.filter(pk=self.post.pk).update(title='Primary title')
+        # the replica has caught up with the writes above
+        cache.clear()
+
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def _drop_replica(self):
+        connections['replica'].close()
+        del connections['replica']
+        del connections.databases['replica']
+
+    def _title(self, client=None, path=''):
+        response = (client or self.client).get(f'/api/v1/posts/{self.post.uuid}/{path}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data['title']
+
+    def test_reads_go_to_replica(self):
+        """Test list and retrieve read from the replica"""
+        self.assertEqual(self._title(), 'Replica title')
+        self.assertEqual(self._title(APIClient()), 'Replica title')
+        response = self.client.get('/api/v1/posts/')
+        self.assertEqual(response.data['results'][0]['title'], 'Replica title')
+
+    def test_per_viewset_actions(self):
+        """Test viewsets can keep actions on the primary"""
+        response = self.client.get('/api/v1/post/self/')
+        self.assertEqual(response.data['results'][0]['title'], 'Primary title')
+
+    def test_writers_read_their_writes(self):
+        """Test a client who wrote reads from the primary for a while"""
+        response = self.client.put(f'/api/v1/posts/{self.post.uuid}/upvote/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn(routers.PIN_COOKIE, response.cookies)
+        # once the replica caught up with the bump, only the writer is pinned
+        cache.clear()
+        self.assertEqual(self._title(), 'Primary title')
+        self.assertEqual(self._title(APIClient()), 'Replica title')
+        with override_settings(REPLICA_PIN_SECONDS=0):
+            self.client.put(f'/api/v1/posts/{self.post.uuid}/remove_vote/')
+        cache.clear()
+        self.assertEqual(self._title(), 'Replica title')
+
+    @override_settings(REPLICA_MAX_LAG=1)
+    def test_lagging_replica_falls_back(self):
+        """Test reads go to the primary while the replica lags"""
+        with mock.patch.object(routers, 'replica_lag', return_value=60), \
+                self.assertLogs('core.db', 'WARNING'):
+            self.assertEqual(self._title(), 'Primary title')
+
+    def test_bumped_namespaces_read_primary(self):
+        """Test reads of a namespace bumped within the replica lag use the primary"""
+        bump_object('posts', self.post.uuid)
+        self.assertEqual(self._title(APIClient()), 'Primary title')
+        response = self.client.get('/api/v1/posts/')
+        self.assertEqual(response.data['results'][0]['title'], 'Primary title')
+        with override_settings(REPLICA_MAX_LAG=0, REPLICA_CHECK_INTERVAL=0):
+            bump_object('posts', self.post.uuid)
+        self.assertEqual(self._title(APIClient()), 'Replica title')
+
+    def test_reads_after_a_write_use_primary(self):
+        """Test reads later in a request that wrote, or in a transaction, use the primary"""
+        token = routers.begin_request()
+        try:
+            routers.use_replicas(mock.Mock(COOKIES={}))
+            self.assertEqual(Post.objects.get(pk=self.post.pk).title, 'Replica title')
+            with transaction.atomic():
+                self.assertEqual(Post.objects.get(pk=self.post.pk).title, 'Primary title')
+            Post.objects.filter(pk=self.post.pk).update(content='Changed')
+            self.assertEqual(Post.objects.get(pk=self.post.pk).title, 'Primary title')
+        finally:
+            routers.end_request(token)
+        self.assertEqual(Post.objects.get(pk=self.post.pk).title, 'Primary title')
+
+    def test_health_checks(self):
+        """Test unusable persistent connections are closed"""
+        replica = connections['replica']
+        replica.ensure_connection()
+        with mock.patch.object(replica, 'is_usable', return_value=True):
+            check_connections()
+        self.assertIsNotNone(replica.connection)
+        with mock.patch.object(replica, 'is_usable', return_value=False):
+            check_connections()
+        self.assertIsNone(replica.connection)
@@ -0,0 +1,141 @@
+"""
+Home feed tests for the Reddit clone API
+"""
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from unittest import mock
+
+from django.db import transaction
+from django.test import TransactionTestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from feeds import services
+from feeds.models import FeedEntry
+from followers.models import UserFollower
+from groups.models import Group, GroupMember
+from posts.models import Post
+
+
+class FeedTest(TransactionTestCase):
+    """Test cases for fan-out-on-write and fan-out-on-read home feeds"""
+
+    def setUp(self):
+        """Set up a reader following an author and belonging to a group"""
+        cache.clear()
+        self.client = APIClient()
+        self.reader = User.objects.create_user(username='reader', password='testpass123')
+        self.author = User.objects.create_user(username='author', password='testpass123')
+        self.other = User.objects.create_user(username='other', password='testpass123')
+        self.group = Group.objects.create(name='Group')
+        UserFollower.objects.create(follower=self.reader, followed_user=self.author)
+        GroupMember.objects.create(group=self.group, user=self.reader)
+        self.client.force_authenticate(user=self.reader)
+
+    def _titles(self, url='/api/v1/feed/'):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [post['title'] for post in response.data['results']], response.data['next']
+
+    def test_fan_out_on_write(self):
+        """Test published posts of followed users and joined groups are pushed"""
+        Post.objects.create(title='Followed', content='Content', author=self.author)
+        Post.objects.create(title='Group', content='Content', author=self.other, group=self.group)
+        Post.objects.create(title='Unrelated', content='Content', author=self.other)
+        draft = Post.objects.create(
+            title='Draft', content='Content', author=self.author, status=Post.STATUS.DRAFT)
+        self.assertEqual(FeedEntry.objects.filter(user=self.reader).count(), 2)
+        draft.status = Post.STATUS.PUBLIC
+        draft.save()
+        titles, _ = self._titles()
+        self.assertEqual(titles, ['Draft', 'Group', 'Followed'])
+
+    def test_fan_out_after_commit(self):
+        """Test posts are pushed once the transaction creating them commits"""
+        with transaction.atomic():
+            Post.objects.create(title='Followed', content='Content', author=self.author)
+            self.assertFalse(FeedEntry.objects.filter(user=self.reader).exists())
+        self.assertEqual(self._titles()[0], ['Followed'])
+
+    def test_fan_out_on_read_merges(self):
+        """Test authors above the push limit are merged in when the feed is read"""
+        with override_settings(FEED_PUSH_MAX_FOLLOWERS=0):
+            cache.clear()
+            for i in range(8):
+                Post.objects.create(title=f'Pulled {i}', content='Content', author=self.author)
+                Post.objects.create(
+                    title=f'Pushed {i}', content='Content', author=self.other, group=self.group)
+            self.assertFalse(FeedEntry.objects.filter(post__author=self.author).exists())
+            with mock.patch.object(services, '_source_items', wraps=services._source_items) as pulled:
+                titles, next_link = self._titles()
+            more, last = self._titles(next_link)
+        self.assertEqual(len(titles), 12)
+        self.assertEqual(len(set(titles + more)), 16)
+        self.assertEqual(titles[:2], ['Pushed 7', 'Pulled 7'])
+        self.assertIsNone(last)
+        self.assertEqual(pulled.call_count, 1)
+
+    def test_pulled_sources_are_merged(self):
+        """Test every author and group fanned out on read is queried on its own and merged once"""
+        with override_settings(FEED_PUSH_MAX_FOLLOWERS=0, FEED_PUSH_MAX_MEMBERS=0):
+            cache.clear()
+            Post.objects.create(title='Author', content='Content', author=self.author)
+            Post.objects.create(title='Other', content='Content', author=self.other)
+            Post.objects.create(
+                title='Group', content='Content', author=self.reader, group=self.group)
+            # backfilled while still pushed, then pulled as well
+            UserFollower.objects.create(follower=self.reader, followed_user=self.other)
+            cache.clear()
+            with mock.patch.object(services, '_source_items', wraps=services._source_items) as pulled:
+                titles, _ = self._titles()
+        self.assertEqual(titles, ['Group', 'Other', 'Author'])
+        self.assertEqual(pulled.call_count, 3)
+
+    @override_settings(FEED_MAX_ENTRIES=3)
+    def test_feeds_are_capped(self):
+        """Test stored feeds keep only the newest entries"""
+        for i in range(5):
+            Post.objects.create(title=f'Post {i}', content='Content', author=self.author)
+        entries = FeedEntry.objects.filter(user=self.reader).order_by('-published_at')
+        self.assertEqual([entry.post.title for entry in entries], ['Post 4', 'Post 3', 'Post 2'])
+
+    def test_follow_writes_after_commit(self):
+        """Test backfills and removals of feed entries wait for the follow to commit"""
+        Post.objects.create(title='Other', content='Content', author=self.other)
+        with transaction.atomic():
+            follow = UserFollower.objects.create(follower=self.reader, followed_user=self.other)
+            self.assertFalse(FeedEntry.objects.filter(post__author=self.other).exists())
+        self.assertTrue(FeedEntry.objects.filter(post__author=self.other).exists())
+        with transaction.atomic():
+            follow.delete()
+            self.assertTrue(FeedEntry.objects.filter(post__author=self.other).exists())
+        self.assertFalse(FeedEntry.objects.filter(post__author=self.other).exists())
+
+    def test_follow_changes(self):
+        """Test following backfills and unfollowing removes posts"""
+        Post.objects.create(title='Other', content='Content', author=self.other)
+        follow = UserFollower.objects.create(follower=self.reader, followed_user=self.other)
+        self.assertEqual(self._titles()[0], ['Other'])
+        follow.delete()
+        self.assertEqual(self._titles()[0], [])
+
+    def test_unfollow_keeps_group_posts(self):
+        """Test unfollowing keeps the author's posts still received through a joined group"""
+        Post.objects.create(title='Group', content='Content', author=self.author, group=self.group)
+        Post.objects.create(title='Followed', content='Content', author=self.author)
+        UserFollower.objects.filter(follower=self.reader, followed_user=self.author).delete()
+        self.assertEqual(self._titles()[0], ['Group'])
+        GroupMember.objects.filter(group=self.group, user=self.reader).delete()
+        self.assertEqual(self._titles()[0], [])
+
+    def test_leaving_keeps_followed_posts(self):
+        """Test leaving a group keeps the posts of authors still followed"""
+        Post.objects.create(title='Group', content='Content', author=self.author, group=self.group)
+        Post.objects.create(title='Member', content='Content', author=self.other, group=self.group)
+        GroupMember.objects.filter(group=self.group, user=self.reader).delete()
+        self.assertEqual(self._titles()[0], ['Group'])
+
+    def test_invalid_cursor(self):
+        """Test a malformed cursor is rejected"""
+        response = self.client.get('/api/v1/feed/?cursor=nope')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,91 @@
+"""
+Group feed tests for the Reddit clone API
+"""
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from comments.models import PostComment
+from groups.models import Group, GroupMember
+from posts.models import Post
+
+
+class GroupFeedTest(TestCase):
+    """Test cases for the posts action of groups and PRIVATE visibility"""
+
+    def setUp(self):
+        """Set up a public and a private group with posts and a draft"""
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.group = Group.objects.create(name='Public')
+        self.private = Group.objects.create(name='Private', group_type=Group.Type.PRIVATE)
+        for i in range(15):
+            Post.objects.create(
+                title=f'Post {i}', content='Content', author=self.user,
+                group=self.group, score=i)
+        Post.objects.create(
+            title='Draft', content='Content', author=self.user,
+            group=self.group, status=Post.STATUS.DRAFT)
+        self.secret = Post.objects.create(
+            title='Secret', content='Content', author=self.user, group=self.private)
+        self.feed = f'/api/v1/groups/{self.group.pk}/posts/'
+
+    def test_feed_is_paginated(self):
+        """Test the feed walks every published post once with a cursor"""
+        response = self.client.get(self.feed)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        titles = [post['title'] for post in response.data['results']]
+        self.assertEqual(len(titles), 12)
+        response = self.client.get(response.data['next'])
+        titles += [post['title'] for post in response.data['results']]
+        self.assertIsNone(response.data['next'])
+        self.assertEqual(len(set(titles)), 15)
+        self.assertNotIn('Draft', titles)
+
+    def test_feed_sorting(self):
+        """Test the feed supports the ranking modes of the front page"""
+        response = self.client.get(self.feed + '?sort=top')
+        self.assertEqual(response.data['results'][0]['title'], 'Post 14')
+        response = self.client.get(self.feed + '?sort=sideways')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_private_group(self):
+        """Test only members see a PRIVATE group's feed and posts"""
+        feed = f'/api/v1/groups/{self.private.pk}/posts/'
+        self.assertEqual(self.client.get(feed).status_code, status.HTTP_403_FORBIDDEN)
+        self.client.force_authenticate(user=self.user)
+        self.assertEqual(self.client.get(feed).status_code, status.HTTP_403_FORBIDDEN)
+        titles = [post['title'] for post in self.client.get('/api/v1/posts/?page_size=50').data['results']]
+        self.assertNotIn('Secret', titles)
+
+        GroupMember.objects.create(group=self.private, user=self.user)
+        response = self.client.get(feed)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['title'], 'Secret')
+        response = self.client.get('/api/v1/posts/')
+        self.assertIn('Secret', [post['title'] for post in response.data['results']])
+
+    def test_private_group_comments(self):
+        """Test only members see the comments of a PRIVATE group's posts"""
+        comment = PostComment.objects.create(post=self.secret, user=self.user, _comment='Hidden')
+        comments = f'/api/v1/posts/{self.secret.uuid}/comments/'
+        urls = (comments, comments + 'thread/', f'{comments}{comment.pk}/')
+        outsider = User.objects.create_user(username='outsider', password='testpass123')
+        self.client.force_authenticate(user=outsider)
+        for url in urls:
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+        public = Post.objects.filter(group=self.group).first()
+        response = self.client.get(f'/api/v1/posts/{public.uuid}/comments/thread/')
+        self.assertEqual((response.status_code, response.data['results']), (status.HTTP_200_OK, []))
+        response = self.client.post(
+            comments, {'user': outsider.pk, 'comment': 'Let me in'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        GroupMember.objects.create(group=self.private, user=outsider)
+        for url in urls:
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+        response = self.client.get(comments + 'thread/')
+        self.assertEqual(response.data['results'][0]['comment'], 'Hidden')
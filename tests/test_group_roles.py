@@ -0,0 +1,104 @@
+"""
+Group role tests for the Reddit clone API
+"""
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from groups.models import Group, GroupMember, MemberRequest
+from groups.roles import get_role, get_roles, has_group_capability
+
+
+class GroupRoleTest(TestCase):
+    """Test cases for groups.roles and the group permissions built on it"""
+
+    def setUp(self):
+        """Set up a group with an admin, a moderator and a member"""
+        cache.clear()
+        self.client = APIClient()
+        self.group = Group.objects.create(name='Group')
+        self.users = {}
+        for member_type in GroupMember.MemberTypes.values:
+            user = User.objects.create_user(username=member_type.lower(), password='x')
+            GroupMember.objects.create(group=self.group, user=user, member_type=member_type)
+            self.users[member_type] = user
+        self.outsider = User.objects.create_user(username='outsider', password='x')
+
+    def test_capabilities(self):
+        """Test capabilities follow the member type"""
+        admin = get_role(self.users['ADMIN'], self.group.pk)
+        moderator = get_role(self.users['MODERATOR'], self.group.pk)
+        member = get_role(self.users['MEMBER'], self.group.pk)
+        self.assertTrue(admin.can('delete_groups'))
+        self.assertTrue(moderator.can('edit_groups'))
+        self.assertFalse(moderator.can('delete_groups'))
+        self.assertFalse(member.can('edit_groups'))
+        self.assertIsNone(get_role(self.outsider, self.group.pk))
+
+    def test_cached_across_requests(self):
+        """Test a resolved role, or the lack of one, is not queried again"""
+        get_role(self.users['ADMIN'], self.group.pk)
+        get_role(self.outsider, self.group.pk)
+        with self.assertNumQueries(0):
+            self.assertTrue(get_role(self.users['ADMIN'], self.group.pk).can('delete_groups'))
+            self.assertIsNone(get_role(self.outsider, self.group.pk))
+
+    def test_member_changes_invalidate(self):
+        """Test saving or deleting a member drops the cached role"""
+        user = self.users['MODERATOR']
+        get_role(user, self.group.pk)
+        member = GroupMember.objects.get(group=self.group, user=user)
+        member.status = GroupMember.Status.BANNED
+        member.save()
+        self.assertFalse(get_role(user, self.group.pk).can('edit_groups'))
+        member.delete()
+        self.assertIsNone(get_role(user, self.group.pk))
+
+    def test_bulk_roles(self):
+        """Test roles for many groups are loaded with one query"""
+        other = Group.objects.create(name='Other')
+        user = self.users['ADMIN']
+        with self.assertNumQueries(1):
+            roles = get_roles(user, [self.group.pk, other.pk])
+        self.assertEqual(roles[self.group.pk].member_type, 'ADMIN')
+        self.assertIsNone(roles[other.pk])
+
+    def test_permission_checks_use_the_cache(self):
+        """Test capability checks are served from the shared cache, which demotions drop"""
+        admin = self.users['ADMIN']
+        get_role(admin, self.group.pk)
+        with self.assertNumQueries(0):
+            self.assertTrue(has_group_capability(admin, self.group.pk, 'delete_groups'))
+        member = GroupMember.objects.get(group=self.group, user=admin)
+        member.status = GroupMember.Status.BANNED
+        member.save()
+        self.client.force_authenticate(user=admin)
+        url = f'/api/v1/groups/{self.group.pk}/'
+        self.assertEqual(self.client.delete(url).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_member_requests(self):
+        """Test requests to PUBLIC groups are approved and join, others wait"""
+        request = MemberRequest.objects.create(group=self.group, user=self.outsider)
+        self.assertTrue(request.is_approved)
+        request.refresh_from_db()
+        self.assertTrue(request.is_approved)
+        self.assertEqual(get_role(self.outsider, self.group.pk).member_type, 'MEMBER')
+
+        private = Group.objects.create(name='Private', group_type=Group.Type.PRIVATE)
+        request = MemberRequest.objects.create(group=private, user=self.outsider)
+        request.refresh_from_db()
+        self.assertFalse(request.is_approved)
+        self.assertIsNone(get_role(self.outsider, private.pk))
+
+    def test_permissions(self):
+        """Test only admins may delete and members may not edit"""
+        url = f'/api/v1/groups/{self.group.pk}/'
+        self.client.force_authenticate(user=self.users['MEMBER'])
+        self.assertEqual(self.client.delete(url).status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.client.get(url + 'add_topic/').status_code, status.HTTP_403_FORBIDDEN)
+        self.client.force_authenticate(user=self.users['MODERATOR'])
+        self.assertEqual(self.client.get(url + 'add_topic/').status_code, status.HTTP_200_OK)
+        response = self.client.get(url)
+        self.assertEqual(response.data['role']['capabilities'], ['add_members', 'edit_groups'])
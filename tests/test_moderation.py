@@ -0,0 +1,123 @@
+"""
+Moderation queue tests for the Reddit clone API
+"""
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import OutboxMessage
+from posts.models import Post
+from reports.models import PostReport, ReportCount, ReportTarget, ReportType, UserProfileReport
+
+
+class ModerationQueueTest(TestCase):
+    """Test cases for the report rollups and the moderation endpoints"""
+
+    def setUp(self):
+        """Set up a moderator and posts with different numbers of reports"""
+        self.client = APIClient()
+        self.moderator = User.objects.create_user(username='moderator', is_staff=True)
+        self.client.force_authenticate(user=self.moderator)
+        self.reporter = User.objects.create_user(username='reporter', email='reporter@example.com')
+        self.spam = ReportType.objects.create(title='Spam')
+        self.abuse = ReportType.objects.create(title='Abuse')
+        self.quiet = Post.objects.create(title='Quiet', content='Content', author=self.reporter)
+        self.busy = Post.objects.create(title='Busy', content='Content', author=self.reporter)
+        self._report(self.busy, self.spam)
+        self._report(self.quiet, self.spam)
+        self._report(self.busy, self.abuse)
+
+    def _report(self, post, report_type=None):
+        return PostReport.objects.create(reporter=self.reporter, post=post, report_type=report_type)
+
+    def _queue(self, query=''):
+        response = self.client.get('/api/v1/moderation/' + query)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data['results']
+
+    def _transition(self, data):
+        return self.client.post('/api/v1/moderation/transition/', data, format='json')
+
+    def _rollups(self):
+        return set(ReportCount.objects.filter(count__gt=0).values_list(
+            'target__kind', 'target__target_id', 'report_type_id', 'status', 'count'))
+
+    def test_queue(self):
+        """Test targets are ordered by open reports with counts per type"""
+        queue = self._queue()
+        self.assertEqual([target['target']['title'] for target in queue], ['Busy', 'Quiet'])
+        self.assertEqual(queue[0]['open_reports'], 2)
+        self.assertEqual(
+            sorted((count['report_type'], count['count']) for count in queue[0]['counts']),
+            [('Abuse', 1), ('Spam', 1)])
+
+        UserProfileReport.objects.create(reporter=self.moderator, reported_user=self.reporter)
+        queue = self._queue('?kind=user')
+        self.assertEqual(queue[0]['target'], {'username': 'reporter'})
+        self.assertEqual(queue[0]['counts'], [{'report_type': None, 'status': 'INITIATED', 'count': 1}])
+
+    def test_staff_only(self):
+        """Test the queue and transitions are hidden from other users"""
+        self.client.force_authenticate(user=self.reporter)
+        self.assertEqual(self.client.get('/api/v1/moderation/').status_code, status.HTTP_403_FORBIDDEN)
+        response = self._transition({'status': 'REJECTED', 'targets': [self.busy.pk]})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_rollups_follow_saves(self):
+        """Test saves and deletes move the counts, the same as a rebuild"""
+        report = self._report(self.quiet)
+        report.status = PostReport.STATUS.VERIFIED
+        report.save()
+        report.status = PostReport.STATUS.RESOLVED
+        report.report_type = self.abuse
+        report.save()
+        PostReport.objects.filter(post=self.busy, report_type=self.abuse).get().delete()
+        self.assertEqual([target['open_reports'] for target in self._queue()], [1, 1])
+
+        rollups = self._rollups()
+        call_command('rebuild_report_rollups', stdout=StringIO())
+        self.assertEqual(self._rollups(), rollups)
+        self.assertIn((ReportTarget.Kind.POST, self.quiet.pk, self.abuse.pk, 'RESOLVED', 1), rollups)
+
+    def test_bulk_transition(self):
+        """Test hundreds of reports move with one UPDATE and mail their reporters"""
+        PostReport.objects.bulk_create(
+            PostReport(reporter=self.reporter, post=self.quiet) for _ in range(300))
+        call_command('rebuild_report_rollups', stdout=StringIO())
+        with CaptureQueriesContext(connection) as queries:
+            response = self._transition({'status': 'VERIFIED', 'targets': [self.quiet.pk]})
+        self.assertEqual(response.data['moved'], 301)
+        updates = [query for query in queries
+            if query['sql'].startswith('UPDATE "reports_postreport"')]
+        self.assertEqual(len(updates), 1)
+        self.assertLess(len(queries), 20)
+        self.assertEqual(OutboxMessage.objects.filter(template_name='report_progress_mail.html').count(), 301)
+
+        rollups = self._rollups()
+        call_command('rebuild_report_rollups', stdout=StringIO())
+        self.assertEqual(self._rollups(), rollups)
+
+        busy = PostReport.objects.filter(post=self.busy).values_list('id', flat=True)
+        response = self._transition({'status': 'RESOLVED', 'reports': list(busy)})
+        self.assertEqual(response.data['moved'], 0)
+        response = self._transition({'status': 'REJECTED', 'reports': list(busy)})
+        self.assertEqual(response.data['moved'], 2)
+        self.assertEqual([target['target']['title'] for target in self._queue()], ['Quiet'])
+
+    def test_invalid_parameters(self):
+        """Test bad kinds, statuses and ids are rejected"""
+        response = self.client.get('/api/v1/moderation/?kind=comment')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        for data in ({'status': 'INITIATED', 'targets': [1]},
+                {'status': 'VERIFIED'},
+                {'status': 'VERIFIED', 'targets': [1], 'reports': [1]},
+                {'status': 'VERIFIED', 'targets': 'x'},
+                {'status': 'VERIFIED', 'targets': [1], 'kind': 'comment'}):
+            response = self._transition(data)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, data)
@@ -0,0 +1,135 @@
+"""
+Mail outbox tests for the Reddit clone API
+"""
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import OutboxMessage
+from core import outbox
+from core.outbox import claim_messages, enqueue_mail, send_outbox
+from posts.models import Post
+from reports.models import PostReport
+
+from tests.smtp import SMTPStandIn
+
+
+class OutboxTest(TestCase):
+    """Test cases for queueing report mail and the outbox worker"""
+
+    def setUp(self):
+        """Set up a reporter and a post to report"""
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser', password='testpass123', email='testuser@example.com')
+        self.client.force_authenticate(user=self.user)
+        self.post = Post.objects.create(title='Post', content='Test content', author=self.user)
+
+    def _report(self):
+        response = self.client.post(
+            f'/api/v1/posts/{self.post.uuid}/reports/',
+            {'reporter': self.user.pk, 'url': 'https://example.com/spam'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return PostReport.objects.get(pk=response.data['id'])
+
+    def _queue(self, count, recipient='admin@example.com'):
+        for i in range(count):
+            enqueue_mail(f'test:{recipient}:{i}', 'Subject', 'report_initiated_mail.html',
+                recipient, {'title': f'Title {i}'})
+
+    def test_report_queues_mail_without_sending(self):
+        """Test creating a report only writes an outbox row"""
+        with SMTPStandIn() as smtp, self.settings(**smtp.settings()):
+            report = self._report()
+            self.assertEqual(smtp.connections, 0)
+        message = OutboxMessage.objects.get()
+        self.assertEqual(message.key, f'postreport:{report.pk}:INITIATED')
+        self.assertEqual(message.context['title'], 'Post')
+        self.assertIsNone(message.sent_at)
+
+    def test_status_changes_are_queued_once(self):
+        """Test verified reports mail the reporter and saves are deduplicated"""
+        report = self._report()
+        report.save()
+        report.status = PostReport.STATUS.VERIFIED
+        report.save()
+        report.save()
+        report.status = PostReport.STATUS.RESOLVED
+        report.save()
+        self.assertEqual(
+            list(OutboxMessage.objects.values_list('template_name', 'recipients')),
+            [('report_initiated_mail.html', ['admin@gmail.com']),
+             ('report_progress_mail.html', ['testuser@example.com'])])
+
+    def test_rolled_back_report_queues_nothing(self):
+        """Test the outbox row shares the transaction of the report"""
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            PostReport.objects.create(reporter=self.user, post=self.post)
+            raise RuntimeError
+        self.assertFalse(OutboxMessage.objects.exists())
+
+    def test_worker_sends_over_one_connection(self):
+        """Test a batch is sent over a single SMTP session"""
+        self._report()
+        self._queue(3)
+        with SMTPStandIn() as smtp, self.settings(**smtp.settings()):
+            out = StringIO()
+            call_command('run_outbox_worker', stdout=out)
+            self.assertEqual(smtp.connections, 1)
+            self.assertEqual(len(smtp.messages), 4)
+            self.assertIn('Sent 4 messages, 0 failed', out.getvalue())
+            self.assertIn('reported', smtp.messages[0][2])
+            self.assertEqual(send_outbox(), (0, 0))
+        self.assertFalse(OutboxMessage.objects.filter(sent_at=None).exists())
+
+    @override_settings(OUTBOX_RETRY_DELAY=60, OUTBOX_MAX_ATTEMPTS=2)
+    def test_failures_back_off(self):
+        """Test refused and unreachable mail is retried later, then given up"""
+        self._queue(1, recipient='gone@example.com')
+        self._queue(2)
+        with SMTPStandIn(refused=['gone@example.com']) as smtp, self.settings(**smtp.settings()):
+            self.assertEqual(send_outbox(), (2, 1))
+        failed = OutboxMessage.objects.get(sent_at=None)
+        self.assertEqual(failed.attempts, 1)
+        self.assertIn('SMTPRecipientsRefused', failed.last_error)
+        self.assertGreater(failed.next_attempt_at, timezone.now() + timedelta(seconds=50))
+
+        OutboxMessage.objects.update(next_attempt_at=timezone.now())
+        with SMTPStandIn() as smtp:
+            unreachable = smtp.settings()
+        with self.settings(**unreachable):
+            self.assertEqual(send_outbox(), (0, 1))
+        failed.refresh_from_db()
+        self.assertEqual(failed.attempts, 2)
+        OutboxMessage.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(send_outbox(), (0, 0))
+
+    def test_claimed_messages_are_skipped(self):
+        """Test a batch claimed by one worker is not sent by another until its lease ends"""
+        self._queue(2)
+        self.assertEqual(len(claim_messages(1)), 1)
+        with SMTPStandIn() as smtp, self.settings(**smtp.settings()):
+            self.assertEqual(send_outbox(), (1, 0))
+            self.assertEqual(send_outbox(), (0, 0))
+            OutboxMessage.objects.filter(sent_at=None).update(next_attempt_at=timezone.now())
+            self.assertEqual(send_outbox(), (1, 0))
+        self.assertEqual(
+            list(OutboxMessage.objects.values_list('attempts', flat=True)), [2, 1])
+
+    def test_results_are_stored_per_message(self):
+        """Test messages sent before a worker dies stay sent"""
+        self._queue(3)
+        with SMTPStandIn() as smtp, self.settings(**smtp.settings()), \
+                mock.patch.object(outbox, 'mail', side_effect=[None, SystemExit]), \
+                self.assertRaises(SystemExit):
+            send_outbox()
+        self.assertEqual(OutboxMessage.objects.exclude(sent_at=None).count(), 1)
+        self.assertEqual(send_outbox(), (0, 0))
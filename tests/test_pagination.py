@@ -0,0 +1,88 @@
+"""
+Cursor pagination tests for the Reddit clone API
+"""
+from base64 import urlsafe_b64encode
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from posts.models import Post
+
+
+class PostCursorPaginationTest(TestCase):
+    """Test cases for ?cursor= on the post list"""
+
+    def setUp(self):
+        """Set up 30 posts, several sharing the same score"""
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        for i in range(30):
+            Post.objects.create(title=f'Post {i}', content='Test content', author=self.user)
+        for post in Post.objects.all():
+            Post.objects.filter(pk=post.pk).update(score=post.pk % 4)
+
+    def _walk(self, url):
+        titles = []
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            titles += [post['title'] for post in response.data['results']]
+            pages.append(response.data)
+            url = response.data['next']
+        return titles, pages
+
+    def test_walks_every_post_once(self):
+        """Test following next links visits each post once, newest first"""
+        titles, pages = self._walk('/api/v1/posts/?cursor=')
+        self.assertEqual(len(pages), 3)
+        self.assertEqual(titles, [f'Post {i}' for i in reversed(range(30))])
+        self.assertIsNone(pages[0]['previous'])
+
+    def test_previous_link(self):
+        """Test the previous link returns the page before"""
+        first = self.client.get('/api/v1/posts/?cursor=').data
+        second = self.client.get(first['next']).data
+        back = self.client.get(second['previous']).data
+        self.assertEqual(
+            [post['uuid'] for post in back['results']],
+            [post['uuid'] for post in first['results']]
+        )
+        self.assertIsNone(back['previous'])
+
+    def test_ranked_feed_with_ties(self):
+        """Test the (rank, id) key handles many posts with the same rank"""
+        titles, pages = self._walk('/api/v1/posts/?sort=top&cursor=')
+        self.assertEqual(len(set(titles)), 30)
+        expected = Post.objects.order_by('-score', '-id').values_list('title', flat=True)
+        self.assertEqual(titles, list(expected))
+
+    def test_skips_count_query(self):
+        """Test cursor pages never run COUNT(*)"""
+        first = self.client.get('/api/v1/posts/?cursor=').data
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(first['next'])
+        self.assertFalse(any('COUNT(*)' in query['sql'] for query in queries))
+
+    def test_invalid_cursor(self):
+        """Test a tampered cursor is rejected"""
+        response = self.client.get('/api/v1/posts/?cursor=bm90LWpzb24')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_cursor_values_are_checked(self):
+        """Test cursor values that do not fit the ordering fields are rejected"""
+        for payload in (b'{"p":["garbage",1]}', b'{"p":["2020-01-01T00:00:00",1e400]}',
+                        b'{"p":[null,1]}'):
+            cursor = urlsafe_b64encode(payload).decode('ascii')
+            response = self.client.get(f'/api/v1/posts/?cursor={cursor}')
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_page_number_pagination_is_default(self):
+        """Test clients that do not send a cursor keep the page numbers"""
+        response = self.client.get('/api/v1/posts/?page=2')
+        self.assertEqual(response.data['count'], 30)
@@ -0,0 +1,129 @@
+"""
+Profile activity tests for the Reddit clone API
+"""
+from base64 import urlsafe_b64encode
+import json
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from bookmarks.models import PostBookmark
+from comments.models import PostComment, PostCommentVote
+from groups.models import Group, GroupMember
+from posts.models import Post, PostVote
+
+
+class ProfileActivityTest(TestCase):
+    """Test cases for the paginated activity actions of profiles"""
+
+    def setUp(self):
+        """Set up a user with more posts, comments, votes and bookmarks than fit on a page"""
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.author = User.objects.create_user(username='author', password='testpass123')
+        group = Group.objects.create(name='Group')
+        self.client.force_authenticate(user=self.user)
+        self.url = '/api/v1/users/testuser/'
+        for i in range(30):
+            post = Post.objects.create(
+                title=f'Post {i}', content='Content', author=self.author, group=group)
+            comment = PostComment.objects.create(post=post, user=self.user, _comment=f'Comment {i}')
+            PostVote.objects.create(post=post, user=self.user, vote=1)
+            PostCommentVote.objects.create(post_comment=comment, user=self.author, vote=1)
+            PostCommentVote.objects.create(
+                post_comment=PostComment.objects.create(post=post, user=self.author, _comment='x'),
+                user=self.user, vote=-1)
+            PostBookmark.objects.create(post=post, user=self.user)
+
+    def _walk(self, url, key='results', next_key='next'):
+        seen = []
+        while url is not None:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            seen += response.data[key] if key else []
+            url = response.data[next_key]
+        return seen
+
+    def test_comments_are_paginated(self):
+        """Test comments come in cursor pages with a fixed number of queries"""
+        # the user, the viewer's memberships, the count and the page
+        with self.assertNumQueries(4):
+            response = self.client.get(self.url + 'user_comments/')
+        self.assertEqual(len(response.data['results']), 24)
+        self.assertEqual(response.data['results'][0]['comment'], 'Comment 29')
+        self.assertEqual(len(self._walk(self.url + 'user_comments/')), 30)
+
+    def test_bookmarks_query_count(self):
+        """Test bookmarks load their posts with authors and groups in one query"""
+        with self.assertNumQueries(4):
+            response = self.client.get(self.url + 'bookmarks/')
+        self.assertEqual(response.data['results'][0]['post']['title'], 'Post 29')
+
+    def test_votes(self):
+        """Test votes on posts and comments are paginated separately"""
+        with self.assertNumQueries(4):
+            response = self.client.get(self.url + 'user_upvotes/')
+        self.assertEqual(len(response.data['posts']['results']), 24)
+        self.assertEqual(response.data['posts']['results'][0]['post']['title'], 'Post 29')
+        self.assertEqual(response.data['comments']['results'], [])
+        response = self.client.get(self.url + 'user_downvotes/')
+        self.assertEqual(len(response.data['comments']['results']), 24)
+        self.assertIn('comments_cursor=', response.data['comments']['next'])
+
+    def test_overview_cursor_out_of_range(self):
+        """Test an overview cursor with an id no database accepts is rejected"""
+        cursor = urlsafe_b64encode(
+            json.dumps(['2020-01-01T00:00:00+00:00', 0, 10 ** 30]).encode('ascii')).decode('ascii')
+        response = self.client.get(self.url + f'overview/?cursor={cursor}')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_overview(self):
+        """Test the overview merges comments and votes newest first without repeats"""
+        response = self.client.get(self.url + 'overview/')
+        items = response.data['results']
+        self.assertEqual(len(items), 24)
+        self.assertEqual(
+            [item['type'] for item in items[:3]], ['comment_vote', 'post_vote', 'comment'])
+        dates = [item['created_at'] for item in items]
+        self.assertEqual(dates, sorted(dates, reverse=True))
+
+        url, seen = self.url + 'overview/', []
+        while url is not None:
+            response = self.client.get(url)
+            seen += [(item['type'], item['data']['id']) for item in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(len(seen), 90)
+        self.assertEqual(len(set(seen)), 90)
+
+    def test_private_group_activity(self):
+        """Test activity in PRIVATE groups is shown to members only"""
+        secret = Group.objects.create(name='Secret', group_type=Group.Type.PRIVATE)
+        GroupMember.objects.create(group=secret, user=self.user)
+        post = Post.objects.create(
+            title='Secret', content='Content', author=self.user, group=secret)
+        comment = PostComment.objects.create(post=post, user=self.user, _comment='Secret')
+        PostVote.objects.create(post=post, user=self.user, vote=1)
+        PostCommentVote.objects.create(post_comment=comment, user=self.user, vote=1)
+        PostBookmark.objects.create(post=post, user=self.user)
+
+        def shown(client):
+            comments = client.get(self.url + 'user_comments/').data['results']
+            upvotes = client.get(self.url + 'user_upvotes/').data
+            bookmarks = client.get(self.url + 'bookmarks/').data['results']
+            overview = client.get(self.url + 'overview/').data['results']
+            return [
+                comments[0]['comment'] == 'Secret',
+                upvotes['posts']['results'][0]['post']['title'] == 'Secret',
+                len(upvotes['comments']['results']) == 1,
+                bookmarks[0]['post']['title'] == 'Secret',
+                [item['type'] for item in overview[:4]].count('post') == 1,
+            ]
+
+        self.assertEqual(shown(self.client), [True] * 5)
+        outsider = APIClient()
+        outsider.force_authenticate(user=self.author)
+        self.assertEqual(shown(outsider), [False] * 5)
@@ -0,0 +1,120 @@
+"""
+Query count tests for the Reddit clone API. A failure here usually means
+a serializer started issuing queries per row again.
+"""
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from bookmarks.models import PostBookmark
+from comments.models import PostComment
+from groups.models import Group, GroupMember, MemberRequest
+from posts.models import Post, PostVote
+from tags.models import Tag, TagType
+
+
+class PostListQueryCountTest(TestCase):
+    """Test cases pinning the number of queries per post page"""
+
+    def setUp(self):
+        """Set up a full page of posts with comments, votes and bookmarks"""
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.group = Group.objects.create(name='testgroup', description='A test group')
+        tag_type = TagType.objects.create(title='topic')
+        tag = Tag.objects.create(name='django', tag_type=tag_type)
+        for i in range(15):
+            post = Post.objects.create(
+                title=f'Post {i}',
+                content='Test content',
+                author=self.user,
+                group=self.group,
+            )
+            post.tags.add(tag)
+            PostComment.objects.create(post=post, user=self.user, _comment='A comment')
+            PostVote.objects.create(post=post, user=self.user, vote=1)
+            PostBookmark.objects.create(post=post, user=self.user)
+
+    def test_anonymous_post_page(self):
+        """Count, page, tags and comment counts"""
+        with self.assertNumQueries(4):
+            response = self.client.get('/api/v1/posts/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 12)
+        self.assertEqual(response.data['results'][0]['comments'], 1)
+
+    def test_authenticated_post_page(self):
+        """Adds one query each for the viewer's memberships, votes and bookmarks"""
+        self.client.force_authenticate(user=self.user)
+        with self.assertNumQueries(7):
+            response = self.client.get('/api/v1/posts/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        first = response.data['results'][0]
+        self.assertEqual(first['user_vote']['vote'], 1)
+        self.assertIsNotNone(first['user_bookmark'])
+        self.assertEqual(first['group']['name'], 'testgroup')
+
+    def test_group_posts(self):
+        """The group feed page costs the group, the posts, their tags and comment counts"""
+        with self.assertNumQueries(4):
+            response = self.client.get(f'/api/v1/groups/{self.group.pk}/posts/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 12)
+
+
+class GroupListQueryCountTest(TestCase):
+    """Test cases pinning the number of queries per group directory page"""
+
+    def setUp(self):
+        """Set up more groups than fit on a page, each with topics and members"""
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        tag = Tag.objects.create(name='django', tag_type=TagType.objects.create(title='topic'))
+        for i in range(30):
+            group = Group.objects.create(name=f'Group {i}')
+            group.topics.add(tag)
+            for j in range(i % 3):
+                member = User.objects.create_user(username=f'member{i}-{j}', password='x')
+                GroupMember.objects.create(group=group, user=member)
+            MemberRequest.objects.create(group=group, user=self.user)
+
+    def test_authenticated_group_page(self):
+        """Count, page, topics, the viewer's member requests and roles"""
+        self.client.force_authenticate(user=self.user)
+        with self.assertNumQueries(5):
+            response = self.client.get('/api/v1/groups/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 30)
+        self.assertEqual(len(response.data['results']), 24)
+        first = response.data['results'][0]
+        self.assertEqual(first['topics'][0]['tag_type']['title'], 'topic')
+        self.assertTrue(first['member_status']['is_approved'] is True)
+
+    def test_members_count(self):
+        """Test the stored count follows member creation and deletion"""
+        group = Group.objects.get(name='Group 2')
+        self.assertEqual(group.members_count, 3)
+        GroupMember.objects.filter(group=group).first().delete()
+        group.refresh_from_db()
+        self.assertEqual(group.members_count, 2)
+        Group.objects.filter(pk=group.pk).update(members_count=0)
+        call_command('rebuild_group_counters', stdout=StringIO())
+        group.refresh_from_db()
+        self.assertEqual(group.members_count, 2)
+
+    def test_sort_by_members(self):
+        """Test the directory can be sorted by the stored members count"""
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get('/api/v1/groups/?sort=members')
+        counts = [group['members'] for group in response.data['results']]
+        self.assertEqual(counts, sorted(counts, reverse=True))
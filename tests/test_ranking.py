@@ -0,0 +1,72 @@
+"""
+Feed ranking tests for the Reddit clone application
+"""
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from posts.models import Post
+from posts.ranking import ranks
+
+
+class PostRankingTest(TestCase):
+    """Test cases for the sort and t parameters of the post list"""
+
+    def setUp(self):
+        """Set up an old popular post, a fresh post and a divisive post"""
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.old = Post.objects.create(title='Old', content='Old content', author=self.user)
+        Post.objects.filter(pk=self.old.pk).update(
+            created_at=timezone.now() - timedelta(days=3))
+        self.old.refresh_from_db()
+        self.fresh = Post.objects.create(title='Fresh', content='Fresh content', author=self.user)
+        self.divisive = Post.objects.create(title='Divisive', content='Content', author=self.user)
+
+        self._set_votes(self.old, 50, 0)
+        self._set_votes(self.fresh, 3, 0)
+        self._set_votes(self.divisive, 10, 10)
+
+    def _set_votes(self, post, upvotes, downvotes):
+        score = upvotes - downvotes
+        Post.objects.filter(pk=post.pk).update(
+            score=score, upvotes=upvotes, downvotes=downvotes,
+            **ranks(score, upvotes, downvotes, post.created_at))
+
+    def _titles(self, query):
+        response = self.client.get('/api/v1/posts/' + query)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [post['title'] for post in response.data['results']]
+
+    def test_hot_prefers_recent_posts(self):
+        """Test hot ranks a fresh post above an old popular one"""
+        titles = self._titles('?sort=hot')
+        self.assertLess(titles.index('Fresh'), titles.index('Old'))
+
+    def test_top_window(self):
+        """Test top orders by score and honours the time window"""
+        self.assertEqual(self._titles('?sort=top&t=all')[0], 'Old')
+        self.assertNotIn('Old', self._titles('?sort=top&t=day'))
+
+    def test_controversial(self):
+        """Test controversial puts evenly split posts first"""
+        self.assertEqual(self._titles('?sort=controversial')[0], 'Divisive')
+
+    def test_rising_decays(self):
+        """Test the refresh command drops posts that left the rising window"""
+        self.assertNotIn('Old', self._titles('?sort=rising'))
+        Post.objects.filter(pk=self.fresh.pk).update(
+            created_at=timezone.now() - timedelta(days=2))
+        call_command('refresh_post_ranks', stdout=StringIO())
+        self.assertEqual(self._titles('?sort=rising'), [])
+
+    def test_unknown_sort(self):
+        """Test an unknown sort is rejected"""
+        response = self.client.get('/api/v1/posts/?sort=best')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,135 @@
+"""
+Full-text search tests for the Reddit clone API
+"""
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from comments.models import PostComment
+from groups.models import Group, GroupMember
+from posts.models import Post
+from tags.models import Tag
+
+
+class SearchTest(TestCase):
+    """Test cases for the search endpoint and the search index"""
+
+    def setUp(self):
+        """Set up posts in a public and a private group, a draft and comments"""
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.other = User.objects.create_user(username='otheruser', password='testpass123')
+        self.group = Group.objects.create(name='Public')
+        self.private = Group.objects.create(name='Private', group_type=Group.Type.PRIVATE)
+        self.tag = Tag.objects.create(name='databases')
+        self.in_title = Post.objects.create(
+            title='Tuning sqlite indexes', content='A few notes', author=self.user, group=self.group)
+        self.in_title.tags.add(self.tag)
+        self.in_content = Post.objects.create(
+            title='Weekly thread', content='Anything about sqlite <b>goes</b> here',
+            author=self.other)
+        Post.objects.create(
+            title='Sqlite draft', content='Unfinished', author=self.user,
+            status=Post.STATUS.DRAFT)
+        Post.objects.create(
+            title='Secret sqlite', content='Members only', author=self.user, group=self.private)
+        self.comment = PostComment.objects.create(
+            post=self.in_content, user=self.other, _comment='I migrated from sqlite last week')
+        PostComment.objects.create(
+            post=self.in_content, user=self.other, _comment='Removed sqlite rant', is_removed=True)
+
+    def _titles(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [result['data']['title'] for result in response.data['results']]
+
+    def test_ranking_and_visibility(self):
+        """Title matches rank first; drafts and PRIVATE groups are hidden"""
+        self.assertEqual(
+            self._titles('/api/v1/search/?q=sqlite'),
+            ['Tuning sqlite indexes', 'Weekly thread'])
+        GroupMember.objects.create(group=self.private, user=self.user)
+        self.client.force_authenticate(user=self.user)
+        self.assertIn('Secret sqlite', self._titles('/api/v1/search/?q=sqlite'))
+
+    def test_every_word_matches(self):
+        """Results contain every word, with stemming; operators are ignored"""
+        self.assertEqual(self._titles('/api/v1/search/?q=sqlite+index'), ['Tuning sqlite indexes'])
+        self.assertEqual(self._titles('/api/v1/search/?q=sqlite+missing'), [])
+        self.assertEqual(self._titles('/api/v1/search/?q=%22sqlite%22+%28notes%2A'), ['Tuning sqlite indexes'])
+
+    def test_highlights(self):
+        """Snippets mark the matches and escape the rest"""
+        response = self.client.get('/api/v1/search/?q=sqlite')
+        highlights = response.data['results'][1]['highlights']
+        self.assertIn('<mark>sqlite</mark>', highlights['content'])
+        self.assertIn('&lt;b&gt;goes&lt;/b&gt;', highlights['content'])
+        self.assertEqual(highlights['title'], 'Weekly thread')
+
+    def test_filters(self):
+        """Results can be narrowed by group, tag and author"""
+        self.assertEqual(
+            self._titles(f'/api/v1/search/?q=sqlite&group={self.group.pk}'), ['Tuning sqlite indexes'])
+        self.assertEqual(self._titles('/api/v1/search/?q=sqlite&tag=databases'), ['Tuning sqlite indexes'])
+        self.assertEqual(self._titles('/api/v1/search/?q=sqlite&author=otheruser'), ['Weekly thread'])
+
+    def test_comments(self):
+        """Comments are searched with type=comment, removed ones are hidden"""
+        response = self.client.get('/api/v1/search/?q=sqlite&type=comment')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([result['data']['id'] for result in response.data['results']], [self.comment.pk])
+        result = response.data['results'][0]
+        self.assertEqual(result['data']['post_uuid'], self.in_content.uuid)
+        self.assertIn('<mark>sqlite</mark>', result['highlights']['comment'])
+
+    def test_index_follows_changes(self):
+        """Edited and deleted rows are reindexed"""
+        self.in_content.content = 'Now about postgres'
+        self.in_content.save()
+        self.assertEqual(self._titles('/api/v1/search/?q=sqlite'), ['Tuning sqlite indexes'])
+        self.assertEqual(self._titles('/api/v1/search/?q=postgres'), ['Weekly thread'])
+        Post.objects.filter(pk=self.in_title.pk).update(title='Tuning postgres indexes')
+        self.assertEqual(len(self._titles('/api/v1/search/?q=postgres')), 2)
+        self.in_title.delete()
+        self.assertEqual(self._titles('/api/v1/search/?q=postgres'), ['Weekly thread'])
+
+    def test_pagination(self):
+        """Pages are linked with next and previous"""
+        for i in range(25):
+            Post.objects.create(title=f'Paged {i}', content='Paged', author=self.user)
+        response = self.client.get('/api/v1/search/?q=paged')
+        self.assertEqual(len(response.data['results']), 20)
+        response = self.client.get(response.data['next'])
+        self.assertEqual(len(response.data['results']), 5)
+        self.assertIsNone(response.data['next'])
+        self.assertIsNotNone(response.data['previous'])
+
+    @override_settings(SEARCH_MAX_CANDIDATES=3)
+    def test_newest_candidates(self):
+        """Only the newest matches are ranked"""
+        for i in range(5):
+            Post.objects.create(title=f'Candidate {i}', content='Candidate', author=self.user)
+        self.assertEqual(
+            sorted(self._titles('/api/v1/search/?q=candidate')),
+            ['Candidate 2', 'Candidate 3', 'Candidate 4'])
+
+    @override_settings(SEARCH_MAX_CANDIDATES=2)
+    def test_candidates_are_filtered_first(self):
+        """Test the newest matches are counted after the filters"""
+        for i in range(3):
+            Post.objects.create(title=f'Newer sqlite {i}', content='Content', author=self.user)
+        self.assertEqual(self._titles('/api/v1/search/?q=sqlite&author=otheruser'), ['Weekly thread'])
+        self.assertEqual(
+            self._titles(f'/api/v1/search/?q=sqlite&group={self.group.pk}'), ['Tuning sqlite indexes'])
+        self.assertEqual(
+            sorted(self._titles('/api/v1/search/?q=sqlite')), ['Newer sqlite 1', 'Newer sqlite 2'])
+
+    def test_invalid_parameters(self):
+        """Test missing words and bad parameters are rejected"""
+        for query in ('', '?q=', '?q=%21%21', '?q=sqlite&type=user',
+                '?q=sqlite&page=0', '?q=sqlite&group=x'):
+            response = self.client.get('/api/v1/search/' + query)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, query)
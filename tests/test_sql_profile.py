@@ -0,0 +1,124 @@
+"""
+Tests for the SQL profiling middleware and query fingerprints.
+"""
+import json
+import os
+import tempfile
+
+from django.contrib.auth.models import User
+from django.db import connection, connections
+from django.test import TestCase, override_settings
+from rest_framework import serializers
+from rest_framework.test import APIClient
+
+from core.instrumentation import QueryProfile, capture_all_sql, capture_sql, fingerprint
+from posts.models import Post
+
+
+class AuthorSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = User
+        fields = ('username',)
+
+
+class PostAuthorSerializer(serializers.ModelSerializer):
+    author = AuthorSerializer()
+    vote_count = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Post
+        fields = ('title', 'author', 'vote_count')
+
+    def get_vote_count(self, obj):
+        return obj.votes.count()
+
+
+class FingerprintTest(TestCase):
+    """Test cases for fingerprint"""
+
+    def test_collapses_parameters(self):
+        """Statements differing only in parameters share a fingerprint"""
+        self.assertEqual(
+            fingerprint('SELECT "a" FROM "t" WHERE "id" IN (%s, %s, %s) AND "n" = 12'),
+            fingerprint('SELECT "a"  FROM "t"\nWHERE "id" IN (%s) AND "n" = 7'),
+        )
+        self.assertEqual(fingerprint("SELECT 1 WHERE x = 'it''s'"), 'SELECT ? WHERE x = ?')
+
+
+class QueryProfileTest(TestCase):
+    """Test cases for QueryProfile"""
+
+    def setUp(self):
+        for i in range(4):
+            author = User.objects.create_user(username=f'author{i}', password='testpass123')
+            Post.objects.create(title=f'Post {i}', content='Test content', author=author)
+
+    def test_duplicates_are_attributed_to_fields(self):
+        """Queries repeated per row are grouped and named after their field"""
+        with capture_sql(stats=QueryProfile()) as profile:
+            PostAuthorSerializer(Post.objects.all(), many=True).data
+        self.assertEqual(profile.queries, 9)
+        duplicates = profile.duplicates(threshold=2)
+        self.assertEqual(len(duplicates), 2)
+        sources = {source for duplicate in duplicates for source in duplicate['sources']}
+        self.assertEqual(sources, {'PostAuthorSerializer.author', 'PostAuthorSerializer.get_vote_count'})
+        self.assertEqual({duplicate['count'] for duplicate in duplicates}, {4})
+
+
+    def _drop_other(self):
+        connections['other'].close()
+        del connections['other']
+        del connections.databases['other']
+
+    def test_every_alias_is_captured(self):
+        """Statements on other databases, e.g. replicas, are counted too"""
+        handle, path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        connections.databases['other'] = dict(connection.settings_dict, NAME=path)
+        self.addCleanup(self._drop_other)
+        with capture_all_sql(stats=QueryProfile()) as profile:
+            Post.objects.count()
+            with connections['other'].cursor() as cursor:
+                cursor.execute('SELECT 1')
+                cursor.fetchone()
+        self.assertEqual(profile.queries, 2)
+        self.assertEqual(profile.rows, 2)
+
+
+class SQLProfileMiddlewareTest(TestCase):
+    """Test cases for SQLProfileMiddleware"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        Post.objects.create(title='Post', content='Test content', author=self.user)
+        self.directory = tempfile.TemporaryDirectory()
+        self.sink = os.path.join(self.directory.name, 'profiles.jsonl')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_off_by_default(self):
+        """Without sampling no header is added"""
+        response = APIClient().get('/api/v1/posts/')
+        self.assertNotIn('Server-Timing', response)
+
+    def test_sampled_request(self):
+        """A sampled viewset request gets a header, a log line and a sink line"""
+        with override_settings(SQL_PROFILE_SAMPLE_RATE=1, SQL_PROFILE_SINK=self.sink):
+            with self.assertLogs('core.sql', level='INFO') as logs:
+                response = APIClient().get('/api/v1/posts/')
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('view=PostViewSet.list', logs.output[0])
+        with open(self.sink) as sink:
+            record = json.loads(sink.readline())
+        self.assertEqual(record['view'], 'PostViewSet.list')
+        self.assertEqual(record['status'], 200)
+        self.assertGreater(record['queries'], 0)
+
+    def test_other_views_are_not_profiled(self):
+        """Only BaseReadOnlyViewSet views are reported"""
+        with override_settings(SQL_PROFILE_SAMPLE_RATE=1, SQL_PROFILE_SINK=self.sink):
+            response = APIClient().get('/api/v1/is_authenticated/')
+        self.assertNotIn('Server-Timing', response)
+        self.assertFalse(os.path.exists(self.sink))
@@ -0,0 +1,200 @@
+"""
+Vote counter tests for the Reddit clone application
+"""
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from comments.models import PostComment
+from core.models import BufferedVote
+from core.services import upsert_vote
+from core.votes import MemoryVoteBuffer, flush_votes
+from posts.models import Post, PostVote
+from posts.ranking import ranks
+from posts.services import cast_vote
+
+
+class PostVoteCounterTest(TestCase):
+    """Test cases for the stored post score"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.post = Post.objects.create(
+            title='Test Post',
+            content='Test content',
+            author=self.user
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def _vote(self, method):
+        return self.client.put(f'/api/v1/posts/{self.post.uuid}/{method}/')
+
+    def test_vote_changes_apply_delta(self):
+        """Test switching votes keeps score and counters in sync"""
+        response = self._vote('upvote')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'vote': 1, 'votes': 1})
+
+        response = self._vote('downvote')
+        self.assertEqual(response.data, {'vote': -1, 'votes': -1})
+
+        self.post.refresh_from_db()
+        self.assertEqual(
+            (self.post.score, self.post.upvotes, self.post.downvotes),
+            (-1, 0, 1)
+        )
+
+        response = self._vote('remove_vote')
+        self.assertEqual(response.data, {'vote': 0, 'votes': 0})
+        self.post.refresh_from_db()
+        self.assertEqual(
+            (self.post.score, self.post.upvotes, self.post.downvotes),
+            (0, 0, 0)
+        )
+
+    def test_ranks_follow_stored_counters(self):
+        """Test ranks come from the stored row, not from counters a slower vote returned"""
+        Post.objects.filter(pk=self.post.pk).update(score=10, upvotes=10)
+        stale = (0, 1, {'score': 1, 'upvotes': 1, 'downvotes': 0})
+        with mock.patch('posts.services.upsert_vote', return_value=stale):
+            cast_vote(self.post, self.user, 1)
+
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.score, 10)
+        self.assertEqual(
+            self.post.hot_rank, ranks(10, 10, 0, self.post.created_at)['hot_rank'])
+
+    def test_rebuild_post_scores_command(self):
+        """Test the rebuild command recomputes counters from votes"""
+        other = User.objects.create_user(username='other', password='testpass123')
+        PostVote.objects.create(post=self.post, user=self.user, vote=1)
+        PostVote.objects.create(post=self.post, user=other, vote=-1)
+        Post.objects.filter(pk=self.post.pk).update(score=42, upvotes=7, downvotes=0)
+
+        call_command('rebuild_post_scores', stdout=StringIO())
+
+        self.post.refresh_from_db()
+        self.assertEqual(
+            (self.post.score, self.post.upvotes, self.post.downvotes),
+            (0, 1, 1)
+        )
+
+    def test_list_reads_stored_score(self):
+        """Test the post list serializes the stored score"""
+        Post.objects.filter(pk=self.post.pk).update(score=5)
+        response = self.client.get('/api/v1/posts/')
+        self.assertEqual(response.data['results'][0]['votes'], 5)
+
+
+class VoteUpsertTest(TestCase):
+    """Test cases for core.services.upsert_vote"""
+
+    def setUp(self):
+        """Set up a post with a comment"""
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.post = Post.objects.create(title='Post', content='Content', author=self.user)
+        self.comment = PostComment.objects.create(
+            post=self.post, user=self.user, _comment='comment')
+
+    def test_one_vote_per_user(self):
+        """Test the database refuses a second vote row for the same pair"""
+        PostVote.objects.create(post=self.post, user=self.user, vote=1)
+        with self.assertRaises(IntegrityError):
+            PostVote.objects.create(post=self.post, user=self.user, vote=1)
+
+    def test_returns_old_and_new_vote(self):
+        """Test repeated votes update the single row and return the counters"""
+        self.assertEqual(
+            upsert_vote(PostVote, self.post, self.user, 1, ('score', 'upvotes')),
+            (0, 1, {'score': 1, 'upvotes': 1}))
+        self.assertEqual(
+            upsert_vote(PostVote, self.post, self.user, 1, ('score', 'upvotes')),
+            (1, 1, {'score': 1, 'upvotes': 1}))
+        self.assertEqual(
+            upsert_vote(PostVote, self.post, self.user, -1, ('score', 'upvotes')),
+            (1, -1, {'score': -1, 'upvotes': 0}))
+        self.assertEqual(PostVote.objects.count(), 1)
+
+    def test_comment_vote_skips_aggregation(self):
+        """Test a comment vote reads the stored score instead of summing votes"""
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        url = f'/api/v1/posts/{self.post.uuid}/comments/{self.comment.pk}/upvote/'
+        with CaptureQueriesContext(connection) as queries:
+            response = client.put(url)
+        self.assertEqual(response.data, {'vote': 1, 'votes': 1})
+        self.assertFalse(any('SUM(' in query['sql'] for query in queries))
+
+
+@override_settings(VOTE_INGESTION='buffered')
+class BufferedVoteTest(TestCase):
+    """Test cases for buffered vote ingestion"""
+
+    def setUp(self):
+        """Set up a post, a comment and two voters"""
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.other = User.objects.create_user(username='other', password='testpass123')
+        self.post = Post.objects.create(title='Post', content='Content', author=self.user)
+        self.comment = PostComment.objects.create(
+            post=self.post, user=self.user, _comment='comment')
+
+    def _vote(self, user, method):
+        self.client.force_authenticate(user=user)
+        return self.client.put(f'/api/v1/posts/{self.post.uuid}/{method}/')
+
+    def test_votes_are_queued_with_estimate(self):
+        """Test the API answers with the user's vote and an estimated score"""
+        self.assertEqual(self._vote(self.user, 'upvote').data, {'vote': 1, 'votes': 1})
+        self.assertEqual(self._vote(self.user, 'downvote').data, {'vote': -1, 'votes': -1})
+        self.assertEqual(BufferedVote.objects.count(), 2)
+        self.assertFalse(PostVote.objects.exists())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.score, 0)
+
+    def test_flush_coalesces_last_vote(self):
+        """Test the flusher keeps each user's last vote and applies the counters"""
+        self._vote(self.user, 'upvote')
+        self._vote(self.other, 'upvote')
+        self._vote(self.user, 'downvote')
+        self._vote(self.other, 'remove_vote')
+        self._vote(self.other, 'upvote')
+        call_command('flush_votes', stdout=StringIO())
+
+        self.post.refresh_from_db()
+        self.assertEqual(
+            (self.post.score, self.post.upvotes, self.post.downvotes), (0, 1, 1))
+        self.assertEqual(
+            dict(PostVote.objects.values_list('user__username', 'vote')),
+            {'testuser': -1, 'other': 1})
+        self.assertFalse(BufferedVote.objects.exists())
+
+        self.assertEqual(self._vote(self.other, 'downvote').data['votes'], -2)
+
+    def test_memory_buffer(self):
+        """Test the in-process buffer applies comment votes the same way"""
+        buffer = MemoryVoteBuffer()
+        url = f'/api/v1/posts/{self.post.uuid}/comments/{self.comment.pk}/'
+        self.client.force_authenticate(user=self.user)
+        backend = 'core.votes.MemoryVoteBuffer'
+        with override_settings(VOTE_BUFFER_BACKEND=backend), \
+                mock.patch.dict('core.votes._buffers', {backend: buffer}):
+            self.client.put(url + 'upvote/')
+            self.client.put(url + 'upvote/')
+        self.assertEqual(flush_votes(buffer), 2)
+        self.comment.refresh_from_db()
+        self.assertEqual(self.comment.score, 1)
+        self.assertEqual(buffer.read(10), [])